@@ -1,10 +1,13 @@
 import streamlit as st
 import streamlit.components.v1 as components
 import pandas as pd
+import plotly.io as pio
 from collections import deque
 
-from src.agent import main_agent
-from src.tools import contextualize_query
+from src.agent import main_agent, stream_valuations, detect_listing_links
+from src.crawler import CrawlReport
+from src.code_pool import get_code_pool
+from src.result_store import get_result_store
 
 # -------------------
 # Streamlit Page Setup
@@ -39,11 +42,29 @@ def render_thumbs(i):
     with col3:
         pass  # right spacer
 
+def render_result_page(handle, total, fallback):
+    """Show one page of a stored result, read from the shared result store when the page changes."""
+    store = get_result_store()
+    pages = max(1, -(-total // store.page_size))
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=f"page_{handle}")
+    offset = (page - 1) * store.page_size
+    frame = store.page(handle, offset, store.page_size)
+    if frame is None:
+        # Expired from the store: only the preview kept in the message is left
+        st.caption("This result is no longer available, showing its preview.")
+        st.markdown(fallback)
+        return
+    st.dataframe(frame, use_container_width=True)
+    st.caption(f"Rows {offset + 1}–{offset + len(frame)} of {total}")
+
+
 for i, msg in enumerate(st.session_state.messages):
     with st.chat_message(msg["role"]):
-        # If the message includes a saved dataframe, render it directly
-        if msg.get("type") == "data" and "data" in msg:
-            st.dataframe(pd.DataFrame(msg["data"]), use_container_width=True)
+        # Data messages only hold a handle into the result store; the page shown is fetched on demand
+        if msg.get("type") == "data" and "handle" in msg:
+            render_result_page(msg["handle"], msg["total"], msg["content"])
         else:
             st.markdown(msg["content"])
 
@@ -98,6 +119,36 @@ if len(st.session_state.messages) == 0:
     st.markdown("<hr style='margin: 5px 0;'>", unsafe_allow_html=True)
 
 
+def render_valuations_stream(urls):
+    """Scrape and value pasted Rightmove properties (or whole searches), growing the table as each property arrives."""
+    st.success("Here are your properties valuations:")
+    table, progress = st.empty(), st.empty()
+    rows, failed = [], []
+    report = CrawlReport()
+    try:
+        for i, valuation in enumerate(stream_valuations(urls, report), start=1):
+            if valuation["ok"]:
+                rows.append(valuation["data"])
+                table.dataframe(pd.DataFrame(rows), use_container_width=True)
+            else:
+                failed.append({"url": valuation["url"], "error": valuation["error"]})
+            progress.caption(f"{i} properties processed")
+    except Exception:
+        # The properties valued so far stay in the table
+        if not rows:
+            return {"type": "message", "message": "The model server is busy right now."}
+        st.error("The model server is busy right now, only part of these properties could be valued.")
+    summary = report.summary()
+    progress.caption(
+        f"{summary['properties']} properties valued in {summary['elapsed_seconds']:.0f}s "
+        f"({summary['properties_per_minute']} per minute, {summary['cached']} from cache, "
+        f"{summary['cost_per_property'] or 0} Scrapfly credits per property)")
+    if not rows:
+        return {"type": "message",
+                "message": "Could not retrieve these properties from Rightmove. Please try again later."}
+    return {"type": "pricing_data", "data": rows, "failed": failed, "rendered": True}
+
+
 # -------------------
 # User Input
 # -------------------
@@ -111,12 +162,14 @@ if query:
         st.markdown(query)
     st.session_state.messages.append({"role": "user", "content": query})
 
-    final_query = contextualize_query(query, history=st.session_state.messages)
-    # For debugging only
-    # st.caption(f"Contextualized query → {final_query}")
-
-    with st.spinner("Processing your query..."):
-        result = main_agent(final_query)
+    urls = detect_listing_links(query)
+    if urls:
+        # Valuations are streamed into the page as each property is scraped
+        result = render_valuations_stream(urls)
+    else:
+        with st.spinner("Processing your query..."):
+            # Follow-ups are rewritten into standalone queries inside the agent's classification call
+            result = main_agent(query, history=st.session_state.messages)
 
     result_type = result.get("type")
 
@@ -143,21 +196,24 @@ if query:
     # -------------
     elif result_type == "data":
         st.success("Here is the data related to your query:")
-        df = pd.DataFrame(result["data"])
-        st.dataframe(df, use_container_width=True)
+        # "data" is the first page only, the whole result stays in the shared result store
+        df = result["data"]
 
         # Truncate a preview for chat history
         df_sample = df.head(3).copy()
         for col in df_sample.columns:
             df_sample[col] = df_sample[col].astype(str).str.slice(0, 40) + "…"
+        preview = f"Returned data sample:\n\n{df_sample.to_markdown(index=False)}"
+        render_result_page(result["handle"], result["total"], preview)
 
-        # Store full data for rerendering + markdown for reference
+        # Store the result's handle for rerendering + markdown for reference
         st.session_state.messages.append(
             {
                 "role": "assistant",
                 "type": "data",
-                "data": result["data"],   # store original data
-                "content": f"Returned data sample:\n\n{df_sample.to_markdown(index=False)}",
+                "handle": result["handle"],
+                "total": result["total"],
+                "content": preview,
             }
         )
 
@@ -166,11 +222,20 @@ if query:
     # -------------
     elif result_type == "plot":
         plot_code = result.get("result")
-        df = pd.DataFrame(result.get("data"))
-        exec_globals = {"pd": pd, "px": __import__("plotly.express"), "st": st, "df": df}
+        # Plot the whole result, not just the first page the response carries
+        df = get_result_store().frame(result["handle"])
+        if df is None:
+            df = result["data"]
 
         try:
-            exec(plot_code, exec_globals)
+            pool = get_code_pool()
+            if pool is not None:
+                # Generated code runs in a worker process with time and memory limits; figures come back as JSON
+                for figure in pool.run_plot(plot_code, df):
+                    st.plotly_chart(pio.from_json(figure), use_container_width=True)
+            else:
+                exec_globals = {"pd": pd, "px": __import__("plotly.express"), "st": st, "df": df}
+                exec(plot_code, exec_globals)
             df_sample = df.head(3).to_markdown(index=False)
             st.session_state.messages.append(
                 {
@@ -206,9 +271,12 @@ if query:
     # These are not added to the chat history
     # -------------
     elif result_type == "pricing_data":
-        st.success("Here are your properties valuations:")
-        df = pd.DataFrame(result["data"])
-        st.dataframe(df, use_container_width=True)
+        if not result.get("rendered"):
+            st.success("Here are your properties valuations:")
+            df = pd.DataFrame(result["data"])
+            st.dataframe(df, use_container_width=True)
+        for failure in result.get("failed", []):
+            st.warning(f"Could not retrieve {failure['url']}: {failure['error']}")
 
     # -------------
     # Unexpected result type
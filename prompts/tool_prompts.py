@@ -82,3 +82,38 @@ Instructions:
 ```python
 # code here
 """
+
+
+def get_sql_query_prompt(user_query: str, action: str, table: str, columns: list) -> str:
+    """
+    Prompt asking for one DuckDB SELECT statement answering the query.
+
+    Args:
+        columns (list of dict): {"name", "type", "description"} for each column of `table`.
+    """
+    schema = "\n".join(f"- {c['name']} ({c['type']}): {c.get('description') or ''}".rstrip(": ") for c in columns)
+    id_rule = "\n- The result lists properties: always include the id, latitude and longitude columns." \
+        if action == "geospatial_plot" else ""
+
+    return f"""
+You write **only DuckDB SQL** answering questions about London rental listings.
+
+Table `{table}` columns:
+{schema}
+
+User request: "{user_query}"
+
+Instructions:
+- Write exactly one SELECT statement (CTEs allowed) over `{table}`; never modify data or read files.
+- Match text values case-insensitively (ILIKE) and look in title, description, property_type, borough,
+  district and furnish_type when the request names a feature or place.
+- Prices are monthly rents in GBP (price_gbp); a pricing_index below 1 means good value.
+- Return a table with clear column names; a single value is still a one-row, one-column table.
+- When listing properties, include id, title, display_address, bedrooms and price_gbp and limit the rows
+  to what was asked for (at most 500).{id_rule}
+- Return only the SQL, wrapped like this:
+
+```sql
+SELECT ...
+```
+"""
@@ -0,0 +1,80 @@
+"""
+Benchmark aggregate questions answered from the `ListingAnalyzer` cube vs row-level pandas.
+
+Builds a synthetic dataset of `--listings` rows, reports the one-off cube build time, then times each
+query through the fast query engine with the cube and with an empty cube (row-level group-bys).
+
+Usage (from the repository root):
+    python -m scripts.bench_analytics
+    python -m scripts.bench_analytics --listings 300000 --repeat 50
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.analytics import ListingAnalyzer
+from src.query_engine import FastQueryEngine
+
+QUERIES = [
+    "average rent by borough",
+    "median rent by number of bedrooms",
+    "median price per sqft by borough",
+    "average rent of flats by district",
+    "how many listings by property type",
+    "average rent in Borough 3",
+    "maximum rent for 2 bed flats by borough",
+    "how many furnished 2 bed listings in zone 2",
+]
+
+
+def synthetic_listings(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "id": np.arange(n).astype(str),
+        "borough": rng.choice([f"Borough {i}" for i in range(33)], n),
+        "district": rng.choice([f"District {i}" for i in range(250)], n),
+        "bedrooms": rng.integers(0, 6, n),
+        "property_type": rng.choice(["Flat", "Apartment", "Terraced House", "Studio", "Maisonette"], n),
+        "furnish_type": rng.choice(["Furnished", "Unfurnished", "Part furnished"], n),
+        "travel_zone": rng.choice(list("123456"), n),
+        "price_gbp": rng.lognormal(7.8, 0.4, n),
+        "size_sqft_max": np.where(rng.random(n) < 0.3, 0.0, rng.uniform(250, 2000, n)),
+        "pricing_index": rng.uniform(0.5, 1.5, n),
+    })
+    for column in ("borough", "district", "property_type", "furnish_type", "travel_zone"):
+        df[column] = df[column].astype("category")
+    return df
+
+
+def timed(engine: FastQueryEngine, spec: dict, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        engine.execute(spec)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    df = synthetic_listings(args.listings)
+    start = time.perf_counter()
+    analyzer = ListingAnalyzer(df)
+    print(f"{args.listings} listings, {len(analyzer.cuboids)} cuboids built in {time.perf_counter() - start:.2f}s")
+
+    cube = FastQueryEngine(df, analyzer=analyzer)
+    rows = FastQueryEngine(df, analyzer=ListingAnalyzer(df, dimensions=[]))
+    print(f"{'query':<48} {'cube ms':>8} {'rows ms':>8} {'from cube':>10}")
+    for query in QUERIES:
+        spec = cube.parse(query)
+        answered = cube._aggregate_from_cube(spec) is not None
+        print(f"{query:<48} {timed(cube, spec, args.repeat) * 1000:>8.2f} {timed(rows, spec, args.repeat) * 1000:>8.2f} "
+              f"{'yes' if answered else 'no':>10}")
+
+
+if __name__ == "__main__":
+    main()
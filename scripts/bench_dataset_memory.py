@@ -0,0 +1,102 @@
+"""
+Report resident memory before and after loading each dataset snapshot, eager vs columnar.
+
+"eager" reads the whole parquet file into pandas, as `pai.load` does. "columnar" goes through the
+memory-mapped Arrow copy (`ColumnarSnapshot`): categoricals, Arrow-backed strings, no text columns.
+Each load runs in a fresh process so the numbers do not mix. "private" is memory only that process
+holds; "shared" is mapped file pages other worker processes reuse. Snapshots that are not real parquet
+files (e.g. Git LFS pointers) are skipped; `--synthetic N` adds a generated N-row snapshot.
+
+Usage (from the repository root):
+    python -m scripts.bench_dataset_memory
+    python -m scripts.bench_dataset_memory --synthetic 200000
+"""
+import argparse
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.columnar import ColumnarSnapshot
+from src.dataset import DATASETS_DIR
+from src.utils.memory import memory_usage_mb
+
+
+def synthetic_snapshot(n: int, directory: Path) -> Path:
+    rng = np.random.default_rng(0)
+    words = np.array("bright spacious modern flat garden station close period features kitchen".split())
+    directory.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame({
+        "id": np.arange(n).astype(str),
+        "title": rng.choice(["2 bedroom flat", "1 bedroom apartment", "3 bedroom house"], n),
+        "display_address": [f"{i} Example Road, London" for i in range(n)],
+        "borough": rng.choice([f"Borough {i}" for i in range(33)], n),
+        "district": rng.choice([f"District {i}" for i in range(250)], n),
+        "property_type": rng.choice(["Flat", "Apartment", "Terraced", "Studio"], n),
+        "furnish_type": rng.choice(["Furnished", "Unfurnished", "Part furnished"], n),
+        "travel_zone": rng.choice(["1", "2", "3", "4"], n),
+        "bedrooms": rng.integers(0, 5, n),
+        "price_gbp": rng.lognormal(7.8, 0.4, n),
+        "latitude": 51.5 + rng.normal(0, 0.08, n),
+        "longitude": -0.12 + rng.normal(0, 0.12, n),
+        "description": [" ".join(rng.choice(words, 150)) for _ in range(n)],
+        "property_features": [" | ".join(rng.choice(words, 12)) for _ in range(n)],
+    }).to_parquet(directory / "data.parquet")
+    return directory / "data.parquet"
+
+
+def measure(mode: str, parquet_path: str, cache_dir: str, queue):
+    before = memory_usage_mb()
+    start = time.perf_counter()
+    if mode == "eager":
+        frame = pd.read_parquet(parquet_path)
+    else:
+        frame = ColumnarSnapshot(parquet_path, cache_dir=cache_dir).frame()
+    seconds = time.perf_counter() - start
+    after = memory_usage_mb()
+    queue.put({"before": before, "after": after, "seconds": seconds, "columns": frame.shape[1]})
+
+
+def run(mode: str, parquet_path: Path, cache_dir: str) -> dict:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=measure, args=(mode, str(parquet_path), cache_dir, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--datasets", default=str(Path(DATASETS_DIR) / "new-bot"))
+    parser.add_argument("--synthetic", type=int, default=0, help="Also measure a generated snapshot of N rows")
+    args = parser.parse_args()
+
+    snapshots = sorted(Path(args.datasets).glob("*/data.parquet"))
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.synthetic:
+            snapshots.append(synthetic_snapshot(args.synthetic, Path(scratch) / f"synthetic-{args.synthetic}"))
+        print(f"{'snapshot':<28} {'mode':<9} {'load s':>7} {'cols':>5} {'RSS before':>11} {'RSS after':>10} "
+              f"{'private':>8} {'shared':>7}")
+        for path in snapshots:
+            try:
+                pq.read_metadata(path)
+            except Exception:
+                print(f"{path.parent.name:<28} skipped: not a readable parquet file")
+                continue
+            cache_dir = str(Path(scratch) / "arrow")
+            run("columnar", path, cache_dir)  # convert once, so the timed run only maps the file
+            for mode in ("eager", "columnar"):
+                r = run(mode, path, cache_dir)
+                print(f"{path.parent.name:<28} {mode:<9} {r['seconds']:>7.2f} {r['columns']:>5} "
+                      f"{r['before']['rss']:>11.0f} {r['after']['rss']:>10.0f} "
+                      f"{r['after']['private'] or 0:>8.0f} {r['after']['shared'] or 0:>7.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark map HTML generation for large result sets.
+
+Renders synthetic London listings with `render_map_html` (markers) and with `aggregate_grid` +
+`render_density_html` (density grid), and reports generation time and page size for each mode.
+
+Usage (from the repository root):
+    python -m scripts.bench_maps
+    python -m scripts.bench_maps --sizes 1000 10000 50000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.map_rendering import parse_features, render_map_html, aggregate_grid, render_density_html
+
+FEATURES = [
+    "['Balcony' 'Concierge' 'Gym']",
+    '["Garden", "Parking"]',
+    "['Two double bedrooms' 'Study third room' 'Large reception']",
+    "Part furnished",
+]
+
+
+def synthetic_listings(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "id": np.arange(n).astype(str),
+        "latitude": 51.5 + rng.normal(0, 0.06, n),
+        "longitude": -0.12 + rng.normal(0, 0.1, n),
+        "title": [f"{b} bedroom flat for rent in Example Road, London" for b in rng.integers(0, 5, n)],
+        "price_gbp": rng.integers(900, 9000, n).astype(float),
+        "pricing_index": rng.normal(1, 0.15, n),
+        "property_features": rng.choice(FEATURES, n),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="*", type=int, default=[50, 1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    renderers = {
+        "markers": lambda listings: render_map_html(listings, api_key="BENCHMARK"),
+        "density": lambda listings: render_density_html(aggregate_grid(listings), api_key="BENCHMARK"),
+    }
+
+    print(f"{'mode':>8} {'rows':>8} {'ms':>10} {'KB':>10} {'bytes/row':>10}")
+    for n in args.sizes:
+        listings = synthetic_listings(n)
+        for mode, render in renderers.items():
+            timings = []
+            for _ in range(args.repeat):
+                parse_features.cache_clear()
+                start = time.perf_counter()
+                html = render(listings)
+                timings.append(time.perf_counter() - start)
+            size = len(html.encode())
+            print(f"{mode:>8} {n:>8} {min(timings) * 1000:>10.1f} {size / 1024:>10.1f} {size / n:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
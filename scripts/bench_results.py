@@ -0,0 +1,89 @@
+"""
+Benchmark passing a query result between the agent stages as JSON vs as an in-process `QueryResult`.
+
+"json" replays the previous hand-offs for a plot_stats answer: `standard_response` (to_json, loads, dumps),
+the agent's json.loads, the json.dumps of the plot tool's input, its json.loads and DataFrame rebuild,
+the response cache's json.dumps and the UI's DataFrame of the records. "typed" wraps the frame in a
+`QueryResult`, hands the same frame to the plot step and the UI, and only serializes it for the response
+cache (`encode_response`), the one boundary left. Time and peak traced memory are reported per result size.
+
+Usage (from the repository root):
+    python -m scripts.bench_results
+    python -m scripts.bench_results --rows 10000 100000 500000
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from src.results import QueryResult, encode_response
+
+
+def synthetic_result(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "id": np.arange(n).astype(str),
+        "title": rng.choice(["2 bedroom flat for rent", "Studio apartment", "3 bed terraced house"], n),
+        "display_address": rng.choice([f"{i} High Street, London" for i in range(500)], n),
+        "borough": rng.choice([f"Borough {i}" for i in range(33)], n),
+        "bedrooms": rng.integers(0, 6, n),
+        "price_gbp": rng.lognormal(7.8, 0.4, n).round(2),
+        "latitude": rng.uniform(51.3, 51.7, n),
+        "longitude": rng.uniform(-0.5, 0.3, n),
+    })
+
+
+def json_handoffs(frame: pd.DataFrame, query: str) -> pd.DataFrame:
+    """The previous path: every stage boundary serializes and parses the whole result."""
+    records = json.loads(frame.to_json(date_format="iso", orient="records"))
+    tool_output = json.dumps({"success": True, "result": records, "error": None, "solution": None})
+    results = json.loads(tool_output)["result"]
+    viz_input = json.dumps({"data": results, "query": query})
+    plot_data = pd.DataFrame(json.loads(viz_input)["data"])
+    json.dumps({"type": "plot", "result": "code", "data": results})
+    ui_frame = pd.DataFrame(results)
+    return plot_data if len(plot_data) == len(ui_frame) else ui_frame
+
+
+def typed_handoffs(frame: pd.DataFrame, query: str) -> pd.DataFrame:
+    """The current path: one QueryResult whose frame every stage reads."""
+    result = QueryResult.ok(frame)
+    plot_data = result.frame
+    json.dumps(encode_response({"type": "plot", "result": "code", "data": result.frame}))
+    ui_frame = result.frame
+    return plot_data if len(plot_data) == len(ui_frame) else ui_frame
+
+
+def measure(run, frame: pd.DataFrame, repeat: int):
+    """Median seconds over `repeat` runs and the peak traced memory (MB) of one run."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(frame, "plot the rents")
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    run(frame, "plot the rents")
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return float(np.median(times)), peak / 1024 ** 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'path':>6} {'time ms':>9} {'peak MB':>9}")
+    for n in args.rows:
+        frame = synthetic_result(n)
+        for name, run in (("json", json_handoffs), ("typed", typed_handoffs)):
+            seconds, peak = measure(run, frame, args.repeat)
+            print(f"{n:>8} {name:>6} {seconds * 1000:>9.1f} {peak:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark PAGE_MODEL extraction over a corpus of saved Rightmove HTML pages.
+
+Compares the previous extractor (parsel DOM + `raw_decode` on a sliced copy for every "{") with the
+streaming `extract_page_model`. Each page can be padded with extra inline scripts full of braces, as on
+real pages carrying analytics and ad JSON, to show how both scale with page size.
+
+Usage (from the repository root):
+    python -m scripts.bench_scrape_parse
+    python -m scripts.bench_scrape_parse --fixtures path/to/saved/pages --pad-kb 0 256 1024
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from parsel import Selector
+
+from src.scrap_data import extract_page_model
+
+DEFAULT_FIXTURES = Path(__file__).resolve().parent.parent / "tests" / "fixtures" / "rightmove"
+
+
+def legacy_extract(html: str):
+    """The extractor this module replaced, kept here as the benchmark baseline."""
+    script = Selector(text=html).xpath("//script[contains(.,'PAGE_MODEL = ')]/text()").get()
+    if not script:
+        return None
+    decoder = json.JSONDecoder()
+    pos = 0
+    while True:
+        start = script.find("{", pos)
+        if start == -1:
+            return None
+        try:
+            result, _ = decoder.raw_decode(script[start:])
+            return result
+        except ValueError:
+            pos = start + 1
+
+
+def pad(html: str, kb: int) -> str:
+    """Insert `kb` KB of brace-heavy, non-JSON script text just before PAGE_MODEL."""
+    if not kb:
+        return html
+    filler = "if (a) { track({event: 'x', id: i}); } " * (kb * 1024 // 40)
+    return html.replace("window.PAGE_MODEL", filler + "\n    window.PAGE_MODEL", 1)
+
+
+def timed(extract, pages, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for page in pages:
+            extract(page)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", type=Path, default=DEFAULT_FIXTURES, help="Directory of saved *.html pages")
+    parser.add_argument("--pad-kb", nargs="*", type=int, default=[0, 64, 256])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = [path.read_text(encoding="utf-8") for path in sorted(args.fixtures.glob("*.html"))]
+    if not corpus:
+        raise SystemExit(f"No *.html fixtures in {args.fixtures}")
+
+    print(f"{len(corpus)} pages from {args.fixtures}")
+    print(f"{'pad KB':>8} {'avg KB':>8} {'legacy ms':>10} {'stream ms':>10} {'speedup':>8}")
+    for kb in args.pad_kb:
+        pages = [pad(html, kb) for html in corpus]
+        for page in pages:
+            assert extract_page_model(page) == legacy_extract(page), "extractors disagree"
+        legacy = timed(legacy_extract, pages, args.repeat)
+        stream = timed(extract_page_model, pages, args.repeat)
+        average_kb = sum(len(p.encode()) for p in pages) / len(pages) / 1024
+        print(f"{kb:>8} {average_kb:>8.1f} {legacy * 1000:>10.1f} {stream * 1000:>10.2f} {legacy / stream:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark pandas vs DuckDB execution of LLM-generated SQL for the test queries.
+
+SQL for each query in the query file is generated once with the DuckDB backend's prompt (LLM call) and
+cached in `--sql-cache`, so re-runs and both engines execute exactly the same statements. "pandas"
+loads the whole snapshot into a DataFrame first (as `pai.load` does) and runs the statements on the
+in-memory frame, as PandasAI does with its generated SQL; "duckdb" runs them straight over the parquet
+file with `DuckDBBackend`. Load time, per-query median latency and result sizes are reported.
+
+Usage (from the repository root):
+    python -m scripts.bench_sql_backend --dataset new-bot/rental-data-london4
+    python -m scripts.bench_sql_backend --limit 20 --repeat 5 --offline
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+
+from src.dataset import DATASETS_DIR
+from src.sql_backend import DuckDBBackend, validate_sql
+
+
+def load_sql_cache(path: str) -> dict:
+    cache = {}
+    if os.path.exists(path):
+        for line in Path(path).read_text().splitlines():
+            if line.strip():
+                record = json.loads(line)
+                cache[record["query"]] = record["sql"]
+    return cache
+
+
+def timed(run, repeat: int):
+    """Median seconds of `repeat` runs and the last result."""
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=os.getenv("DATAFRAME", "new-bot/rental-data-london4"))
+    parser.add_argument("--queries", default="tests/ai_chatbot_real_estate_queries.txt")
+    parser.add_argument("--sql-cache", default=".cache/generated_sql.jsonl")
+    parser.add_argument("--limit", type=int, default=0, help="Only the first N queries")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--offline", action="store_true", help="Only use cached SQL, never call the LLM")
+    args = parser.parse_args()
+
+    dataset_dir = os.path.join(DATASETS_DIR, args.dataset)
+    parquet_path = os.path.join(dataset_dir, "data.parquet")
+    backend = DuckDBBackend(parquet_path, schema_path=os.path.join(dataset_dir, "schema.yaml"))
+
+    queries = [q.strip() for q in Path(args.queries).read_text().splitlines() if q.strip()]
+    queries = queries[:args.limit] if args.limit else queries
+    cache = load_sql_cache(args.sql_cache)
+    missing = [q for q in queries if q not in cache]
+    if missing and not args.offline:
+        os.makedirs(os.path.dirname(args.sql_cache) or ".", exist_ok=True)
+        with open(args.sql_cache, "a") as f:
+            for query in missing:
+                cache[query] = backend.generate_sql(query, "output")
+                f.write(json.dumps({"query": query, "sql": cache[query]}) + "\n")
+                f.flush()
+    statements = [(q, cache[q]) for q in queries if q in cache]
+    print(f"{len(statements)} generated statements for {len(queries)} queries over {args.dataset}")
+
+    start = time.perf_counter()
+    frame = pd.read_parquet(parquet_path)
+    load_seconds = time.perf_counter() - start
+    in_memory = duckdb.connect()
+    in_memory.register("listings", frame)
+
+    rows, totals, failures = [], {"pandas": 0.0, "duckdb": 0.0}, 0
+    for query, sql in statements:
+        try:
+            statement = validate_sql(sql)
+            pandas_seconds, expected = timed(lambda: in_memory.execute(statement).df(), args.repeat)
+            duckdb_seconds, result = timed(lambda: backend.execute(statement), args.repeat)
+        except Exception as e:
+            failures += 1
+            print(f"  failed: {query[:60]!r}: {e}")
+            continue
+        totals["pandas"] += pandas_seconds
+        totals["duckdb"] += duckdb_seconds
+        rows.append((query, pandas_seconds, duckdb_seconds, len(expected), len(result)))
+
+    print(f"\n{'query':<60} {'pandas ms':>10} {'duckdb ms':>10} {'rows':>12}")
+    for query, pandas_seconds, duckdb_seconds, expected_rows, result_rows in rows:
+        print(f"{query[:60]:<60} {pandas_seconds * 1000:>10.1f} {duckdb_seconds * 1000:>10.1f} "
+              f"{expected_rows:>5} / {result_rows:<5}")
+    print(f"\npandas: {load_seconds:.2f}s to load the frame + {totals['pandas']:.2f}s of queries")
+    print(f"duckdb: no load + {totals['duckdb']:.2f}s of queries over parquet")
+    print(f"{failures} statements failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark batch valuation of scraped properties against a synthetic London-sized dataset.
+
+Builds a `ComparablesValuer` over `--listings` random listings and times `estimate` for batches of
+subjects, reporting the build cost once and the best-of-`--repeat` latency per batch. The target is
+under 50 ms for 100 properties on one core.
+
+Usage (from the repository root):
+    python -m scripts.bench_valuation
+    python -m scripts.bench_valuation --listings 100000 --batch 1 100 1000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.valuation import ComparablesValuer
+
+
+def synthetic_listings(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "id": np.arange(n).astype(str),
+        "latitude": 51.5 + rng.normal(0, 0.08, n),
+        "longitude": -0.12 + rng.normal(0, 0.12, n),
+        "bedrooms": rng.integers(0, 6, n),
+        "bathrooms": rng.integers(1, 4, n),
+        "property_type": rng.choice(["Flat", "Apartment", "Terraced", "Semi-Detached", "Studio"], n),
+        "postcode_outcode": rng.choice(["NW1", "E1", "SW11", "N7", "SE15", "W2"], n),
+        "price_gbp": rng.lognormal(7.8, 0.4, n),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, default=30_000)
+    parser.add_argument("--batch", nargs="*", type=int, default=[1, 10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    listings = synthetic_listings(args.listings)
+    start = time.perf_counter()
+    valuer = ComparablesValuer(listings)
+    print(f"{args.listings} listings, valuer built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    print(f"{'batch':>8} {'ms':>8} {'ms/100':>8}")
+    for size in args.batch:
+        subjects = synthetic_listings(size, seed=1).drop(columns=["id", "price_gbp"])
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            valuer.estimate(subjects)
+            best = min(best, time.perf_counter() - start)
+        print(f"{size:>8} {best * 1000:>8.2f} {best * 1000 * 100 / size:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
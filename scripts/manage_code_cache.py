@@ -0,0 +1,44 @@
+"""
+Inspect the cache of PandasAI-generated programs and pin known-good ones.
+
+Pinned programs are never evicted, neither by the LRU limit nor when they fail on a later dataset
+(they are then skipped for that question until they work again or are unpinned).
+
+Usage (from the repository root):
+    python -m scripts.manage_code_cache list
+    python -m scripts.manage_code_cache pin "median rent per borough for 2-bed flats" --action output
+    python -m scripts.manage_code_cache unpin "median rent per borough for 2-bed flats" --action output
+"""
+import argparse
+import os
+
+from src.code_cache import CodeCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["list", "pin", "unpin"])
+    parser.add_argument("query", nargs="?")
+    parser.add_argument("--action", default="output")
+    parser.add_argument("--cache", default=os.getenv("CODE_CACHE_PATH", ".cache/generated_code.sqlite"))
+    parser.add_argument("--code", action="store_true", help="Print each program's code with `list`")
+    args = parser.parse_args()
+
+    cache = CodeCache(args.cache)
+    if args.command == "list":
+        for program in cache.programs():
+            flag = "pinned" if program["pinned"] else ""
+            print(f"{program['hits']:>5} hits  {program['action']:<10} {program['schema']}  {flag:<6}  "
+                  f"{program['query']}")
+            if args.code:
+                print("    " + program["code"].replace("\n", "\n    "))
+        print(cache.stats())
+        return
+    if not args.query:
+        parser.error(f"{args.command} needs a query")
+    changed = cache.pin(args.query, args.action, pinned=args.command == "pin")
+    print(f"{args.command}ned {changed} program(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Retrain the pricing model and write a dataset version with refreshed `predicted_price` / `pricing_index`.
+
+Features live in a columnar cache (`--cache-dir`) shared across snapshots: only listings that are new
+or changed since the last run are featurized, and the model is refitted from incrementally updated
+normal equations. A report with row counts, holdout error and per-stage timings is printed and saved.
+
+Usage (from the repository root):
+    python -m scripts.retrain_pricing_model --source new-bot/rental-data-london4
+    python -m scripts.retrain_pricing_model --source new-bot/rental-data-london4 --target new-bot/rental-data-london5 --full
+"""
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from src.dataset import DATASETS_DIR, next_version_path, write_dataset_version
+from src.pricing_model import retrain
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=os.getenv("DATAFRAME", "new-bot/rental-data-london4"))
+    parser.add_argument("--target", help="New dataset path (default: the source with its version number + 1)")
+    parser.add_argument("--cache-dir", default=os.getenv("PRICING_FEATURES_PATH", ".cache/pricing_features"))
+    parser.add_argument("--full", action="store_true", help="Rebuild the feature cache from scratch")
+    parser.add_argument("--l2", type=float, default=1.0)
+    parser.add_argument("--report", default=".cache/pricing_report.json")
+    parser.add_argument("--dry-run", action="store_true", help="Train and report without writing a dataset")
+    args = parser.parse_args()
+    target = args.target or next_version_path(args.source)
+
+    start = time.perf_counter()
+    df = pd.read_parquet(os.path.join(DATASETS_DIR, args.source, "data.parquet"))
+    read_seconds = time.perf_counter() - start
+    print(f"{len(df)} listings read from {args.source} in {read_seconds:.2f}s")
+
+    scored, report = retrain(df, args.cache_dir, full=args.full, l2=args.l2)
+    report = {"source": args.source, "target": None if args.dry_run else target, **report}
+    report["seconds"] = {"read": round(read_seconds, 4), **report["seconds"]}
+
+    if not args.dry_run:
+        start = time.perf_counter()
+        write_dataset_version(scored, args.source, target)
+        report["seconds"]["write_dataset"] = round(time.perf_counter() - start, 4)
+        print(f"Dataset written to {os.path.join(DATASETS_DIR, target)}")
+
+    print(json.dumps(report, indent=2))
+    os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+    Path(args.report).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Train the local intent/relevance classifier and report its agreement with the LLM classifiers.
+
+Queries come from the test query files and the production classification log. Queries without a label
+are labelled once by the LLM (`classify_query`) and the labels are cached, so re-runs cost nothing.
+
+Usage (from the repository root):
+    python -m scripts.train_local_classifier
+    python -m scripts.train_local_classifier --threshold 0.85 --report .cache/classifier_report.json
+"""
+import argparse
+import json
+import os
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.local_classifier import LABELS, LocalIntentClassifier, classification_label
+
+DEFAULT_QUERY_FILES = ["tests/ai_chatbot_real_estate_queries.txt", "tests/queries.txt"]
+
+
+def load_labels(path: str) -> dict:
+    """Read a {query: label} mapping from a JSONL file of {"query", "label"} records."""
+    labels = {}
+    if os.path.exists(path):
+        for line in Path(path).read_text().splitlines():
+            if line.strip():
+                record = json.loads(line)
+                labels[record["query"]] = record["label"]
+    return labels
+
+
+def label_with_llm(queries: list, labels_path: str) -> list:
+    """Label queries with the LLM classifier, appending each label to the cache file. Returns call latencies."""
+    from src.classifiers import classify_query
+
+    latencies = []
+    with open(labels_path, "a") as f:
+        for query in queries:
+            start = time.perf_counter()
+            label = classification_label(classify_query(query))
+            latencies.append(time.perf_counter() - start)
+            f.write(json.dumps({"query": query, "label": label}) + "\n")
+            f.flush()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", nargs="*", default=DEFAULT_QUERY_FILES)
+    parser.add_argument("--log", default=os.getenv("CLASSIFICATION_LOG_PATH", ".cache/classification_log.jsonl"))
+    parser.add_argument("--labels", default=".cache/classifier_labels.jsonl")
+    parser.add_argument("--model", default=os.getenv("LOCAL_CLASSIFIER_PATH", "models/intent_classifier.npz"))
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.9")))
+    parser.add_argument("--report", default=".cache/classifier_report.json")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Production log entries are already labelled by the LLM, cached labels cover earlier runs
+    labels = load_labels(args.log)
+    labels.update(load_labels(args.labels))
+    queries = [q.strip() for path in args.queries if os.path.exists(path)
+               for q in Path(path).read_text().splitlines() if q.strip()]
+    unlabeled = list(dict.fromkeys(q for q in queries if q not in labels))
+    os.makedirs(os.path.dirname(args.labels) or ".", exist_ok=True)
+    llm_latencies = label_with_llm(unlabeled, args.labels) if unlabeled else []
+    labels.update(load_labels(args.labels))
+
+    texts = list(labels)
+    random.Random(args.seed).shuffle(texts)
+    split = max(1, int(len(texts) * 0.8))
+    train, held_out = texts[:split], texts[split:] or texts[:1]
+    print(f"{len(texts)} labelled queries: {len(train)} train / {len(held_out)} held out")
+
+    model = LocalIntentClassifier().fit(train, [labels[t] for t in train])
+    temperature = model.calibrate(held_out, [labels[t] for t in held_out])
+
+    # Agreement with the LLM on held-out queries, overall and above the confidence threshold
+    start = time.perf_counter()
+    probabilities = model.predict_proba(held_out)
+    batch_seconds = time.perf_counter() - start
+    predicted = [LABELS[i] for i in probabilities.argmax(axis=1)]
+    expected = [labels[t] for t in held_out]
+    agree = np.array([p == e for p, e in zip(predicted, expected)])
+    confident = probabilities.max(axis=1) >= args.threshold
+
+    single = []
+    for text in held_out:
+        start = time.perf_counter()
+        model.predict(text)
+        single.append(time.perf_counter() - start)
+
+    report = {
+        "queries": len(texts),
+        "held_out": len(held_out),
+        "temperature": temperature,
+        "threshold": args.threshold,
+        "agreement": float(agree.mean()),
+        "coverage": float(confident.mean()),
+        "agreement_when_confident": float(agree[confident].mean()) if confident.any() else None,
+        "per_label_agreement": {
+            label: float(agree[[e == label for e in expected]].mean())
+            for label in LABELS if label in expected
+        },
+        "local_latency_ms": {
+            "single_median": float(np.median(single) * 1000),
+            "batch_per_query": batch_seconds / len(held_out) * 1000,
+        },
+        "llm_latency_ms": {"median": float(np.median(llm_latencies) * 1000)} if llm_latencies else None,
+    }
+    print(json.dumps(report, indent=2))
+    os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+    Path(args.report).write_text(json.dumps(report, indent=2))
+
+    # Ship a model trained on every labelled query, keeping the calibrated temperature
+    final = LocalIntentClassifier().fit(texts, [labels[t] for t in texts])
+    final.temperature = temperature
+    final.save(args.model)
+    print(f"Model saved to {args.model}")
+
+
+if __name__ == "__main__":
+    main()
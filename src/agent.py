@@ -1,8 +1,36 @@
-from src.tools import safe_dataframe_tool, create_plotly_code
-from src.classifiers import llm_classifier, is_uae_real_estate_query
+from src.tools import query_dataframe, aplotly_code, get_fast_query_engine
+from src.classifiers import aclassify_query, format_history
 from src.geo_tools import generate_google_maps_html
-from src.scrap_data import run_scraper_safe, detect_rightmove_links,to_property_dicts
+from src.scrap_data import detect_rightmove_links, to_property_dicts
+from src.crawler import CrawlReport, detect_rightmove_search_links, iter_listing_results
+from src.valuation import get_valuer
+from src.local_classifier import local_classification, log_classification, guess_action
+from src.response_cache import ResponseCache, dataset_version, normalize_query
+from src.results import QueryResult, decode_response, encode_response
+from src.result_store import get_result_store
+from src.utils.env_tools import cache_resource
+from src.utils.async_runtime import run_sync, iterate_sync
+from prompts.tool_prompts import format_query_with_table_output
+from typing import Optional
+import asyncio
 import json
+import os
+
+import pandas as pd
+
+ACTIONS = ("output", "plot_stats", "geospatial_plot")
+# Opt-in: fetch data concurrently with the classifier call instead of after it
+SPECULATIVE = os.getenv("AGENT_SPECULATIVE", "0") == "1"
+
+
+@cache_resource
+def get_response_cache():
+    """Shared on-disk cache for classifications and final agent responses."""
+    return ResponseCache(
+        path=os.getenv("RESPONSE_CACHE_PATH", ".cache/agent_cache.sqlite"),
+        max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000")),
+        ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(24 * 3600))),
+    )
 
 
 def safe_user_query(q: str) -> str:
@@ -18,69 +46,258 @@ def safe_user_query(q: str) -> str:
     return q.replace("'", "`").replace("’", "`").replace("‘", "`")
 
 
-def main_agent(query: str):
+def main_agent(query: str, history=None, timeout: Optional[float] = None, speculative: Optional[bool] = None):
+    """
+    Processes a user query related to London real estate and returns a structured response.
+
+    Synchronous wrapper around `amain_agent`, executed on the shared background event loop.
+
+    Args:
+        query (str): The user query string.
+        history (deque or list, optional): The conversation so far, latest user query last.
+        timeout (float, optional): Seconds after which the request is cancelled.
+        speculative (bool, optional): See `amain_agent`.
+
+    Returns:
+        dict: See `amain_agent`.
+    """
+    try:
+        return run_sync(amain_agent(query, history, speculative=speculative), timeout=timeout)
+    except TimeoutError:
+        return {"type": "message",
+                "message": "The request took too long. Please try again or refine your search."}
+
+
+def detect_listing_links(query: str):
+    """Rightmove property URLs and search-result URLs found in a query."""
+    return detect_rightmove_links(query) + detect_rightmove_search_links(query)
+
+
+async def astream_valuations(urls, report: Optional[CrawlReport] = None):
+    """
+    Valuations of Rightmove properties, yielded one by one as soon as each page is scraped (or cached).
+
+    Args:
+        urls (list of str): Rightmove property and search-result URLs, as returned by `detect_listing_links`.
+                            Search URLs are crawled into the properties they list.
+        report (CrawlReport, optional): Filled with pages, properties, throughput and Scrapfly credits.
+
+    Yields:
+        dict: {"url", "ok", "data", "error"} where "data" is the property's `to_property_dicts` row, valued
+              against comparable listings, when "ok".
+    """
+    # Built once per process from the dataset; the first call loads it, so keep it off the event loop
+    valuer = await asyncio.to_thread(get_valuer)
+    # Pages are crawled by a producer task; every property scraped by the time the previous ones were
+    # consumed is valued in one `to_property_dicts` batch, then yielded one by one
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def crawl():
+        try:
+            async for result in iter_listing_results(urls, report=report):
+                await results.put(result)
+        finally:
+            await results.put(None)
+
+    producer = asyncio.create_task(crawl())
+    try:
+        finished = False
+        while not finished:
+            batch = [await results.get()]
+            while not results.empty():
+                batch.append(results.get_nowait())
+            if batch[-1] is None:
+                finished = True
+                batch.pop()
+            scraped = [result["property"] for result in batch if result["ok"]]
+            rows = iter(to_property_dicts(scraped, valuer) if scraped else [])
+            for result in batch:
+                row = next(rows) if result["ok"] else None
+                yield {"url": result["url"], "ok": result["ok"], "data": row, "error": result["error"]}
+        # Re-raise a crawl failure
+        await producer
+    finally:
+        producer.cancel()
+
+
+def stream_valuations(urls, report: Optional[CrawlReport] = None):
+    """Synchronous iterator over `astream_valuations`, driven by the shared background event loop."""
+    return iterate_sync(astream_valuations(urls, report))
+
+
+async def amain_agent(query: str, history=None, speculative: Optional[bool] = None):
     """
     Processes a user query related to London real estate and returns a structured response.
 
+    Network calls go through the shared pooled async clients, blocking work (PandasAI, map building)
+    runs in worker threads, so many conversations can be served concurrently from one event loop.
+
     Args:
         query (str): The user query string.
+        history (deque or list, optional): The conversation so far, latest user query last. Used to
+                                           rewrite follow-up questions into standalone queries.
+        speculative (bool, optional): Start the data retrieval while the LLM classifier is still running,
+                                      using the local classifier's best guess for the action. The data is
+                                      reused when the classified action needs the same query, and dropped
+                                      if the query turns out irrelevant. Defaults to AGENT_SPECULATIVE.
 
     Returns:
         dict: A structured response with one of the following formats:
             - type="message": {"type": "message", "message": str}
-            - type="data": {"type": "data", "data": list[dict]}
-            - type="plot": {"type": "plot", "result": str, "data": list[dict]}
+            - type="data": {"type": "data", "data": pd.DataFrame, "handle": str, "total": int, "offset": int,
+                            "limit": int}
+            - type="plot": {"type": "plot", "result": str, "data": pd.DataFrame, "handle": str, "total": int,
+                            "offset": int, "limit": int}
+            "data" is the first page of the result; the whole result stays in the shared result store under
+            "handle" (see `ResultStore.page` and `ResultStore.frame`).
             - type="html": {"type": "html", "content": str}
             - type="error": {"type": "error", "error": str, "solution": Optional[str]}
+            - type="pricing_data": {"type": "pricing_data", "data": list[dict], "failed": list[dict],
+                                    "report": dict (see `CrawlReport.summary`)}
     """
     # Step 0: If correct RightMoves URLs are provided, trigger the scraper directly.
-    urls  = detect_rightmove_links(query)
+    # Properties scraped before are served from the property cache (stale ones are refreshed in the background),
+    # search-result URLs are crawled into the properties they list.
+    urls  = detect_listing_links(query)
     print("Detected URLs:", len(urls))
     if len(urls)>0:
         try:
-            scraped_data = run_scraper_safe(urls)
-            data = to_property_dicts(scraped_data)
-            return {"type": "pricing_data", "data": data}
-        except:
+            data, failed = [], []
+            report = CrawlReport()
+            async for valuation in astream_valuations(urls, report):
+                if valuation["ok"]:
+                    data.append(valuation["data"])
+                else:
+                    failed.append({"url": valuation["url"], "error": valuation["error"]})
+        except Exception:
             return {"type": "message",
                 "message": "The model server is busy right now."}
+        if not data:
+            return {"type": "message",
+                    "message": "Could not retrieve these properties from Rightmove. Please try again later."}
+        return {"type": "pricing_data", "data": data, "failed": failed, "report": report.summary()}
 
-    # Step 1: Relevance QUERY check if no URLs are provided.
-    # Determine if the query is relevant to London real estate.
-    if not is_uae_real_estate_query(query):
-        return {"type": "message",
-                "message": "This is an irrelevant question to London property."}
+    # Step 1: Relevance QUERY check if no URLs are provided, intent classification and
+    # contextualization of follow-ups, all answered by a single LLM call.
+    # Classifications do not depend on the dataset, so they are cached by the query and history alone.
+    # Standalone queries go to the local classifier first; the LLM is only asked when it is unsure.
+    # A speculative retrieval left running (wrong guess, irrelevant query, cache hit or a failure later in
+    # the pipeline) is cancelled on the way out
+    speculation = None
+    try:
+        cache = get_response_cache()
+        history_text = format_history(history)
+        classification_key = json.dumps([normalize_query(query), history_text])
+        classification = cache.get("classification", classification_key)
+        if classification is None and not history_text:
+            classification = local_classification(query)
+        if classification is None:
+            # Only standalone queries can be speculated on, follow-ups need the rewrite first.
+            if (SPECULATIVE if speculative is None else speculative) and not history_text:
+                guessed_action = guess_action(query)
+                task = asyncio.create_task(_fetch_data(safe_user_query(query), guessed_action))
+                # Retrieve the outcome of discarded speculations so failures are not reported as unhandled
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+                speculation = (safe_user_query(query), guessed_action, task)
+            classification = await aclassify_query(query, history)
+            if not history_text:
+                log_classification(query, classification)
+            if classification["action"] in ACTIONS:
+                cache.set("classification", classification_key, classification)
 
-    # Step 2: Sanitize the query and classify the user's intent.
-    query = safe_user_query(query)
-    action = llm_classifier(query)
-    final_input = json.dumps({"query": query, "action": action})
+        if not classification["relevant"]:
+            return {"type": "message",
+                    "message": "This is an irrelevant question to London property."}
 
-    # Step 3: Fetch data using a safe dataframe tool.
-    # The tool processes the query and action to return data in JSON format.
-    data_json_str = safe_dataframe_tool.invoke(final_input)
-    data_dict = json.loads(data_json_str)
+        # Step 2: Sanitize the standalone query and serve a cached response if one exists.
+        # Responses are keyed on the query, the action and the dataset snapshot they were computed from.
+        query = safe_user_query(classification["standalone_query"])
+        action = classification["action"]
+        cache_key = normalize_query(query)
+        version = dataset_version(os.getenv("DATAFRAME"))
+        response_key = json.dumps([cache_key, action])
+        cached = cache.get("response", response_key, version=version)
+        if cached is not None:
+            return _paginate(decode_response(cached))
 
-    # Handle errors in the data fetching process.
-    if not data_dict.get("success"):
-        return {"type": "error",
-                "error": data_dict.get("error"),
-                "solution": data_dict.get("solution")}
+        # Step 3: Fetch data, reusing the speculative retrieval when it asked the dataframe tool the same question.
+        result = None
+        if speculation is not None:
+            speculated_query, guessed_action, task = speculation
+            if format_query_with_table_output(speculated_query, guessed_action) == \
+                    format_query_with_table_output(query, action):
+                result = await task
+        if result is None:
+            result = await _fetch_data(query, action)
 
-    results = data_dict.get("result", [])
+        response = await _run_action(query, action, result)
+        if response.get("type") != "error":
+            cache.set("response", response_key, encode_response(response), version=version)
+        return _paginate(response)
+    finally:
+        _cancel(speculation)
 
-    # Step 4: Normalize results.
-    # Ensure results are in a consistent format for further processing.
-    if results is None:
-        return {"type": "message",
-                "message": "No properties found. Please refine your search."}
 
-    if isinstance(results, (int, float, str)):
-        results = [{"value": results}]
+def _paginate(response: dict) -> dict:
+    """
+    Moves the result frame of a "data" or "plot" response into the shared result store.
+
+    The response keeps a cursor (handle, total row count) and the first page only, so callers holding on
+    to responses, such as the chat history, do not hold whole results. The response cache stores the whole
+    frame, and a cache hit is stored again under a new handle.
+    """
+    data = response.get("data")
+    if response.get("type") not in ("data", "plot") or not isinstance(data, pd.DataFrame):
+        return response
+    return {**response, **get_result_store().cursor(data)}
+
+
+def _cancel(speculation):
+    """Cancel an in-flight speculative data retrieval. A PandasAI call already running in its worker
+    thread finishes in the background, but its result is discarded."""
+    if speculation is not None:
+        speculation[2].cancel()
+
+
+async def _fetch_data(query: str, action: str) -> QueryResult:
+    """
+    Fetches the data for a query through the dataframe tool's in-process entry point.
+
+    Args:
+        query (str): The sanitized user query string.
+        action (str): The classified intent, it selects the output format requested from PandasAI.
 
-    if not isinstance(results, (list, tuple)) or len(results) == 0:
+    Returns:
+        QueryResult: The tool's result, still a DataFrame.
+    """
+    # PandasAI is blocking, so it runs in a worker thread instead of stalling the event loop.
+    return await asyncio.to_thread(query_dataframe, query, action)
+
+
+async def _run_action(query: str, action: str, result: QueryResult) -> dict:
+    """
+    Builds the response for a classified query from its fetched data.
+
+    Args:
+        query (str): The sanitized user query string.
+        action (str): The classified intent ("output", "plot_stats" or "geospatial_plot").
+        result (QueryResult): The dataframe tool's result.
+
+    Returns:
+        dict: A structured response, see `amain_agent`.
+    """
+
+    # Handle errors in the data fetching process.
+    if not result.success:
+        return {"type": "error",
+                "error": result.error,
+                "solution": result.solution}
+
+    # Step 4: Scalars already come back as a one-row "value" frame; nothing to show for no rows.
+    if result.empty:
         return {"type": "message",
                 "message": "No properties found. Please refine your search."}
+    results = result.frame
 
     # Step 5: Execute the action based on the classified intent.
     if action == "output":
@@ -89,19 +306,16 @@ def main_agent(query: str):
 
     elif action == "plot_stats":
         # Generate a Plotly visualization based on the results.
-        viz_input = json.dumps({"data": results, "query": query})
-        result_json_str = create_plotly_code.invoke(viz_input)
-        result = json.loads(result_json_str)
-        return {"type": "plot", "result": result["result"], "data": results}
+        plot_code = await aplotly_code(query, results)
+        return {"type": "plot", "result": plot_code, "data": results}
 
     elif action == "geospatial_plot":
-        # Generate a geospatial plot using Google Maps if the result set is small.
-        if len(results) < 50:
-            html = generate_google_maps_html(results)
-            return {"type": "html", "content": html}
-        else:
-            return {"type": "message",
-                    "message": "Too many properties to display. Please refine your search."}
+        # Generate a geospatial plot using Google Maps: clustered markers for small results,
+        # a server-side density grid for large ones, so any result size can be displayed.
+        # Centre the map on the landmark or area the query refers to, if any
+        focus = await asyncio.to_thread(lambda: get_fast_query_engine().spatial_focus(query))
+        html = await asyncio.to_thread(generate_google_maps_html, results, focus=focus)
+        return {"type": "html", "content": html}
 
     else:
         # Handle unknown actions.
@@ -0,0 +1,177 @@
+from itertools import combinations
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Columns listings are grouped or filtered by in aggregate questions
+DIMENSIONS = ["borough", "district", "bedrooms", "property_type", "furnish_type", "travel_zone"]
+# Columns aggregated; price_per_sqft is derived from price_gbp and size_sqft_max
+MEASURES = ["price_gbp", "price_per_sqft", "size_sqft_max", "pricing_index"]
+STATS = ["count", "sum", "min", "max", "median"]
+# Cuboids (group-bys) are materialized for every combination of up to this many dimensions
+MAX_CUBOID_DIMENSIONS = 2
+
+
+def aggregate_name(func: str, measure: Optional[str]) -> str:
+    """Result column of an aggregate, as named by the fast query engine: "count" or "<func>_<measure>"."""
+    return "count" if func == "count" else f"{func}_{measure}"
+
+
+class Cuboid:
+    """One group-by of the cube: per group, the row count and count/sum/min/max/median of each measure."""
+
+    def __init__(self, dimensions: Tuple[str, ...], frame: pd.DataFrame, measures: Sequence[str]):
+        self.dimensions = dimensions
+        if dimensions:
+            grouped = frame.groupby(list(dimensions), observed=True, sort=True)
+            stats = grouped[list(measures)].agg(STATS)
+            rows = grouped.size()
+            self.keys = {d: stats.index.get_level_values(d).to_numpy(dtype=object) for d in dimensions}
+            self.key_index = stats.index
+        else:
+            stats = frame[list(measures)].agg(STATS).unstack().to_frame().T
+            rows = pd.Series([len(frame)])
+            self.keys, self.key_index = {}, None
+        self.rows = rows.to_numpy(dtype=np.int64)
+        self.stats = {(m, s): stats[(m, s)].to_numpy(dtype=float) for m in measures for s in STATS}
+
+
+class ListingAnalyzer:
+    """
+    Aggregate cube over the listings, for mean/median/min/max/sum/count questions grouped or filtered by
+    DIMENSIONS.
+
+    All cuboids of up to MAX_CUBOID_DIMENSIONS dimensions are materialized once, when the analyzer is
+    built, each in a single group-by computing every statistic of every measure. A question then only
+    touches the one cuboid holding its group-by and filter dimensions: exact lookups for single values,
+    and a re-aggregation of a handful of cuboid rows when a filter spans several values (for instance
+    "flats" covering both flats and apartments). Medians cannot be combined across groups, so such
+    questions, and questions over more dimensions than were materialized, return None and are left to
+    the caller's row-level path.
+    """
+
+    def __init__(self, df: pd.DataFrame, dimensions: Sequence[str] = DIMENSIONS, measures: Sequence[str] = MEASURES,
+                 max_dimensions: int = MAX_CUBOID_DIMENSIONS):
+        self.dimensions = [d for d in dimensions if d in df.columns]
+        frame = pd.DataFrame({d: df[d] for d in self.dimensions})
+        for measure in measures:
+            if measure in df.columns:
+                frame[measure] = pd.to_numeric(df[measure], errors="coerce")
+        if "price_per_sqft" in measures and {"price_gbp", "size_sqft_max"}.issubset(df.columns):
+            size = pd.to_numeric(df["size_sqft_max"], errors="coerce")
+            frame["price_per_sqft"] = (pd.to_numeric(df["price_gbp"], errors="coerce") / size).where(size > 0)
+        self.measures = [m for m in measures if m in frame.columns]
+
+        self.cuboids: Dict[Tuple[str, ...], Cuboid] = {}
+        for count in range(max_dimensions + 1):
+            for dims in combinations(self.dimensions, count):
+                self.cuboids[dims] = Cuboid(dims, frame, self.measures)
+        self._levels = {d: pd.Series(frame[d].dropna().unique()) for d in self.dimensions}
+
+    def levels(self, dimension: str) -> pd.Series:
+        """Distinct (non-null) values of a dimension."""
+        return self._levels[dimension]
+
+    def rollup(self, func: str, measure: Optional[str] = None, by: Optional[str] = None,
+               where: Optional[Dict[str, Iterable]] = None) -> Optional[pd.DataFrame]:
+        """
+        Answer an aggregate from the cube.
+
+        Args:
+            func (str): "count", "sum", "mean", "median", "min" or "max".
+            measure (str, optional): One of the measures; ignored for "count", which counts listings.
+            by (str, optional): Dimension to group by.
+            where (dict, optional): Dimension -> accepted values; listings must match all of them.
+
+        Returns:
+            Optional[pd.DataFrame]: [by, name] rows in `by` order, or a one-row [name] frame without `by`,
+                                    with `name` from `aggregate_name`. None when the cube cannot answer.
+        """
+        where = where or {}
+        if func != "count" and measure not in self.measures:
+            return None
+        dims = tuple(d for d in self.dimensions if d in where or d == by)
+        if len(dims) != len(set(where) | ({by} if by else set())):
+            return None  # an unknown dimension
+        cuboid = self.cuboids.get(dims)
+        if cuboid is None:
+            return None
+
+        positions = np.arange(len(cuboid.rows))
+        for dimension, accepted in where.items():
+            accepted = np.asarray(list(accepted), dtype=object)
+            positions = positions[np.isin(cuboid.keys[dimension][positions], accepted)]
+        name = aggregate_name(func, measure)
+
+        if by is None:
+            value = self._combine(cuboid, func, measure, positions)
+            return None if value is None else pd.DataFrame({name: [value]})
+
+        groups = cuboid.keys[by][positions]
+        if len(where) and len(pd.unique(groups)) < len(groups):
+            # Filters spanning several values: several cuboid rows per group, combined per group
+            order, inverse = np.unique(groups, return_inverse=True)
+            values = self._combine_groups(cuboid, func, measure, positions, inverse, len(order))
+            return None if values is None else pd.DataFrame({by: order, name: values})
+        values = cuboid.rows[positions] if func == "count" else self._stat(cuboid, func, measure)[positions]
+        return pd.DataFrame({by: groups, name: values})
+
+    @staticmethod
+    def _stat(cuboid: Cuboid, func: str, measure: str) -> np.ndarray:
+        if func == "mean":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return cuboid.stats[(measure, "sum")] / np.where(cuboid.stats[(measure, "count")] > 0,
+                                                                  cuboid.stats[(measure, "count")], np.nan)
+        return cuboid.stats[(measure, func)]
+
+    def _combine_groups(self, cuboid: Cuboid, func: str, measure: Optional[str], positions: np.ndarray,
+                        inverse: np.ndarray, n_groups: int) -> Optional[np.ndarray]:
+        """`_combine` for every group at once; `inverse` maps each position to its group."""
+        if func == "count":
+            return np.bincount(inverse, weights=cuboid.rows[positions], minlength=n_groups).astype(np.int64)
+        if func == "median":
+            return None
+        counts = np.bincount(inverse, weights=cuboid.stats[(measure, "count")][positions], minlength=n_groups)
+        sums = np.bincount(inverse, weights=np.nan_to_num(cuboid.stats[(measure, "sum")][positions]),
+                           minlength=n_groups)
+        if func == "sum":
+            return sums
+        if func == "mean":
+            return np.where(counts > 0, sums / np.where(counts > 0, counts, 1), np.nan)
+        reduce, start = (np.minimum, np.inf) if func == "min" else (np.maximum, -np.inf)
+        combined = np.full(n_groups, start)
+        reduce.at(combined, inverse, np.nan_to_num(cuboid.stats[(measure, func)][positions], nan=start))
+        return np.where(counts > 0, combined, np.nan)
+
+    def _combine(self, cuboid: Cuboid, func: str, measure: Optional[str], positions: np.ndarray):
+        """One aggregate over several cuboid rows, or None if it cannot be derived from them (medians)."""
+        if func == "count":
+            return int(cuboid.rows[positions].sum())
+        if len(positions) == 1:
+            return float(self._stat(cuboid, func, measure)[positions[0]])
+        counts = cuboid.stats[(measure, "count")][positions]
+        if func == "sum":
+            return float(cuboid.stats[(measure, "sum")][positions].sum())
+        if func == "mean":
+            return float(cuboid.stats[(measure, "sum")][positions].sum() / counts.sum()) if counts.sum() else np.nan
+        if func in ("min", "max"):
+            values = cuboid.stats[(measure, func)][positions][counts > 0]
+            return float(values.min() if func == "min" else values.max()) if len(values) else np.nan
+        if func == "median" and len(positions) == 0:
+            return np.nan
+        return None
+
+    # Shortcuts for the usual questions
+    def avg_price_per_bedroom(self) -> pd.DataFrame:
+        return self.rollup("mean", "price_gbp", by="bedrooms")
+
+    def count_by_type(self) -> pd.DataFrame:
+        return self.rollup("count", by="property_type")
+
+    def furnishing_distribution(self) -> pd.DataFrame:
+        counts = self.rollup("count", by="furnish_type")
+        return counts.assign(percentage=counts["count"] / counts["count"].sum()).drop(columns="count")
+
+    def median_price_per_sqft_by_borough(self) -> pd.DataFrame:
+        return self.rollup("median", "price_per_sqft", by="borough")
@@ -1,13 +1,95 @@
-import openai
-from prompts.classifiers import spam_prompt, task_prompt
+from prompts.classifiers import combined_prompt
 from openai.types.chat import ChatCompletionUserMessageParam
-from dotenv import load_dotenv
-import os
+from collections import deque
+from typing import Optional, Union
+import json
+
+from src.llm_client import get_openai_client, get_async_openai_client
+
+
+# Structured output schema for the combined relevance + intent + rewrite classification
+CLASSIFICATION_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "query_classification",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "relevant": {"type": "boolean"},
+                "action": {"type": "string", "enum": ["output", "plot_stats", "geospatial_plot"]},
+                "standalone_query": {"type": "string"},
+            },
+            "required": ["relevant", "action", "standalone_query"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def format_history(history: Optional[Union[deque, list]]) -> str:
+    """
+    Renders the conversation history as "User:/Assistant:" lines.
 
-load_dotenv()
+    Args:
+        history (deque or list, optional): Chat messages with "role" and "content" keys, the latest
+                                           user query being the last one.
 
-# Initialize the OpenAI client using the API key from environment variables
-official_ai = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    Returns:
+        str: The formatted history, or an empty string when there is nothing to contextualize.
+    """
+    # A single message is the query itself, there is no earlier context
+    if not history or len(history) < 2:
+        return ""
+    lines = []
+    for msg in history:
+        role = "User" if msg["role"] == "user" else "Assistant"
+        lines.append(f"{role}: {msg['content']}")
+    return "\n".join(lines)
+
+
+def _classification_request(query: str, history_text: str) -> dict:
+    """Build the chat completion arguments for the combined classification call."""
+    return dict(
+        model="gpt-4.1-mini",
+        messages=[ChatCompletionUserMessageParam(role="user", content=combined_prompt(query, history_text))],
+        temperature=0,
+        max_tokens=500,
+        response_format=CLASSIFICATION_FORMAT,
+    )
+
+
+def _parse_classification(content: str, query: str, history_text: str) -> dict:
+    decision = json.loads(content)
+    # Without history there is nothing to rewrite, keep the user's own wording
+    if not history_text or not decision.get("standalone_query", "").strip():
+        decision["standalone_query"] = query
+    return decision
+
+
+def classify_query(query: str, history: Optional[Union[deque, list]] = None) -> dict:
+    """
+    Classifies relevance and intent of a query and rewrites it as a standalone query in a single LLM call.
+
+    Args:
+        query (str): The latest user query.
+        history (deque or list, optional): The conversation history used to contextualize the query.
+
+    Returns:
+        dict: {"relevant": bool, "action": "output" | "plot_stats" | "geospatial_plot", "standalone_query": str}
+    """
+    history_text = format_history(history)
+    # One structured-output call replaces the relevance, intent and rewrite round trips
+    response = get_openai_client().chat.completions.create(**_classification_request(query, history_text))
+    return _parse_classification(response.choices[0].message.content, query, history_text)
+
+
+async def aclassify_query(query: str, history: Optional[Union[deque, list]] = None) -> dict:
+    """Async variant of `classify_query` using the shared pooled client."""
+    history_text = format_history(history)
+    client = get_async_openai_client()
+    response = await client.chat.completions.create(**_classification_request(query, history_text))
+    return _parse_classification(response.choices[0].message.content, query, history_text)
 
 
 def is_uae_real_estate_query(query: str) -> bool:
@@ -20,22 +102,7 @@ def is_uae_real_estate_query(query: str) -> bool:
     Returns:
         bool: True if the query is classified as related to London real estate, False otherwise.
     """
-    # Generate a prompt for the query using the spam_prompt function
-    prompt = spam_prompt(query)
-
-    # Send the prompt to the OpenAI API and get the response
-    response = official_ai.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[ChatCompletionUserMessageParam(role="user", content=prompt)],
-        temperature=0,
-        max_tokens=3,
-    )
-
-    # Extract and normalize the decision from the API response
-    decision = response.choices[0].message.content.strip().lower()
-
-    # Return True if the decision is "yes", otherwise False
-    return decision == "yes"
+    return classify_query(query)["relevant"]
 
 
 def llm_classifier(query: str) -> str:
@@ -48,22 +115,14 @@ def llm_classifier(query: str) -> str:
     Returns:
         str: The classification result as a string.
     """
-    # Generate a prompt for the query using the task_prompt function
-    prompt = task_prompt(query)
+    return classify_query(query)["action"]
 
-    # Send the prompt to the OpenAI API and get the response
-    response = official_ai.chat.completions.create(
-        model="gpt-4.1-mini",
-        messages=[ChatCompletionUserMessageParam(role="user", content=prompt)],
-        temperature=0,
-        max_tokens=10,
-    )
 
-    # Extract, clean, and normalize the decision from the API response
-    decision = response.choices[0].message.content.strip().strip('"').lower()
+async def ais_uae_real_estate_query(query: str) -> bool:
+    """Async variant of `is_uae_real_estate_query`."""
+    return (await aclassify_query(query))["relevant"]
 
-    # Print the decision for debugging purposes
-    print(decision)
 
-    # Return the classification result
-    return decision
+async def allm_classifier(query: str) -> str:
+    """Async variant of `llm_classifier`."""
+    return (await aclassify_query(query))["action"]
@@ -0,0 +1,328 @@
+import ast
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from src.response_cache import normalize_query
+
+# Result types whose value can be recomputed later ("plot" results are image files written by the code)
+CACHEABLE_TYPES = ("dataframe", "number", "string")
+ALLOWED_IMPORTS = {"pandas", "numpy", "math", "datetime", "re", "json"}
+FORBIDDEN_NAMES = {"open", "exec", "eval", "compile", "__import__", "globals", "locals", "vars", "getattr",
+                   "setattr", "delattr", "input", "breakpoint", "exit", "quit"}
+# pandas / numpy methods that read or write files (pandas' `read_*` readers are rejected by prefix), and
+# formatters that only write when given a path or buffer (without one they return the text)
+FILE_METHODS = {"to_pickle", "to_excel", "to_hdf", "to_sql", "to_feather", "to_stata", "to_clipboard", "tofile",
+                "load", "save", "savez", "savez_compressed", "savetxt", "loadtxt", "genfromtxt", "fromfile",
+                "memmap", "DataSource", "ExcelWriter", "HDFStore"}
+PATH_METHODS = {"to_csv", "to_json", "to_parquet", "to_orc", "to_xml", "to_html", "to_latex", "to_markdown",
+                "to_string"}
+PATH_ARGUMENTS = {"path", "path_or_buf", "buf", "fname", "excel_writer", "con"}
+# Names bound to modules in the code's environment (see `execute_generated_code`)
+ENVIRONMENT_MODULES = {"pd": "pandas", "np": "numpy"}
+
+
+class CodeValidationError(ValueError):
+    """Generated code that cannot be cached or re-executed."""
+
+
+def schema_hash(frame: pd.DataFrame) -> str:
+    """Short digest of a frame's column names and dtypes; cached programs are only reused on the same schema."""
+    schema = ",".join(f"{name}:{dtype}" for name, dtype in frame.dtypes.items())
+    return hashlib.sha1(schema.encode()).hexdigest()[:16]
+
+
+def table_name(frame: pd.DataFrame) -> Optional[str]:
+    """Table name PandasAI uses for a frame in generated SQL (the dataset schema's name)."""
+    schema = getattr(frame, "schema", None)
+    return getattr(schema, "name", None)
+
+
+def _is_module(module_name: str, attribute: Optional[str] = None) -> bool:
+    module = importlib.import_module(module_name)
+    return inspect.ismodule(getattr(module, attribute, None) if attribute else module)
+
+
+def validate_code(code: str) -> str:
+    """
+    Check that generated code looks like a pure computation before it is cached: imports only from
+    ALLOWED_IMPORTS (top-level modules, no submodules), no file or dynamic-code builtins, no dunder
+    attributes, no attribute chains through submodules (`pd.io.common.os`), no pandas / numpy file I/O
+    (`read_*`, `to_csv(path)`, `np.load`, ...), and an assignment to `result`.
+
+    This is a sanity filter on what gets stored and re-run, not a sandbox: Python cannot be made safe by
+    inspecting its AST. The isolation of generated code comes from running it in the code pool's workers
+    (`src/code_pool.py`) with time and memory limits.
+
+    Returns:
+        str: The code, unchanged.
+
+    Raises:
+        CodeValidationError: If the code does not parse or uses anything outside that subset.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        raise CodeValidationError(f"Invalid code: {e}") from e
+    modules = dict(ENVIRONMENT_MODULES)
+    called = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+    assigns_result = False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name not in ALLOWED_IMPORTS:
+                    raise CodeValidationError(f"Import of {alias.name} is not allowed")
+                modules[alias.asname or alias.name] = alias.name
+        elif isinstance(node, ast.ImportFrom):
+            if node.module not in ALLOWED_IMPORTS or node.level:
+                raise CodeValidationError(f"Import from {node.module} is not allowed")
+            for alias in node.names:
+                if alias.name == "*" or _is_module(node.module, alias.name):
+                    raise CodeValidationError(f"Import of {node.module}.{alias.name} is not allowed")
+        if isinstance(node, ast.Name) and node.id in FORBIDDEN_NAMES:
+            raise CodeValidationError(f"Use of {node.id} is not allowed")
+        if isinstance(node, ast.Attribute):
+            if node.attr.startswith("__"):
+                raise CodeValidationError(f"Access to {node.attr} is not allowed")
+            if node.attr.startswith("read_") or node.attr in FILE_METHODS:
+                raise CodeValidationError(f"File access through {node.attr} is not allowed")
+            if node.attr in PATH_METHODS and (id(node) not in called or _writes_to_path(tree, node)):
+                raise CodeValidationError(f"File access through {node.attr} is not allowed")
+            if isinstance(node.value, ast.Name) and node.value.id in modules \
+                    and _is_module(modules[node.value.id], node.attr):
+                raise CodeValidationError(f"Access to module {node.value.id}.{node.attr} is not allowed")
+        if isinstance(node, ast.Name) and node.id == "result" and isinstance(node.ctx, ast.Store):
+            assigns_result = True
+    if not assigns_result:
+        raise CodeValidationError("The code does not assign `result`")
+    return code
+
+
+def _writes_to_path(tree: ast.AST, method: ast.Attribute) -> bool:
+    """Whether the call of a `PATH_METHODS` formatter passes a path or buffer (its first argument)."""
+    call = next(node for node in ast.walk(tree) if isinstance(node, ast.Call) and node.func is method)
+    return bool(call.args) or any(keyword.arg in PATH_ARGUMENTS or keyword.arg is None for keyword in call.keywords)
+
+
+def execute_generated_code(code: str, frame, tables: List[str], threads: Optional[int] = None) -> dict:
+    """
+    Run PandasAI-generated code locally against a frame.
+
+    The code's `execute_sql_query` runs on an in-memory DuckDB connection where the frame (a DataFrame or
+    an Arrow table) is registered under every name in `tables`, as PandasAI's own executor does for a
+    local dataset. `threads` caps DuckDB's threads (all cores by default).
+
+    Returns:
+        dict: The code's `result`, {"type", "value"}.
+
+    Raises:
+        CodeValidationError: If the code does not set a well-formed `result`.
+    """
+    conn = duckdb.connect(config={"threads": threads} if threads else {})
+    try:
+        for name in dict.fromkeys(t for t in tables if t):
+            conn.register(name, frame)
+
+        def execute_sql_query(sql_query: str) -> pd.DataFrame:
+            return conn.execute(sql_query).df()
+
+        environment = {"pd": pd, "np": np, "execute_sql_query": execute_sql_query}
+        exec(code, environment)
+    finally:
+        conn.close()
+    result = environment.get("result")
+    if not isinstance(result, dict) or "type" not in result or "value" not in result:
+        raise CodeValidationError("The code did not set result = {'type': ..., 'value': ...}")
+    return result
+
+
+def result_fingerprint(value: Any) -> str:
+    """JSON form of a result value, to compare the local re-execution with PandasAI's own result."""
+    if isinstance(value, pd.DataFrame):
+        return value.reset_index(drop=True).to_json(orient="split", double_precision=6)
+    if isinstance(value, pd.Series):
+        return value.reset_index(drop=True).to_json(orient="split", double_precision=6)
+    if isinstance(value, (float, np.floating)):
+        return json.dumps(round(float(value), 6))
+    return json.dumps(value, default=str)
+
+
+class CodeCache:
+    """
+    On-disk cache of PandasAI-generated programs, safe to share between worker processes.
+
+    Programs are keyed on the normalized query, the action and the schema hash of the dataframe they ran
+    on, not on the dataset snapshot: the code GPT-4 writes for "median rent per borough for 2-bed flats"
+    stays valid when the rows change, so a repeated question is answered by re-running the cached code
+    locally on the current frame, with no LLM call. Only programs that passed `validate_code` and whose
+    local re-execution reproduced PandasAI's result are stored.
+
+    Programs are evicted least-recently-used above `max_entries`, and when they fail on a later frame.
+    Pinned programs (known-good ones, see `pin`) are never evicted.
+
+    Programs run in this process by default; an `executor(code, tables)` running them elsewhere on the
+    same dataset (e.g. `CodePool.run_pandas`) can be given instead.
+    """
+
+    def __init__(self, path: str, max_entries: int = 500,
+                 executor: Optional[Callable[[str, List[str]], dict]] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.executor = executor
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS programs (
+                    key TEXT PRIMARY KEY,
+                    query TEXT NOT NULL,
+                    action TEXT NOT NULL,
+                    schema TEXT NOT NULL,
+                    table_name TEXT,
+                    code TEXT NOT NULL,
+                    pinned INTEGER NOT NULL DEFAULT 0,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS programs_accessed ON programs (accessed_at)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def key(query: str, action: str, schema: str) -> str:
+        return hashlib.sha1(f"{normalize_query(query)}\x1f{action}\x1f{schema}".encode()).hexdigest()
+
+    def get(self, query: str, action: str, schema: str) -> Optional[dict]:
+        """The cached program for a question, {"code", "table_name", "pinned", ...}, or None."""
+        key = self.key(query, action, schema)
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM programs WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE programs SET accessed_at = ?, hits = hits + 1 WHERE key = ?",
+                             (time.time(), key))
+        return dict(row) if row is not None else None
+
+    def put(self, query: str, action: str, schema: str, code: str, table: Optional[str] = None,
+            pinned: bool = False):
+        """Store a program (replacing the previous one for the question) and evict above `max_entries`."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO programs (key, query, action, schema, table_name, code, pinned, hits, "
+                "created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?, ?)",
+                (self.key(query, action, schema), normalize_query(query), action, schema, table, code,
+                 int(pinned), now, now))
+            conn.execute(
+                "DELETE FROM programs WHERE rowid IN (SELECT rowid FROM programs WHERE pinned = 0 "
+                "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (max(self.max_entries - self._pinned(conn), 0),))
+
+    @staticmethod
+    def _pinned(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT COUNT(*) FROM programs WHERE pinned = 1").fetchone()[0]
+
+    def discard(self, query: str, action: str, schema: str, force: bool = False) -> bool:
+        """Drop a program that stopped working; pinned programs are kept unless `force`. True if removed."""
+        with self._connect() as conn:
+            removed = conn.execute(
+                "DELETE FROM programs WHERE key = ? AND (pinned = 0 OR ?)",
+                (self.key(query, action, schema), int(force))).rowcount
+        return bool(removed)
+
+    def pin(self, query: str, action: str, schema: Optional[str] = None, pinned: bool = True) -> int:
+        """
+        Pin (or unpin) the programs of a question, for every schema unless `schema` is given.
+
+        Returns:
+            int: The number of programs changed.
+        """
+        sql, params = "UPDATE programs SET pinned = ? WHERE query = ? AND action = ?", \
+            [int(pinned), normalize_query(query), action]
+        if schema is not None:
+            sql, params = sql + " AND schema = ?", params + [schema]
+        with self._connect() as conn:
+            return conn.execute(sql, params).rowcount
+
+    def programs(self) -> List[dict]:
+        """Every stored program, most recently used first."""
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute("SELECT * FROM programs ORDER BY accessed_at DESC")]
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            entries, pinned, hits = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(pinned), 0), COALESCE(SUM(hits), 0) FROM programs").fetchone()
+        return {"entries": entries, "pinned": pinned, "hits": hits}
+
+    def _execute(self, code: str, frame: pd.DataFrame, tables: List[str]) -> dict:
+        if self.executor is not None:
+            return self.executor(code, tables)
+        return execute_generated_code(code, frame, tables)
+
+    def run(self, query: str, action: str, frame: pd.DataFrame) -> Optional[dict]:
+        """
+        Answer a question from its cached program, executed locally on `frame`.
+
+        Returns:
+            Optional[dict]: {"type", "value"}, or None on a miss. A program that fails on this frame is
+                            discarded (unless pinned) and None is returned, so the caller asks PandasAI again.
+        """
+        schema = schema_hash(frame)
+        program = self.get(query, action, schema)
+        if program is None:
+            return None
+        try:
+            return self._execute(program["code"], frame, [program["table_name"], table_name(frame)])
+        except Exception as e:
+            print(f"Cached program for {query!r} failed, discarding it: {e}")
+            self.discard(query, action, schema)
+            return None
+
+    def remember(self, query: str, action: str, frame: pd.DataFrame, response: dict) -> bool:
+        """
+        Validate and store the program behind a successful PandasAI response.
+
+        The code is checked with `validate_code`, then re-executed once locally; it is only stored if that
+        reproduces PandasAI's value.
+
+        Args:
+            response (dict): `pai.DataFrame.chat(...).to_dict()`: value, type, last_code_executed, error.
+
+        Returns:
+            bool: True if the program was stored.
+        """
+        code = response.get("last_code_executed")
+        if response.get("error") is not None or not code or response.get("type") not in CACHEABLE_TYPES:
+            return False
+        table = table_name(frame)
+        try:
+            validate_code(code)
+            local = self._execute(code, frame, [table])
+        except Exception as e:
+            print(f"Generated code for {query!r} not cached: {e}")
+            return False
+        if result_fingerprint(local["value"]) != result_fingerprint(response["value"]):
+            print(f"Generated code for {query!r} not cached: local result differs")
+            return False
+        self.put(query, action, schema_hash(frame), code, table)
+        return True
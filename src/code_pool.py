@@ -0,0 +1,285 @@
+import multiprocessing
+import os
+import queue
+import resource
+import sys
+import threading
+import types
+from contextlib import contextmanager
+from multiprocessing.connection import Connection
+from typing import Any, Callable, List, Optional
+
+import pandas as pd
+import plotly.express as px
+
+from pandasai.exceptions import CodeExecutionError
+from pandasai.sandbox import Sandbox
+
+from src.code_cache import execute_generated_code
+
+# Wall time a job may take before its worker is killed and replaced, CPU seconds per job, and the memory a
+# worker may allocate on top of its baseline once started (interpreter, libraries, its copy of the dataset;
+# the memory-mapped Arrow snapshot is shared and not counted), all enforced inside the worker with rlimits
+TIMEOUT_SECONDS = float(os.getenv("CODE_POOL_TIMEOUT_SECONDS", "15"))
+CPU_SECONDS = int(os.getenv("CODE_POOL_CPU_SECONDS", "10"))
+MEMORY_MB = int(os.getenv("CODE_POOL_MEMORY_MB", "2048"))
+
+
+class GeneratedCodeError(RuntimeError):
+    """Generated code that raised, or whose worker was killed for exceeding a limit."""
+
+
+class GeneratedCodeTimeout(GeneratedCodeError):
+    """Generated code that ran past the pool's wall-time limit."""
+
+
+class _FigureRecorder:
+    """Stands in for `streamlit` in plot code: keeps the figures passed to `plotly_chart`, ignores the rest."""
+
+    def __init__(self):
+        self.figures = []
+
+    def plotly_chart(self, fig, *args, **kwargs):
+        self.figures.append(fig)
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def _worker_dataset():
+    """The shared dataset as this worker queries it: the memory-mapped Arrow table when there is one."""
+    from src.dataset import get_dataset
+    handle = get_dataset()
+    if handle.columnar is not None:
+        try:
+            return handle.columnar.table
+        except OSError:
+            pass
+    return handle.frame
+
+
+def _data_bytes() -> Optional[int]:
+    """This process's data segment (VmData, what RLIMIT_DATA limits), or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmData:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _run_plot(code: str, data) -> List[str]:
+    st = _FigureRecorder()
+    exec(code, {"pd": pd, "px": px, "st": st, "df": data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)})
+    return [fig.to_json() for fig in st.figures]
+
+
+def _worker_main(conn: Connection, memory_mb: int, cpu_seconds: int, preload: bool,
+                 load_dataset: Callable[[], Any] = _worker_dataset):
+    """Worker loop: receive (kind, payload) jobs and send back ("ok", value) or ("error", message)."""
+    dataset = None
+    if preload:
+        try:
+            dataset = load_dataset()
+        except Exception as e:
+            print(f"Code pool worker could not preload the dataset: {e}")
+    if memory_mb:
+        # Headroom above what the worker already uses, so the limit means the same whatever was loaded
+        limit = (_data_bytes() or 0) + memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+    while True:
+        try:
+            kind, payload = conn.recv()
+        except (EOFError, OSError):
+            return
+        if cpu_seconds:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            # Exceeding the soft limit raises SIGXCPU, which kills the worker; the pool replaces it
+            soft = int(usage.ru_utime + usage.ru_stime) + cpu_seconds
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, resource.getrlimit(resource.RLIMIT_CPU)[1]))
+        try:
+            if kind == "plot":
+                value = _run_plot(**payload)
+            elif kind == "pandas":
+                if dataset is None:
+                    dataset = load_dataset()
+                value = execute_generated_code(payload["code"], dataset, payload["tables"], threads=1)
+            else:
+                raise ValueError(f"Unknown job kind {kind!r}")
+            message = ("ok", value)
+        except BaseException as e:
+            message = ("error", f"{type(e).__name__}: {e}")
+        try:
+            conn.send(message)
+        except Exception as e:
+            # e.g. a result that cannot be pickled
+            conn.send(("error", f"Result could not be returned: {e}"))
+
+
+_start_lock = threading.Lock()
+
+
+@contextmanager
+def _without_main_script():
+    """
+    Start processes with a blank `__main__`. Streamlit runs the app script as `__main__`, and a
+    "forkserver" or "spawn" child re-runs the main script before the worker function; workers only need
+    this module.
+    """
+    with _start_lock:
+        main = sys.modules.get("__main__")
+        sys.modules["__main__"] = types.ModuleType("__main__")
+        try:
+            yield
+        finally:
+            sys.modules["__main__"] = main
+
+
+class _Worker:
+    def __init__(self, process, conn: Connection):
+        self.process = process
+        self.conn = conn
+
+    def stop(self):
+        self.conn.close()
+        self.process.kill()
+        self.process.join(timeout=1)
+
+
+class CodePool:
+    """
+    Pre-started worker processes executing LLM-generated pandas and Plotly code outside the caller.
+
+    Workers are started up front from a fork server, a clean single-threaded process that has imported
+    pandas, Plotly and DuckDB once: starting or replacing a worker from a busy, multi-threaded app process
+    never forks that process, so no worker inherits a lock held by one of its threads (SQLite, HTTP
+    clients, the event loop). Each worker maps the dataset once (the Arrow snapshot is memory-mapped, so
+    its pages are shared by all workers through the OS page cache). A job goes to an idle worker and
+    blocks only its caller: a slow or runaway snippet neither holds the Streamlit script thread nor the
+    GIL of the app process, and as many snippets run at once as there are workers.
+
+    Each job is bounded by `timeout` seconds of wall time (the worker is killed and replaced), by
+    `cpu_seconds` of CPU time and by `memory_mb` of memory allocated above the worker's baseline once it
+    has loaded the dataset (rlimits inside the worker; exceeding them kills the worker or raises
+    MemoryError). `load_dataset` is the module-level function workers load their dataset with. Results
+    come back pickled: Plotly figures as JSON, PandasAI results as their {"type", "value"} dict.
+    """
+
+    def __init__(self, workers: Optional[int] = None, timeout: float = TIMEOUT_SECONDS,
+                 cpu_seconds: int = CPU_SECONDS, memory_mb: int = MEMORY_MB, preload: bool = True,
+                 load_dataset: Callable[[], Any] = _worker_dataset):
+        self.size = workers or min(4, os.cpu_count() or 1)
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.preload = preload
+        self.load_dataset = load_dataset
+        # Never "fork": the pool is created and refilled from request threads, while the event-loop thread,
+        # the fetch pools and Streamlit's threads may hold locks a forked child would inherit held
+        self._context = multiprocessing.get_context(
+            "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+        if self._context.get_start_method() == "forkserver":
+            # The fork server imports this module (pandas, Plotly, DuckDB, PandasAI) once for all workers
+            self._context.set_forkserver_preload([__name__])
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(self.size):
+            self._idle.put(self._start_worker())
+
+    def _start_worker(self) -> _Worker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, args=(child_conn, self.memory_mb, self.cpu_seconds, self.preload, self.load_dataset),
+            daemon=True)
+        with _without_main_script():
+            process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def submit(self, kind: str, payload: dict, timeout: Optional[float] = None) -> Any:
+        """
+        Run one job on the next idle worker, waiting for one if all are busy.
+
+        Raises:
+            GeneratedCodeTimeout: If the job ran longer than `timeout` (the pool's by default).
+            GeneratedCodeError: If the code raised or its worker died (CPU or memory limit).
+        """
+        if self._closed:
+            raise GeneratedCodeError("The code pool is closed")
+        timeout = self.timeout if timeout is None else timeout
+        worker = self._idle.get()
+        replace = True
+        try:
+            worker.conn.send((kind, payload))
+            if not worker.conn.poll(timeout):
+                raise GeneratedCodeTimeout(f"Generated code ran for more than {timeout:g}s")
+            status, value = worker.conn.recv()
+            replace = False
+        except (EOFError, OSError, BrokenPipeError):
+            raise GeneratedCodeError("Generated code exceeded its CPU or memory limit") from None
+        finally:
+            if replace or self._closed:
+                worker.stop()
+            if not self._closed:
+                self._idle.put(self._start_worker() if replace else worker)
+        if status == "error":
+            raise GeneratedCodeError(value)
+        return value
+
+    def run_plot(self, code: str, data, timeout: Optional[float] = None) -> List[str]:
+        """Execute plot code on `data` (a DataFrame or records, the code's `df`); returns each figure as Plotly JSON."""
+        return self.submit("plot", {"code": code, "data": data}, timeout)
+
+    def run_pandas(self, code: str, tables: List[str], timeout: Optional[float] = None) -> dict:
+        """Execute PandasAI code on the worker's dataset, registered under `tables`; returns its `result`."""
+        return self.submit("pandas", {"code": code, "tables": list(tables)}, timeout)
+
+    def close(self):
+        """Stop every worker."""
+        with self._lock:
+            self._closed = True
+            while True:
+                try:
+                    self._idle.get_nowait().stop()
+                except queue.Empty:
+                    break
+
+
+class PoolSandbox(Sandbox):
+    """PandasAI sandbox sending the code PandasAI generates to a `CodePool` instead of running it in-process."""
+
+    def __init__(self, pool: CodePool, tables: List[str]):
+        super().__init__()
+        self.pool = pool
+        self.tables = tables
+
+    def start(self):
+        self._started = True
+
+    def stop(self):
+        self._started = False
+
+    def _exec_code(self, code: str, environment: dict) -> dict:
+        try:
+            return self.pool.run_pandas(code, self.tables)
+        except GeneratedCodeError as e:
+            # PandasAI retries (regenerating the code) on CodeExecutionError
+            raise CodeExecutionError(str(e)) from e
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_code_pool() -> Optional[CodePool]:
+    """Process-wide code pool, or None when CODE_POOL=0 (generated code then runs in-process)."""
+    global _pool
+    if os.getenv("CODE_POOL", "1") == "0":
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = CodePool(workers=int(os.getenv("CODE_POOL_WORKERS", "0")) or None)
+        return _pool
@@ -0,0 +1,107 @@
+import os
+import threading
+from typing import List, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+# Low-cardinality string columns, stored dictionary-encoded and exposed to pandas as categoricals
+CATEGORICAL_COLUMNS = [
+    "borough", "district", "travel_zone", "furnish_type", "property_type", "let_type", "noise_level_class",
+    "council_tax_band", "deposit_included_or_not", "postcode_outcode", "listing_update_reason",
+    "nearest_station1_type", "nearest_station2_type", "nearest_station3_type",
+]
+# Long free-text columns, left out of frames unless asked for and readable row by row with `text`
+TEXT_COLUMNS = ["description", "property_features"]
+
+
+def _string_dtype(arrow_type: pa.DataType):
+    """Keep plain string columns Arrow-backed in pandas, so they stay in the memory-mapped buffers."""
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.StringDtype("pyarrow")
+    return None
+
+
+class ColumnarSnapshot:
+    """
+    Memory-mapped Arrow copy of a dataset snapshot's parquet file.
+
+    On first use the parquet file is converted once to an uncompressed Arrow IPC file in `cache_dir`
+    (named after the parquet file's size and mtime, so a new snapshot gets a new file), with the
+    CATEGORICAL_COLUMNS dictionary-encoded. The Arrow file is then memory-mapped: reading columns costs
+    no decoding, and every worker process mapping the same file shares its pages through the OS page
+    cache instead of holding a private copy. `frame` only materializes the requested columns, never
+    the TEXT_COLUMNS by default.
+    """
+
+    def __init__(self, parquet_path: str, cache_dir: str = ".cache/arrow",
+                 categorical: Sequence[str] = CATEGORICAL_COLUMNS, text: Sequence[str] = TEXT_COLUMNS):
+        self.parquet_path = parquet_path
+        self.cache_dir = cache_dir
+        self.categorical = list(categorical)
+        self.text_columns = list(text)
+        self._lock = threading.Lock()
+        self._table: Optional[pa.Table] = None
+
+    @property
+    def arrow_path(self) -> str:
+        stat = os.stat(self.parquet_path)
+        name = os.path.basename(os.path.dirname(os.path.abspath(self.parquet_path)))
+        return os.path.join(self.cache_dir, f"{name}-{stat.st_size}-{stat.st_mtime_ns}.arrow")
+
+    def _convert(self, arrow_path: str):
+        """Write the Arrow copy of the parquet file (one pass, replaced atomically)."""
+        schema = pq.read_schema(self.parquet_path)
+        dictionary = [c for c in self.categorical
+                      if c in schema.names and pa.types.is_string(schema.field(c).type)]
+        table = pq.read_table(self.parquet_path, read_dictionary=dictionary).unify_dictionaries().combine_chunks()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        staging = f"{arrow_path}.{os.getpid()}.tmp"
+        with pa.OSFile(staging, "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(staging, arrow_path)
+
+    @property
+    def table(self) -> pa.Table:
+        """The whole snapshot as a memory-mapped Arrow table, converted on first use."""
+        if self._table is None:
+            with self._lock:
+                if self._table is None:
+                    arrow_path = self.arrow_path
+                    if not os.path.exists(arrow_path):
+                        self._convert(arrow_path)
+                    self._table = ipc.open_file(pa.memory_map(arrow_path, "r")).read_all()
+        return self._table
+
+    @property
+    def columns(self) -> List[str]:
+        return self.table.schema.names
+
+    def frame(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        A pandas view of some columns.
+
+        Args:
+            columns (list of str, optional): Columns to read; unknown names are skipped. Defaults to every
+                                             column except the TEXT_COLUMNS.
+
+        Returns:
+            pd.DataFrame: Categorical columns as pandas categoricals, strings as Arrow-backed strings.
+        """
+        names = self.columns
+        if columns is None:
+            selected = [c for c in names if c not in self.text_columns]
+        else:
+            selected = [c for c in dict.fromkeys(columns) if c in names]
+        return self.table.select(selected).to_pandas(split_blocks=True, types_mapper=_string_dtype)
+
+    def reset(self):
+        """Unmap the table, so the next access converts and maps the current parquet file."""
+        with self._lock:
+            self._table = None
+
+    def text(self, column: str, positions: Sequence[int]) -> List[Optional[str]]:
+        """Values of a (text) column for some row positions, read from the mapped file on demand."""
+        return self.table.column(column).take(pa.array(positions, type=pa.int64())).to_pylist()
@@ -0,0 +1,334 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from src.property_cache import PropertyCache, get_property_cache, property_id
+from src.scrap_data import abandoned_credits, extract_assigned_json, fetch_page, get_parse_pool
+from src.utils.rate_limit import TokenBucket
+
+# Rightmove search results: 24 listings per page and at most 42 pages per search
+PAGE_SIZE = 24
+MAX_SEARCH_PAGES = 42
+
+PROPERTY_URL = "https://www.rightmove.co.uk/properties/{}"
+SEARCH_URL_RE = re.compile(
+    r"https?://(?:www\.)?rightmove\.co\.uk/(?:property-to-rent|property-for-sale|new-homes-for-sale)"
+    r"/[^\s,#?]*\.html(?:\?[^\s,#]*)?")
+
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", str(MAX_SEARCH_PAGES)))
+CRAWL_MAX_PROPERTIES = int(os.getenv("CRAWL_MAX_PROPERTIES", "500"))
+# Politeness: search pages requested per second across all crawls of this process
+CRAWL_PAGES_PER_SECOND = float(os.getenv("CRAWL_PAGES_PER_SECOND", "0.5"))
+CRAWL_BATCH_SIZE = int(os.getenv("CRAWL_BATCH_SIZE", str(PAGE_SIZE)))
+CRAWL_CHECKPOINT_DIR = os.getenv("CRAWL_CHECKPOINT_DIR", ".cache/crawl")
+CRAWL_CHECKPOINT_TTL_SECONDS = float(os.getenv("CRAWL_CHECKPOINT_TTL_SECONDS", str(6 * 3600)))
+
+PageFetcher = Callable[[str], Awaitable[Dict[str, Any]]]
+
+_DECODER = json.JSONDecoder()
+# Shared by every crawler of the process, so concurrent crawls stay within the politeness limit together
+_search_page_limiter = TokenBucket(rate=CRAWL_PAGES_PER_SECOND)
+
+
+def detect_rightmove_search_links(query: str) -> List[str]:
+    """Detect Rightmove search-result URLs (e.g. ".../property-to-rent/find.html?locationIdentifier=...") in a text."""
+    return list(dict.fromkeys(SEARCH_URL_RE.findall(query)))
+
+
+def search_page_url(search_url: str, index: int) -> str:
+    """The search URL with its query parameters sorted and the result offset set to `index`."""
+    parts = urlsplit(search_url)
+    params = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != "index")
+    if index:
+        params.append(("index", str(index)))
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(params), ""))
+
+
+def page_index(url: str) -> int:
+    return int(dict(parse_qsl(urlsplit(url).query)).get("index", 0) or 0)
+
+
+def _find_key(obj: Any, key: str) -> Any:
+    """First value stored under `key` anywhere in a decoded JSON document (depth first)."""
+    stack = [obj]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if key in node:
+                return node[key]
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return None
+
+
+def _next_data(html: str) -> Optional[Dict[str, Any]]:
+    """The JSON document of a Next.js page (`<script id="__NEXT_DATA__" type="application/json">`)."""
+    marker = html.find('id="__NEXT_DATA__"')
+    start = html.find("{", marker) if marker != -1 else -1
+    if start == -1:
+        return None
+    try:
+        data, _ = _DECODER.raw_decode(html, start)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def parse_search_page(html: str) -> Tuple[List[str], Optional[int]]:
+    """
+    Property ids listed on a search-result page and the total number of results of the search.
+
+    Reads the page's `jsonModel` (or Next.js `__NEXT_DATA__`) document and falls back to the property
+    links in the HTML when neither is present.
+
+    Returns:
+        tuple: (ids in page order without duplicates, result count or None if unknown).
+    """
+    model = extract_assigned_json(html, "jsonModel") or _next_data(html)
+    if model is None:
+        return list(dict.fromkeys(re.findall(r"/properties/(\d+)", html))), None
+
+    listings = _find_key(model, "properties") or []
+    ids = [str(item["id"]) for item in listings if isinstance(item, dict) and item.get("id")]
+    count = _find_key(model, "resultCount")
+    if count is None:
+        pagination = _find_key(model, "pagination")
+        if isinstance(pagination, dict) and isinstance(pagination.get("total"), int):
+            # "total" counts pages, not listings
+            count = pagination["total"] * PAGE_SIZE
+    try:
+        result_count = int(str(count).replace(",", "")) if count is not None else None
+    except ValueError:
+        result_count = None
+    return list(dict.fromkeys(ids)), result_count
+
+
+class CrawlReport:
+    """
+    Throughput and Scrapfly cost of a crawl-and-value run.
+
+    Credits include attempts that timed out and completed later (billed all the same); those are counted
+    process-wide, so runs overlapping in time share them.
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.abandoned_at_start = abandoned_credits()
+        self.search_pages = 0
+        self.failed_pages = 0
+        self.properties = 0
+        self.cached = 0
+        self.refreshed = 0
+        self.failed = 0
+        self.credits = 0
+
+    def add_page(self, page: Dict[str, Any]):
+        self.search_pages += 1
+        self.failed_pages += not page["ok"]
+        self.credits += page.get("cost") or 0
+
+    def add_property(self, result: Dict[str, Any]):
+        if result["ok"]:
+            self.properties += 1
+            # Stale cache hits are served from the cache but scraped again in the background: no fetch saved
+            self.cached += bool(result.get("cached")) and not result.get("stale")
+            self.refreshed += bool(result.get("stale"))
+        else:
+            self.failed += 1
+        self.credits += result.get("cost") or 0
+
+    def summary(self) -> dict:
+        """Counts plus properties per minute and Scrapfly credits per valued property."""
+        elapsed = time.monotonic() - self.started_at
+        credits = self.credits + abandoned_credits() - self.abandoned_at_start
+        return {
+            "properties": self.properties,
+            "cached": self.cached,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "search_pages": self.search_pages,
+            "failed_pages": self.failed_pages,
+            "credits": credits,
+            "elapsed_seconds": round(elapsed, 2),
+            "properties_per_minute": round(self.properties / elapsed * 60, 1) if elapsed else 0.0,
+            "cost_per_property": round(credits / self.properties, 2) if self.properties else None,
+        }
+
+
+class SearchCrawler:
+    """
+    Expand Rightmove search URLs into property URLs.
+
+    Each search has a frontier of result pages: the first page reveals the result count, from which
+    the remaining pages are queued (up to `max_pages`). Pages and property ids are deduplicated, page
+    requests share a token bucket, and the crawl state is checkpointed to disk after every page, so an
+    interrupted crawl resumes from its frontier and a finished one is reused for `checkpoint_ttl` seconds.
+    """
+
+    def __init__(self, fetch: PageFetcher = fetch_page, checkpoint_dir: Optional[str] = CRAWL_CHECKPOINT_DIR,
+                 max_pages: int = CRAWL_MAX_PAGES, max_properties: int = CRAWL_MAX_PROPERTIES,
+                 rate_limiter: Optional[TokenBucket] = None,
+                 checkpoint_ttl: float = CRAWL_CHECKPOINT_TTL_SECONDS):
+        self.fetch = fetch
+        self.checkpoint_dir = checkpoint_dir
+        self.max_pages = min(max_pages, MAX_SEARCH_PAGES)
+        self.max_properties = max_properties
+        self.rate_limiter = rate_limiter or _search_page_limiter
+        self.checkpoint_ttl = checkpoint_ttl
+
+    def _checkpoint_path(self, search_url: str) -> Optional[str]:
+        if not self.checkpoint_dir:
+            return None
+        digest = hashlib.sha1(search_page_url(search_url, 0).encode()).hexdigest()[:16]
+        return os.path.join(self.checkpoint_dir, f"{digest}.json")
+
+    def _load(self, search_url: str) -> Optional[dict]:
+        path = self._checkpoint_path(search_url)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get("done") and time.time() - state.get("updated_at", 0) > self.checkpoint_ttl:
+            return None
+        return state
+
+    def _save(self, search_url: str, state: dict):
+        path = self._checkpoint_path(search_url)
+        if not path:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        state["updated_at"] = time.time()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    async def iter_property_urls(self, search_url: str,
+                                 report: Optional[CrawlReport] = None) -> AsyncIterator[List[str]]:
+        """
+        Crawl one search and yield the property URLs found on each result page.
+
+        Args:
+            search_url (str): A Rightmove search-result URL.
+            report (CrawlReport, optional): Receives the search pages fetched and their cost.
+
+        Yields:
+            list of str: New property URLs of a page (never repeated within the search), at most
+                         `max_properties` in total. A resumed crawl first yields the ids found before.
+        """
+        state = self._load(search_url) or {
+            "search_url": search_url, "frontier": [search_page_url(search_url, 0)],
+            "seen": [], "property_ids": [], "done": False,
+        }
+        seen, known = set(state["seen"]), dict.fromkeys(state["property_ids"])
+        if known:
+            yield [PROPERTY_URL.format(pid) for pid in known]
+
+        loop = asyncio.get_running_loop()
+        while state["frontier"] and len(known) < self.max_properties:
+            url = state["frontier"].pop(0)
+            if url in seen:
+                continue
+            await self.rate_limiter.aacquire()
+            page = await self.fetch(url)
+            seen.add(url)
+            if report is not None:
+                report.add_page(page)
+            if not page["ok"]:
+                print(f"Search page failed: {url}: {page['error']}")
+                state["seen"] = sorted(seen)
+                self._save(search_url, state)
+                continue
+
+            ids, result_count = await loop.run_in_executor(get_parse_pool(), parse_search_page, page["content"])
+            index = page_index(url)
+            if index == 0 and result_count:
+                last = min(result_count, self.max_pages * PAGE_SIZE)
+                queued = set(state["frontier"])
+                state["frontier"] += [u for u in (search_page_url(search_url, i) for i in range(PAGE_SIZE, last, PAGE_SIZE))
+                                      if u not in seen and u not in queued]
+            elif result_count is None and len(ids) >= PAGE_SIZE and index + PAGE_SIZE < self.max_pages * PAGE_SIZE:
+                # Unknown result count: follow the pagination one page at a time while pages are full
+                state["frontier"].append(search_page_url(search_url, index + PAGE_SIZE))
+
+            new = [pid for pid in ids if pid not in known][:self.max_properties - len(known)]
+            known.update(dict.fromkeys(new))
+            state["seen"], state["property_ids"] = sorted(seen), list(known)
+            self._save(search_url, state)
+            if new:
+                yield [PROPERTY_URL.format(pid) for pid in new]
+
+        state["done"] = True
+        state["seen"], state["property_ids"] = sorted(seen), list(known)
+        self._save(search_url, state)
+
+
+async def iter_listing_results(links: List[str], cache: Optional[PropertyCache] = None,
+                               crawler: Optional[SearchCrawler] = None, report: Optional[CrawlReport] = None,
+                               batch_size: int = CRAWL_BATCH_SIZE) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Scrape the properties behind Rightmove links: property URLs directly, search URLs through the crawler.
+
+    Search pages are crawled concurrently with the scraping of the properties found so far; properties
+    are handed to the property cache in batches of `batch_size` and each property is scraped once.
+
+    Args:
+        links (list of str): Property and/or search-result URLs.
+        cache (PropertyCache, optional): Defaults to the shared property cache.
+        crawler (SearchCrawler, optional): Defaults to a crawler with the CRAWL_* settings.
+        report (CrawlReport, optional): Updated with pages, properties and credits as the run progresses.
+        batch_size (int): Properties per scraping batch.
+
+    Yields:
+        dict: `PropertyCache.iter_properties` results, one per distinct property.
+    """
+    cache = cache or get_property_cache()
+    crawler = crawler or SearchCrawler()
+    report = report if report is not None else CrawlReport()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            direct = [link for link in links if property_id(link)]
+            if direct:
+                await queue.put(direct)
+            for link in links:
+                if not property_id(link):
+                    async for urls in crawler.iter_property_urls(link, report):
+                        await queue.put(urls)
+        finally:
+            await queue.put(None)
+
+    producer = asyncio.create_task(produce())
+    seen, done = set(), False
+    try:
+        while not done:
+            batch = []
+            # Take whatever has been found so far (waiting for at least one URL), up to one batch
+            while len(batch) < batch_size and not done:
+                if batch and queue.empty():
+                    break
+                urls = await queue.get()
+                if urls is None:
+                    done = True
+                    continue
+                for url in urls:
+                    if property_id(url) not in seen:
+                        seen.add(property_id(url))
+                        batch.append(url)
+            for start in range(0, len(batch), batch_size):
+                async for result in cache.iter_properties(batch[start:start + batch_size]):
+                    report.add_property(result)
+                    yield result
+        await producer
+    finally:
+        producer.cancel()
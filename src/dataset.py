@@ -0,0 +1,210 @@
+import os
+import re
+import shutil
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pandasai as pai
+import pyarrow as pa
+import yaml
+
+from src.columnar import TEXT_COLUMNS, ColumnarSnapshot
+
+DATASETS_DIR = "datasets"
+
+
+class DatasetHandle:
+    """
+    Lazily loaded, process-wide handle on a PandasAI dataset.
+
+    The dataset is read on first use and held in memory once per process. Lookups by listing id go
+    through column projections indexed on `id`, so fetching k listings costs O(k) hash probes instead
+    of a scan of the full id column, and only the requested columns are kept for each projection.
+
+    With a `columnar` snapshot, projections and `lean_frame` read only the columns they need from a
+    memory-mapped Arrow copy of the data (categoricals dictionary-encoded, text columns left on disk until
+    `text` asks for them); the full PandasAI frame is then only loaded for PandasAI itself. Without one,
+    or if the snapshot cannot be read, everything is cut from the full frame.
+    """
+
+    def __init__(self, path: Optional[str], loader: Callable[[Optional[str]], pd.DataFrame] = pai.load,
+                 columnar: Optional[ColumnarSnapshot] = None):
+        self.path = path
+        self.columnar = columnar
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._frame = None
+        self._projections: Dict[Tuple[str, ...], pd.DataFrame] = {}
+        self._lean: Dict[Optional[Tuple[str, ...]], pd.DataFrame] = {}
+        self._positions: Optional[pd.Series] = None
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """The full dataset (a `pai.DataFrame`), loaded on first access."""
+        if self._frame is None:
+            with self._lock:
+                if self._frame is None:
+                    self._frame = self._loader(self.path)
+        return self._frame
+
+    def _columnar_frame(self, columns: Optional[Sequence[str]]) -> Optional[pd.DataFrame]:
+        """Columns read from the columnar snapshot, or None when there is none or it cannot be read."""
+        if self.columnar is None:
+            return None
+        try:
+            return self.columnar.frame(columns)
+        except (OSError, pa.ArrowException) as e:
+            print(f"Columnar snapshot of {self.path} unavailable, using the full frame: {e}")
+            self.columnar = None
+            return None
+
+    def lean_frame(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        The dataset without its long text columns, or only `columns`, built once per column set.
+
+        Args:
+            columns (list of str, optional): Columns to keep (unknown ones are skipped). Defaults to all
+                                             but the TEXT_COLUMNS.
+
+        Returns:
+            pd.DataFrame: A plain pandas frame in dataset row order.
+        """
+        key = tuple(columns) if columns is not None else None
+        lean = self._lean.get(key)
+        if lean is None:
+            lean = self._columnar_frame(columns)
+            if lean is None:
+                frame = self.frame
+                names = [c for c in frame.columns if c not in TEXT_COLUMNS] if columns is None else columns
+                lean = pd.DataFrame(frame[[c for c in dict.fromkeys(names) if c in frame.columns]])
+            with self._lock:
+                lean = self._lean.setdefault(key, lean)
+        return lean
+
+    def text(self, ids: Iterable, column: str = "description") -> List[Optional[str]]:
+        """
+        A long text column for some listings, read on demand.
+
+        Returns:
+            list: The value for each id, in request order; None for unknown ids.
+        """
+        if self._positions is None:
+            id_column = self.lean_frame(["id"])["id"].astype(str)
+            positions = pd.Series(np.arange(len(id_column)), index=id_column.to_numpy())
+            self._positions = positions[~positions.index.duplicated()]
+        wanted = pd.Series(list(ids), dtype=object).astype(str)
+        positions = self._positions.index.get_indexer(wanted)
+        rows = self._positions.to_numpy()[positions[positions >= 0]]
+        if self.columnar is not None:
+            values = self.columnar.text(column, rows)
+        else:
+            values = self.frame[column].iloc[rows].tolist()
+        found = iter(values)
+        return [next(found) if position >= 0 else None for position in positions]
+
+    def projection(self, columns: Sequence[str]) -> pd.DataFrame:
+        """
+        The dataset restricted to `columns`, indexed by id as a string.
+
+        Args:
+            columns (list of str): Columns to keep.
+
+        Returns:
+            pd.DataFrame: A plain pandas frame with a unique string index of listing ids, built once per column set.
+        """
+        key = tuple(columns)
+        projected = self._projections.get(key)
+        if projected is None:
+            frame = self.lean_frame(list(dict.fromkeys(key + ("id",))))
+            with self._lock:
+                projected = self._projections.get(key)
+                if projected is None:
+                    projected = pd.DataFrame(frame[list(key)])
+                    projected.index = pd.Index(frame["id"].astype(str).to_numpy(dtype=object), name="_id")
+                    projected = projected[~projected.index.duplicated()]
+                    self._projections[key] = projected
+        return projected
+
+    def lookup(self, ids: Iterable, columns: Sequence[str]) -> pd.DataFrame:
+        """
+        Fetch listings by id.
+
+        Args:
+            ids (iterable): Listing ids, in any type that stringifies like the dataset's ids.
+            columns (list of str): Columns to return.
+
+        Returns:
+            pd.DataFrame: One row per known id, in request order, without duplicates. Unknown ids are skipped.
+        """
+        projected = self.projection(columns)
+        wanted = pd.Index(pd.Series(list(ids), dtype=object).astype(str)).unique()
+        positions = projected.index.get_indexer(wanted)
+        return projected.iloc[positions[positions >= 0]].reset_index(drop=True)
+
+    def refresh(self):
+        """Drop the loaded data so the next access reads the current snapshot."""
+        with self._lock:
+            self._frame = None
+            self._projections.clear()
+            self._lean.clear()
+            self._positions = None
+            if self.columnar is not None:
+                self.columnar.reset()
+
+
+_handles: Dict[Optional[str], DatasetHandle] = {}
+_handles_lock = threading.Lock()
+
+
+def get_dataset(path: Optional[str] = None) -> DatasetHandle:
+    """
+    Shared handle for a dataset path, the "DATAFRAME" environment variable by default.
+
+    Handles are kept per process rather than per Streamlit session, so every module that needs the
+    dataset (tools, query engine, maps) shares the same in-memory copy. Unless DATASET_COLUMNAR=0, they
+    read columns from a memory-mapped Arrow copy of the parquet file kept in ARROW_CACHE_DIR.
+    """
+    path = path if path is not None else os.getenv("DATAFRAME")
+    with _handles_lock:
+        handle = _handles.get(path)
+        if handle is None:
+            columnar = None
+            if path and os.getenv("DATASET_COLUMNAR", "1") != "0":
+                columnar = ColumnarSnapshot(os.path.join(DATASETS_DIR, path, "data.parquet"),
+                                            cache_dir=os.getenv("ARROW_CACHE_DIR", ".cache/arrow"))
+            handle = _handles[path] = DatasetHandle(path, columnar=columnar)
+        return handle
+
+
+def next_version_path(path: str) -> str:
+    """The path of the next snapshot: "new-bot/rental-data-london4" -> "new-bot/rental-data-london5"."""
+    match = re.search(r"(\d+)$", path)
+    if match is None:
+        return f"{path}2"
+    return f"{path[:match.start()]}{int(match.group(1)) + 1}"
+
+
+def write_dataset_version(df: pd.DataFrame, source_path: str, target_path: str, datasets_dir: str = DATASETS_DIR):
+    """
+    Save `df` as a new local PandasAI dataset next to `source_path`, reusing its schema.
+
+    Writes `<datasets_dir>/<target_path>/data.parquet` and a copy of the source schema.yaml renamed after
+    the target, so `pai.load(target_path)` (or DATAFRAME=target_path) picks the new snapshot up.
+    """
+    source_dir = os.path.join(datasets_dir, source_path)
+    target_dir = os.path.join(datasets_dir, target_path)
+    if os.path.abspath(source_dir) == os.path.abspath(target_dir):
+        raise ValueError("The new dataset version must not overwrite its source")
+    staging = target_dir.rstrip("/") + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    with open(os.path.join(source_dir, "schema.yaml")) as f:
+        schema = yaml.safe_load(f)
+    schema["name"] = os.path.basename(target_path).replace("-", "_")
+    with open(os.path.join(staging, "schema.yaml"), "w") as f:
+        yaml.safe_dump(schema, f, sort_keys=False, allow_unicode=True)
+    df.to_parquet(os.path.join(staging, schema.get("source", {}).get("path", "data.parquet")), index=False)
+    shutil.rmtree(target_dir, ignore_errors=True)
+    os.replace(staging, target_dir)
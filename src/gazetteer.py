@@ -0,0 +1,101 @@
+import re
+from typing import Dict, Tuple
+
+import numpy as np
+
+# Central London reference point used for "distance to center" in the dataset
+CHARING_CROSS = (51.5080, -0.1247)
+
+# Landmarks, parks and major stations: name -> (latitude, longitude).
+# Names are normalized with `normalize_place` (lower case, no apostrophes, no leading "the").
+LANDMARKS: Dict[str, Tuple[float, float]] = {
+    # Parks and open spaces
+    "hyde park": (51.5073, -0.1657),
+    "regents park": (51.5313, -0.1570),
+    "green park": (51.5046, -0.1420),
+    "st james park": (51.5025, -0.1348),
+    "st jamess park": (51.5025, -0.1348),
+    "kensington gardens": (51.5069, -0.1795),
+    "holland park": (51.5030, -0.2040),
+    "hampstead heath": (51.5608, -0.1631),
+    "primrose hill": (51.5396, -0.1604),
+    "victoria park": (51.5362, -0.0395),
+    "battersea park": (51.4791, -0.1566),
+    "clapham common": (51.4618, -0.1470),
+    "greenwich park": (51.4769, 0.0005),
+    "richmond park": (51.4428, -0.2750),
+    "kew gardens": (51.4787, -0.2956),
+    "olympic park": (51.5430, -0.0166),
+    "queen elizabeth olympic park": (51.5430, -0.0166),
+    # Landmarks
+    "buckingham palace": (51.5014, -0.1419),
+    "big ben": (51.5007, -0.1246),
+    "houses of parliament": (51.4995, -0.1248),
+    "westminster abbey": (51.4993, -0.1273),
+    "london eye": (51.5033, -0.1196),
+    "tower of london": (51.5081, -0.0759),
+    "tower bridge": (51.5055, -0.0754),
+    "st pauls cathedral": (51.5138, -0.0984),
+    "st pauls": (51.5138, -0.0984),
+    "trafalgar square": (51.5080, -0.1281),
+    "piccadilly circus": (51.5101, -0.1340),
+    "leicester square": (51.5103, -0.1302),
+    "covent garden": (51.5117, -0.1240),
+    "oxford circus": (51.5152, -0.1419),
+    "oxford street": (51.5152, -0.1419),
+    "british museum": (51.5194, -0.1270),
+    "shard": (51.5045, -0.0865),
+    "o2 arena": (51.5030, 0.0032),
+    "o2": (51.5030, 0.0032),
+    "wembley stadium": (51.5560, -0.2796),
+    "emirates stadium": (51.5549, -0.1084),
+    "stamford bridge": (51.4817, -0.1910),
+    "camden market": (51.5414, -0.1466),
+    "borough market": (51.5055, -0.0910),
+    "canary wharf": (51.5054, -0.0235),
+    "charing cross": CHARING_CROSS,
+    "city centre": CHARING_CROSS,
+    "city center": CHARING_CROSS,
+    "central london": CHARING_CROSS,
+    # Universities
+    "ucl": (51.5246, -0.1340),
+    "university college london": (51.5246, -0.1340),
+    "lse": (51.5144, -0.1165),
+    "imperial college": (51.4988, -0.1749),
+    "kings college london": (51.5115, -0.1160),
+    # Major stations
+    "kings cross": (51.5308, -0.1238),
+    "st pancras": (51.5317, -0.1263),
+    "euston": (51.5282, -0.1337),
+    "paddington": (51.5154, -0.1755),
+    "victoria station": (51.4952, -0.1441),
+    "waterloo": (51.5031, -0.1132),
+    "london bridge": (51.5052, -0.0864),
+    "liverpool street": (51.5178, -0.0823),
+    "marylebone": (51.5225, -0.1631),
+    "clapham junction": (51.4643, -0.1704),
+    "stratford": (51.5416, -0.0042),
+    "bank": (51.5133, -0.0886),
+    "angel": (51.5322, -0.1058),
+    "brixton": (51.4627, -0.1145),
+}
+
+# Approximate course of the Thames through London as (longitude, latitude), west to east.
+# Used to split listings north/south of the river by interpolating the river's latitude.
+THAMES = np.array([
+    (-0.50, 51.430), (-0.35, 51.430), (-0.30, 51.470), (-0.25, 51.485), (-0.213, 51.467),
+    (-0.188, 51.465), (-0.172, 51.482), (-0.150, 51.485), (-0.127, 51.488), (-0.122, 51.501),
+    (-0.117, 51.509), (-0.104, 51.5095), (-0.0877, 51.5079), (-0.0754, 51.5055), (-0.040, 51.508),
+    (-0.010, 51.485), (0.005, 51.508), (0.065, 51.495), (0.120, 51.505), (0.180, 51.485), (0.350, 51.470),
+])
+
+
+def normalize_place(name: str) -> str:
+    """Normalize a place name for lookups: lower case, no apostrophes or dots, no leading "the"."""
+    name = re.sub(r"['’.]", "", name.strip().lower())
+    return re.sub(r"^the\s+", "", re.sub(r"\s+", " ", name))
+
+
+def thames_latitude(longitudes: np.ndarray) -> np.ndarray:
+    """Latitude of the Thames at each longitude (vectorized linear interpolation)."""
+    return np.interp(longitudes, THAMES[:, 0], THAMES[:, 1])
@@ -1,31 +1,41 @@
 import pandas as pd
 from tqdm import tqdm
-from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut, GeocoderServiceError
-import time
-import ast
-import pandasai as pai
 import os
 from dotenv import load_dotenv
 
+from src.dataset import get_dataset
+from src.geocoding import get_batch_geocoder
+from src.map_rendering import render_map_html, aggregate_grid, render_density_html
+
 load_dotenv()
 
 # Initialize tqdm for pandas to enable progress bars for DataFrame operations
 tqdm.pandas()
 
-# Load PandasAI dataset once at module level
-df_ai = pai.load(os.getenv("DATAFRAME"))
+# Above this many listings maps switch from clustered markers to an aggregated density grid
+MAP_DENSITY_THRESHOLD = int(os.getenv("MAP_DENSITY_THRESHOLD", "2000"))
+
+# Columns the map needs; the shared dataset is projected onto them and indexed by id
+MAP_COLUMNS = [
+    "id", "latitude", "longitude", "title",
+    "price_gbp", "pricing_index", "property_features"
+]
 
 
-def generate_google_maps_html(input_data, api_key=os.getenv("GOOGLE_API_KEY")):
+def generate_google_maps_html(input_data, api_key=os.getenv("GOOGLE_API_KEY"), focus=None, mode="auto"):
     """
     #     Generates an HTML page with a Google Maps visualization of the provided locations.
     #
     #     Args:
-    #         input_data (list of dict): A list of dictionaries containing location data with keys:
-    #                                    "latitude", "longitude", "title", "price_gbp", "property_features".
+    #         input_data (list of dict): A list of dictionaries with the "id" of each property to show.
+    #                                    Coordinates, title, price and features are looked up in the dataset.
     #         api_key (str): The Google Maps API key. Defaults to the value of the "GOOGLE_API_KEY"
     #                        environment variable.
+    #         focus (dict, optional): Place the query is centred on, as returned by
+    #                                 `FastQueryEngine.spatial_focus`: {"lat", "lng", "label", "radius_km"}.
+    #                                 The map is centred on it and the search radius is drawn.
+    #         mode (str): "markers", "density" or "auto" (density above MAP_DENSITY_THRESHOLD listings).
     #
     #     Returns:
     #         str: An HTML string containing the Google Maps visualization.
@@ -33,7 +43,6 @@ def generate_google_maps_html(input_data, api_key=os.getenv("GOOGLE_API_KEY")):
 
     # Convert input data into a DataFrame
     locations = pd.DataFrame(input_data)
-    print(type(input_data))
     # Case 1: no rows at all
     if locations.empty:
         return "<html><body><h1>No locations provided</h1></body></html>"
@@ -42,75 +51,24 @@ def generate_google_maps_html(input_data, api_key=os.getenv("GOOGLE_API_KEY")):
     if "id" not in locations.columns:
         return "<html><body><h1>No valid IDs provided</h1></body></html>"
 
-    fixed_cols = [
-        "id", "latitude", "longitude", "title",
-        "price_gbp", "pricing_index", "property_features"
-    ]
-
-    # data to display on map (only those with ids in locations)
-    selected = df_ai[df_ai["id"].isin(locations["id"])][fixed_cols]
+    # data to display on map (only those with ids in locations), looked up through the id index
+    selected = get_dataset().lookup(locations["id"], MAP_COLUMNS)
 
     if selected.empty:
         return "<html><body><h1>No locations to display</h1></body></html>"
 
-    markers_js = []
-    for i, row in selected.iterrows():
-        feats = row.get("property_features", [])
-        if isinstance(feats, str):
-            try:
-                feats = ast.literal_eval(feats)
-            except Exception:
-                feats = [feats]
-        if not isinstance(feats, list):
-            feats = [str(feats)]
-        feats = [str(f).strip() for f in feats if f]
-        feats_html = "".join(f"<li>{f}</li>" for f in feats)
-
-        markers_js.append(f"""
-        var m{i} = new google.maps.Marker({{
-            position: {{ lat: {row['latitude']}, lng: {row['longitude']} }},
-            map: map
-        }});
-        var iw{i} = new google.maps.InfoWindow({{
-            content: `
-                <div style="font-size:14px;max-width:260px;">
-                    <div style="font-weight:bold;margin-bottom:6px;">£{row['price_gbp']:,.0f}</div>
-                    <div style="margin-bottom:6px;">{row['title']}</div>
-                    <div style="font-size:12px;color:#555;margin-bottom:6px;">
-                        Pricing index: {row['pricing_index']:.2f}
-                    </div>
-                    <ul style="margin:0;padding-left:18px;font-size:13px;">
-                        {feats_html}
-                    </ul>
-                </div>`
-        }});
-        m{i}.addListener('click', () => iw{i}.open(map, m{i}));
-        """)
-
-    lat_c = selected["latitude"].mean()
-    lng_c = selected["longitude"].mean()
-
-    return f"""
-    <html><head><meta charset="utf-8"><title>Properties Map</title>
-    <style>body,html{{height:100%;margin:0}}#map{{height:100%;width:100%}}</style>
-    </head><body><div id="map"></div>
-    <script>
-      function initMap() {{
-        var map = new google.maps.Map(document.getElementById('map'), {{
-          zoom: 13,
-          center: {{ lat: {lat_c}, lng: {lng_c} }}
-        }});
-        {"".join(markers_js)}
-      }}
-    </script>
-    <script src="https://maps.googleapis.com/maps/api/js?key={api_key}&callback=initMap&language=en" async defer></script>
-    </body></html>
-    """
+    if mode == "density" or (mode == "auto" and len(selected) > MAP_DENSITY_THRESHOLD):
+        # Aggregate server-side so the page size stays bounded however many listings match
+        grid = aggregate_grid(selected)
+        return render_density_html(grid, api_key, focus=focus, total=len(selected))
+
+    return render_map_html(selected, api_key, focus=focus)
 
 
 def get_lat_long(address):
     """
-    Retrieves the latitude and longitude for a given address using the Nominatim geocoding service.
+    Retrieves the latitude and longitude for a given address using the Nominatim geocoding service,
+    through the batch geocoder's cache, postcode centroids and rate limiter.
 
     Args:
         address (str): The address to geocode.
@@ -119,16 +77,8 @@ def get_lat_long(address):
     be geocoded.
     """
     try:
-        # Initialize the Nominatim geolocator with a user agent and timeout
-        geolocator = Nominatim(user_agent="unique_app_name_123", timeout=10)
-        # Perform geocoding to get the location
-        location = geolocator.geocode(address)
-        if location:
-            # Return latitude and longitude if the location is found
-            return location.latitude, location.longitude
-        else:
-            # Return None for both values if the location is not found
-            return None, None
+        # Not the raw Nominatim call: repeated addresses are cached and requests stay within 1 per second
+        return get_batch_geocoder().geocode_many([address], progress=False).get(address, (None, None))
     except (GeocoderTimedOut, GeocoderServiceError) as e:
         # Handle geocoding errors and print the error message
         print(f"Geocoding error: {e}")
@@ -139,6 +89,10 @@ def safe_get_lat_long(address):
     """
     Safely retrieves the latitude and longitude for a given address, handling null values and rate limits.
 
+    Goes through the batch geocoder, so repeated addresses are served from the persistent cache or from
+    postcode centroids and remote requests are rate limited by a token bucket rather than a fixed sleep.
+    To geocode many addresses at once, use `geocode_addresses`.
+
     Args:
         address (str): The address to geocode.
 
@@ -149,13 +103,22 @@ def safe_get_lat_long(address):
     if pd.isnull(address):
         return None, None
     try:
-        # Call the get_lat_long function to retrieve latitude and longitude
-        lat_lon = get_lat_long(address)
-        # Respect rate limits by adding a delay
-        time.sleep(1)
-        # Return the retrieved values or (None, None) if no values are found
-        return lat_lon if lat_lon else (None, None)
+        return geocode_addresses([address], progress=False).get(address, (None, None))
     except Exception as e:
         # Handle any unexpected errors and print the error message
         print(f"Error for address '{address}': {e}")
-        return None, None
\ No newline at end of file
+        return None, None
+
+
+def geocode_addresses(addresses, progress=True):
+    """
+    Geocode a batch of addresses (deduplicated, cached, rate limited and resumable).
+
+    Args:
+        addresses (iterable of str): Addresses, e.g. a DataFrame column; repeats and nulls are fine.
+        progress (bool): Show a progress bar for the remote requests.
+
+    Returns:
+        dict: Each distinct address -> (latitude, longitude), or (None, None) if it could not be geocoded.
+    """
+    return get_batch_geocoder().geocode_many(addresses, progress=progress)
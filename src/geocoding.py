@@ -0,0 +1,207 @@
+import os
+import re
+import threading
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+from geopy.exc import GeocoderServiceError, GeocoderTimedOut
+from geopy.geocoders import Nominatim
+from tqdm import tqdm
+
+from src.dataset import get_dataset
+from src.response_cache import ResponseCache
+from src.utils.rate_limit import TokenBucket
+
+LatLon = Tuple[Optional[float], Optional[float]]
+NOT_FOUND: LatLon = (None, None)
+
+# UK postcode: outcode ("NW1", "EC1A") optionally followed by the incode ("6XE")
+POSTCODE_RE = re.compile(r"\b([A-Z]{1,2}[0-9][0-9A-Z]?)(?:\s*([0-9][A-Z]{2}))?\b")
+
+
+def normalize_address(address: str) -> str:
+    """Collapse whitespace and case so the same address written twice shares one cache entry."""
+    return re.sub(r"\s+", " ", address.strip().lower()).strip(" ,")
+
+
+CENTROID_COLUMNS = ["postcode_outcode", "postcode_incode", "latitude", "longitude"]
+
+
+class PostcodeCentroids:
+    """
+    Offline geocoder from listing coordinates: mean latitude/longitude per full postcode and per outcode.
+
+    Full postcodes cover a handful of buildings and are precise enough to skip the remote geocoder;
+    outcode centroids are district-level and only used when nothing better is available.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        columns = set(CENTROID_COLUMNS)
+        self.full: Dict[str, Tuple[float, float]] = {}
+        self.outcode: Dict[str, Tuple[float, float]] = {}
+        if not columns.issubset(df.columns):
+            return
+        frame = pd.DataFrame({
+            "outcode": df["postcode_outcode"].astype(str).str.strip().str.upper(),
+            "incode": df["postcode_incode"].astype(str).str.strip().str.upper(),
+            "latitude": pd.to_numeric(df["latitude"], errors="coerce"),
+            "longitude": pd.to_numeric(df["longitude"], errors="coerce"),
+        }).dropna(subset=["latitude", "longitude"])
+        frame = frame[frame["outcode"].str.match(r"^[A-Z]{1,2}[0-9][0-9A-Z]?$")]
+
+        by_outcode = frame.groupby("outcode")[["latitude", "longitude"]].mean()
+        self.outcode = {code: (row.latitude, row.longitude) for code, row in by_outcode.iterrows()}
+        with_incode = frame[frame["incode"].str.match(r"^[0-9][A-Z]{2}$")]
+        by_postcode = with_incode.groupby(with_incode["outcode"] + " " + with_incode["incode"])[
+            ["latitude", "longitude"]].mean()
+        self.full = {code: (row.latitude, row.longitude) for code, row in by_postcode.iterrows()}
+
+    @staticmethod
+    def extract(address: str) -> Tuple[Optional[str], Optional[str]]:
+        """The last postcode-looking token of an address as (outcode, incode); either may be None."""
+        matches = POSTCODE_RE.findall(address.upper())
+        if not matches:
+            return None, None
+        outcode, incode = matches[-1]
+        return outcode, incode or None
+
+    def lookup(self, address: str, precise_only: bool = False) -> Optional[Tuple[float, float]]:
+        """
+        Centroid for the postcode found in an address.
+
+        Args:
+            address (str): Free-text address, e.g. "Camden Road, London NW1 9LQ".
+            precise_only (bool): Only use full-postcode centroids, never outcode ones.
+
+        Returns:
+            tuple or None: (latitude, longitude), or None when no known postcode is found.
+        """
+        outcode, incode = self.extract(address)
+        if outcode is None:
+            return None
+        if incode and f"{outcode} {incode}" in self.full:
+            return self.full[f"{outcode} {incode}"]
+        if precise_only:
+            return None
+        return self.outcode.get(outcode)
+
+
+def nominatim_geocoder(user_agent: str = "unique_app_name_123", timeout: int = 10) -> Callable[[str], LatLon]:
+    """A geocode function backed by one shared Nominatim client. Raises geopy errors on transient failures."""
+    geolocator = Nominatim(user_agent=user_agent, timeout=timeout)
+
+    def geocode(address: str) -> LatLon:
+        location = geolocator.geocode(address)
+        return (location.latitude, location.longitude) if location else NOT_FOUND
+
+    return geocode
+
+
+class BatchGeocoder:
+    """
+    Geocode many addresses with as few remote requests as possible.
+
+    Addresses are deduplicated, then resolved in order from the persistent cache, from full-postcode
+    centroids of our own listings, and finally from the remote geocoder behind a token bucket. Remote
+    answers (including "not found") are written to the cache as they arrive, so an interrupted run
+    resumes where it stopped. Addresses the remote service could not answer fall back to their
+    outcode centroid, and transient failures are not cached so they are retried on the next run.
+    """
+
+    def __init__(self, geocode: Callable[[str], LatLon], cache: Optional[ResponseCache] = None,
+                 centroids: Optional[PostcodeCentroids] = None, rate_limiter: Optional[TokenBucket] = None):
+        self.geocode = geocode
+        self.cache = cache
+        self.centroids = centroids
+        self.rate_limiter = rate_limiter
+        self.stats = {"cached": 0, "postcode": 0, "remote": 0, "outcode": 0, "failed": 0}
+
+    def geocode_many(self, addresses: Iterable[str], progress: bool = True) -> Dict[str, LatLon]:
+        """
+        Geocode a batch of addresses.
+
+        Args:
+            addresses (iterable of str): Addresses, possibly repeated or null.
+            progress (bool): Show a progress bar for the remote requests.
+
+        Returns:
+            dict: Each distinct non-null address -> (latitude, longitude), or (None, None) if unresolved.
+        """
+        keys = {}
+        for address in addresses:
+            if isinstance(address, str) and address.strip():
+                keys.setdefault(address, normalize_address(address))
+        unique = {}
+        for address, key in keys.items():
+            unique.setdefault(key, address)
+
+        resolved: Dict[str, LatLon] = {}
+        pending = []
+        for key, address in unique.items():
+            cached = self.cache.get("geocode", key) if self.cache else None
+            if cached is not None:
+                resolved[key] = self._fallback(address) if tuple(cached) == NOT_FOUND else tuple(cached)
+                self.stats["cached"] += 1
+                continue
+            centroid = self.centroids.lookup(address, precise_only=True) if self.centroids else None
+            if centroid is not None:
+                resolved[key] = centroid
+                self.stats["postcode"] += 1
+                continue
+            pending.append((key, address))
+
+        for key, address in tqdm(pending, desc="Geocoding", disable=not progress or not pending):
+            resolved[key] = self._remote(key, address)
+        return {address: resolved[key] for address, key in keys.items()}
+
+    def _remote(self, key: str, address: str) -> LatLon:
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        try:
+            lat_lon = self.geocode(address) or NOT_FOUND
+        except (GeocoderTimedOut, GeocoderServiceError, OSError) as e:
+            print(f"Geocoding error for '{address}': {e}")
+            lat_lon = None
+        if lat_lon is not None:
+            if self.cache:
+                self.cache.set("geocode", key, list(lat_lon))
+            if lat_lon != NOT_FOUND:
+                self.stats["remote"] += 1
+                return lat_lon
+        return self._fallback(address)
+
+    def _fallback(self, address: str) -> LatLon:
+        """Outcode centroid for an address the remote geocoder could not resolve."""
+        fallback = self.centroids.lookup(address) if self.centroids else None
+        if fallback is not None:
+            self.stats["outcode"] += 1
+            return fallback
+        self.stats["failed"] += 1
+        return NOT_FOUND
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_batch_geocoder() -> BatchGeocoder:
+    """
+    Process-wide geocoder: Nominatim at GEOCODE_RATE_PER_SECOND (default 1, the Nominatim usage policy),
+    cached in GEOCODE_CACHE_PATH and backed by postcode centroids of the shared dataset.
+    """
+    global _geocoder
+    with _geocoder_lock:
+        if _geocoder is None:
+            try:
+                centroids = PostcodeCentroids(get_dataset().lean_frame(CENTROID_COLUMNS))
+            except Exception as e:
+                print(f"Postcode centroids unavailable: {e}")
+                centroids = None
+            _geocoder = BatchGeocoder(
+                geocode=nominatim_geocoder(),
+                cache=ResponseCache(os.getenv("GEOCODE_CACHE_PATH", ".cache/geocode.sqlite"),
+                                    max_entries=1_000_000, ttl_seconds=0),
+                centroids=centroids,
+                rate_limiter=TokenBucket(rate=float(os.getenv("GEOCODE_RATE_PER_SECOND", "1"))),
+            )
+        return _geocoder
@@ -0,0 +1,60 @@
+import asyncio
+import os
+import weakref
+
+import openai
+from dotenv import load_dotenv
+
+from src.utils.env_tools import cache_resource
+
+load_dotenv()
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Per-call timeout applied to every LLM request, in seconds
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+
+# httpx connection pools are bound to the event loop they are used on, so keep one client per loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _pool_limits():
+    import httpx
+
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_CONNECTIONS,
+        keepalive_expiry=120,
+    )
+
+
+@cache_resource
+def get_openai_client() -> openai.OpenAI:
+    """Shared synchronous OpenAI client with a keep-alive connection pool."""
+    return openai.OpenAI(
+        api_key=OPENAI_API_KEY,
+        timeout=LLM_TIMEOUT,
+        http_client=openai.DefaultHttpxClient(limits=_pool_limits()),
+    )
+
+
+def get_async_openai_client() -> openai.AsyncOpenAI:
+    """
+    Shared asynchronous OpenAI client for the running event loop.
+
+    All coroutines on the same loop reuse one pooled HTTP client with keep-alive connections,
+    so concurrent conversations do not pay a new TLS handshake per request.
+
+    Returns:
+        openai.AsyncOpenAI: The client bound to the current event loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = openai.AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            timeout=LLM_TIMEOUT,
+            http_client=openai.DefaultAsyncHttpxClient(limits=_pool_limits()),
+        )
+        _async_clients[loop] = client
+    return client
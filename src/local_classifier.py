@@ -0,0 +1,184 @@
+import json
+import os
+import re
+import time
+import zlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from src.utils.env_tools import cache_resource
+
+# "irrelevant" stands for is_uae_real_estate_query == False, the others are llm_classifier actions
+LABELS = ["irrelevant", "output", "plot_stats", "geospatial_plot"]
+N_FEATURES = 2 ** 14
+
+
+def _tokens(text: str) -> List[str]:
+    """Word unigrams, word bigrams and character 3-grams of each word."""
+    words = re.findall(r"[a-z0-9£]+", text.lower())
+    features = [f"w:{w}" for w in words]
+    features += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"<{w}>"
+        features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    return features
+
+
+def featurize(texts: List[str], n_features: int = N_FEATURES) -> np.ndarray:
+    """
+    Hash n-gram features of each text into a fixed-size, L2-normalized vector.
+
+    Args:
+        texts (list of str): The queries to featurize.
+        n_features (int): Size of the hashed feature space.
+
+    Returns:
+        np.ndarray: A (len(texts), n_features) float32 matrix.
+    """
+    matrix = np.zeros((len(texts), n_features), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for token in _tokens(text):
+            # crc32 is stable across processes, unlike the built-in hash()
+            matrix[row, zlib.crc32(token.encode()) % n_features] += 1.0
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class LocalIntentClassifier:
+    """
+    In-process relevance + intent classifier: hashed n-gram features and a multinomial logistic regression.
+
+    A single softmax over LABELS answers both questions at once. Probabilities are calibrated with
+    temperature scaling so `predict` returns a confidence that can be thresholded against the LLM fallback.
+    """
+
+    def __init__(self, n_features: int = N_FEATURES):
+        self.n_features = n_features
+        self.weights = np.zeros((n_features, len(LABELS)), dtype=np.float32)
+        self.bias = np.zeros(len(LABELS), dtype=np.float32)
+        self.temperature = 1.0
+
+    def _logits(self, features: np.ndarray) -> np.ndarray:
+        return features @ self.weights + self.bias
+
+    def fit(self, texts: List[str], labels: List[str], epochs: int = 300, learning_rate: float = 2.0,
+            l2: float = 1e-4) -> "LocalIntentClassifier":
+        """Train with full-batch gradient descent on the cross-entropy loss."""
+        features = featurize(texts, self.n_features)
+        targets = np.eye(len(LABELS), dtype=np.float32)[[LABELS.index(label) for label in labels]]
+        for _ in range(epochs):
+            gradient = (_softmax(self._logits(features)) - targets) / len(texts)
+            self.weights -= learning_rate * (features.T @ gradient + l2 * self.weights)
+            self.bias -= learning_rate * gradient.sum(axis=0)
+        return self
+
+    def calibrate(self, texts: List[str], labels: List[str]) -> float:
+        """Fit the softmax temperature on held-out data by minimizing the negative log-likelihood."""
+        logits = self._logits(featurize(texts, self.n_features))
+        index = np.array([LABELS.index(label) for label in labels])
+        best_nll = np.inf
+        for temperature in np.linspace(0.05, 5.0, 100):
+            probabilities = _softmax(logits / temperature)
+            nll = -np.log(probabilities[np.arange(len(index)), index] + 1e-12).mean()
+            if nll < best_nll:
+                best_nll, self.temperature = nll, float(temperature)
+        return self.temperature
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        return _softmax(self._logits(featurize(texts, self.n_features)) / self.temperature)
+
+    def predict(self, query: str) -> Tuple[str, float]:
+        """
+        Classify a single query.
+
+        Args:
+            query (str): The user query string.
+
+        Returns:
+            tuple: The predicted label (one of LABELS) and its calibrated probability.
+        """
+        probabilities = self.predict_proba([query])[0]
+        best = int(probabilities.argmax())
+        return LABELS[best], float(probabilities[best])
+
+    def save(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez_compressed(path, weights=self.weights, bias=self.bias, temperature=self.temperature)
+
+    @classmethod
+    def load(cls, path: str) -> "LocalIntentClassifier":
+        stored = np.load(path)
+        model = cls(n_features=stored["weights"].shape[0])
+        model.weights = stored["weights"]
+        model.bias = stored["bias"]
+        model.temperature = float(stored["temperature"])
+        return model
+
+
+@cache_resource
+def get_local_classifier() -> Optional[LocalIntentClassifier]:
+    """Load the trained classifier from LOCAL_CLASSIFIER_PATH, or None if it has not been trained yet."""
+    path = os.getenv("LOCAL_CLASSIFIER_PATH", "models/intent_classifier.npz")
+    if not os.path.exists(path):
+        return None
+    return LocalIntentClassifier.load(path)
+
+
+def local_classification(query: str) -> Optional[dict]:
+    """
+    Classify a query locally when the model is confident enough.
+
+    Args:
+        query (str): The user query string.
+
+    Returns:
+        Optional[dict]: {"relevant", "action", "standalone_query"} like `classify_query`, or None when
+                        no model is available or its confidence is below LOCAL_CLASSIFIER_THRESHOLD.
+    """
+    model = get_local_classifier()
+    if model is None:
+        return None
+    label, confidence = model.predict(query)
+    if confidence < float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.9")):
+        return None
+    return {
+        "relevant": label != "irrelevant",
+        "action": "output" if label == "irrelevant" else label,
+        "standalone_query": query,
+    }
+
+
+def guess_action(query: str) -> str:
+    """Best-guess action for a query regardless of confidence, "output" when no model is available."""
+    model = get_local_classifier()
+    if model is None:
+        return "output"
+    label, _ = model.predict(query)
+    return "output" if label == "irrelevant" else label
+
+
+def classification_label(decision: dict) -> str:
+    """Map a `classify_query` decision onto one of LABELS."""
+    return decision["action"] if decision["relevant"] else "irrelevant"
+
+
+def log_classification(query: str, decision: dict):
+    """Append an LLM classification to the query log used as training data for the local model."""
+    path = os.getenv("CLASSIFICATION_LOG_PATH", ".cache/classification_log.jsonl")
+    try:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "a") as f:
+            f.write(json.dumps({"query": query, "label": classification_label(decision), "ts": time.time()}) + "\n")
+    except OSError as e:
+        print(f"Could not log classification: {e}")
@@ -0,0 +1,333 @@
+import json
+import re
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+MARKER_CLUSTERER_JS = "https://unpkg.com/@googlemaps/markerclusterer@2.5.3/dist/index.min.js"
+
+# Quoted items of a Python list literal or of a numpy array repr ("['a' 'b']")
+_QUOTED_ITEM = re.compile(r"'((?:[^'\\]|\\.)*)'|\"((?:[^\"\\]|\\.)*)\"")
+
+
+@lru_cache(maxsize=65536)
+def parse_features(raw: str) -> tuple:
+    """
+    Parse a stored `property_features` string into its items.
+
+    Handles list literals (["Balcony", "Gym"]) and numpy array reprs (['Balcony' 'Gym']) with one regex
+    pass instead of `ast.literal_eval`, which silently merges the adjacent strings of an array repr.
+    Results are memoized because many listings share the same feature strings.
+    """
+    raw = raw.strip()
+    if raw.startswith("[") and raw.endswith("]"):
+        items = [a or b for a, b in _QUOTED_ITEM.findall(raw)]
+    else:
+        items = [raw]
+    return tuple(item.strip() for item in items if item and item.strip())
+
+
+def _features_column(values: pd.Series) -> list:
+    features = []
+    for value in values:
+        if isinstance(value, str):
+            features.append(list(parse_features(value)))
+        elif isinstance(value, (list, tuple, np.ndarray)):
+            features.append([str(f).strip() for f in value if f is not None and str(f).strip()])
+        elif value is None or (isinstance(value, float) and np.isnan(value)):
+            features.append([])
+        else:
+            features.append([str(value)])
+    return features
+
+
+def listings_payload(selected: pd.DataFrame) -> str:
+    """
+    Serialize the listings to show as one compact JSON array of [lat, lng, price, title, pricing_index, features].
+
+    Args:
+        selected (pd.DataFrame): Rows with latitude, longitude, title, price_gbp, pricing_index, property_features.
+
+    Returns:
+        str: JSON safe to embed inside a <script> element.
+    """
+    selected = selected.dropna(subset=["latitude", "longitude"])
+
+    def column(name, digits=None):
+        if name not in selected.columns:
+            return [None] * len(selected)
+        values = pd.to_numeric(selected[name], errors="coerce")
+        if digits is not None:
+            values = values.round(digits)
+        return [None if pd.isna(v) else float(v) for v in values]
+
+    titles = selected["title"].fillna("").astype(str).tolist() if "title" in selected.columns else [""] * len(selected)
+    features = _features_column(selected["property_features"]) if "property_features" in selected.columns \
+        else [[] for _ in range(len(selected))]
+    rows = list(zip(column("latitude", 6), column("longitude", 6), column("price_gbp", 0), titles,
+                    column("pricing_index", 2), features))
+    payload = json.dumps(rows, ensure_ascii=False, separators=(",", ":"))
+    # Never let listing text close the surrounding <script> element
+    return payload.replace("</", "<\\/")
+
+
+def render_map_html(selected: pd.DataFrame, api_key: Optional[str], focus: Optional[dict] = None) -> str:
+    """
+    Render listings on Google Maps with client-side marker clustering.
+
+    All listings travel as one JSON array; markers are built in a loop in the browser and a single
+    InfoWindow is filled lazily when a marker is clicked, so the page scales to tens of thousands of rows.
+
+    Args:
+        selected (pd.DataFrame): Listings with latitude, longitude, title, price_gbp, pricing_index,
+                                 property_features columns.
+        api_key (str): The Google Maps API key.
+        focus (dict, optional): {"lat", "lng", "label", "radius_km"} to centre on and draw.
+
+    Returns:
+        str: An HTML string containing the Google Maps visualization.
+    """
+    payload = listings_payload(selected)
+    focus_json = json.dumps(focus or None).replace("</", "<\\/")
+
+    return f"""
+    <html><head><meta charset="utf-8"><title>Properties Map</title>
+    <style>body,html{{height:100%;margin:0}}#map{{height:100%;width:100%}}</style>
+    <script src="{MARKER_CLUSTERER_JS}"></script>
+    </head><body><div id="map"></div>
+    <script>
+      // [lat, lng, price, title, pricing_index, features]
+      const LISTINGS = {payload};
+      const FOCUS = {focus_json};
+
+      function esc(text) {{
+        const div = document.createElement('div');
+        div.textContent = text == null ? '' : String(text);
+        return div.innerHTML;
+      }}
+
+      function infoContent(row) {{
+        const price = row[2] == null ? '' : '£' + Math.round(row[2]).toLocaleString('en-GB');
+        const index = row[4] == null ? '' :
+          '<div style="font-size:12px;color:#555;margin-bottom:6px;">Pricing index: ' + row[4].toFixed(2) + '</div>';
+        const feats = row[5].map(f => '<li>' + esc(f) + '</li>').join('');
+        return '<div style="font-size:14px;max-width:260px;">' +
+          '<div style="font-weight:bold;margin-bottom:6px;">' + price + '</div>' +
+          '<div style="margin-bottom:6px;">' + esc(row[3]) + '</div>' + index +
+          '<ul style="margin:0;padding-left:18px;font-size:13px;">' + feats + '</ul></div>';
+      }}
+
+      function initMap() {{
+        const map = new google.maps.Map(document.getElementById('map'), {{ zoom: 13, center: {{ lat: 51.5074, lng: -0.1278 }} }});
+        const info = new google.maps.InfoWindow();
+        const bounds = new google.maps.LatLngBounds();
+        const markers = new Array(LISTINGS.length);
+        for (let i = 0; i < LISTINGS.length; i++) {{
+          const row = LISTINGS[i];
+          const position = {{ lat: row[0], lng: row[1] }};
+          const marker = new google.maps.Marker({{ position: position }});
+          marker.addListener('click', () => {{
+            info.setContent(infoContent(row));
+            info.open({{ map: map, anchor: marker }});
+          }});
+          markers[i] = marker;
+          bounds.extend(position);
+        }}
+
+        if (window.markerClusterer) {{
+          new markerClusterer.MarkerClusterer({{ map: map, markers: markers }});
+        }} else {{
+          markers.forEach(m => m.setMap(map));
+        }}
+
+        if (FOCUS) {{
+          map.setCenter({{ lat: FOCUS.lat, lng: FOCUS.lng }});
+          new google.maps.Marker({{
+            position: {{ lat: FOCUS.lat, lng: FOCUS.lng }}, map: map, title: FOCUS.label || '',
+            icon: 'https://maps.google.com/mapfiles/ms/icons/blue-dot.png'
+          }});
+          if (FOCUS.radius_km) {{
+            new google.maps.Circle({{
+              center: {{ lat: FOCUS.lat, lng: FOCUS.lng }}, radius: FOCUS.radius_km * 1000, map: map,
+              strokeColor: '#1a73e8', strokeOpacity: 0.8, strokeWeight: 2, fillColor: '#1a73e8', fillOpacity: 0.08
+            }});
+          }}
+        }} else if (LISTINGS.length > 1) {{
+          map.fitBounds(bounds);
+        }} else if (LISTINGS.length === 1) {{
+          map.setCenter({{ lat: LISTINGS[0][0], lng: LISTINGS[0][1] }});
+        }}
+      }}
+    </script>
+    <script src="https://maps.googleapis.com/maps/api/js?key={api_key}&callback=initMap&language=en" async defer></script>
+    </body></html>
+    """
+
+
+# ---------------------
+# Density mode
+# ---------------------
+KM_PER_DEGREE_LAT = 111.32
+# Upper bound on grid cells per side, which bounds the density page size regardless of the result size
+GRID_MAX_CELLS_PER_SIDE = 60
+GRID_MIN_CELL_KM = 0.25
+
+
+def _group_medians(groups: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    """Median of `values` per group id with one sort, ignoring NaNs. Groups without values get NaN."""
+    valid = ~np.isnan(values)
+    groups, values = groups[valid], values[valid]
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    medians = np.full(n_groups, np.nan)
+    has = counts > 0
+    low = starts[has] + (counts[has] - 1) // 2
+    high = starts[has] + counts[has] // 2
+    medians[has] = (values[low] + values[high]) / 2
+    return medians
+
+
+def aggregate_grid(selected: pd.DataFrame, cell_km: Optional[float] = None) -> pd.DataFrame:
+    """
+    Aggregate listings into a square grid with numpy.
+
+    Args:
+        selected (pd.DataFrame): Listings with latitude, longitude and optionally price_gbp, pricing_index.
+        cell_km (float, optional): Cell side in km. By default it is derived from the extent of the data so the
+                                   grid never exceeds GRID_MAX_CELLS_PER_SIDE cells per side.
+
+    Returns:
+        pd.DataFrame: One row per non-empty cell with south, west, north, east bounds, count,
+                      median_price_gbp and median_pricing_index.
+    """
+    lat = pd.to_numeric(selected["latitude"], errors="coerce").to_numpy(dtype=float)
+    lon = pd.to_numeric(selected["longitude"], errors="coerce").to_numpy(dtype=float)
+    valid = ~(np.isnan(lat) | np.isnan(lon))
+    lat, lon = lat[valid], lon[valid]
+    columns = ["south", "west", "north", "east", "count", "median_price_gbp", "median_pricing_index"]
+    if len(lat) == 0:
+        return pd.DataFrame(columns=columns)
+
+    km_per_degree_lon = KM_PER_DEGREE_LAT * np.cos(np.radians(lat.mean()))
+    if cell_km is None:
+        extent_km = max(np.ptp(lat) * KM_PER_DEGREE_LAT, np.ptp(lon) * km_per_degree_lon)
+        cell_km = max(GRID_MIN_CELL_KM, extent_km / GRID_MAX_CELLS_PER_SIDE)
+    step_lat, step_lon = cell_km / KM_PER_DEGREE_LAT, cell_km / km_per_degree_lon
+    lat0, lon0 = lat.min(), lon.min()
+    row = np.floor((lat - lat0) / step_lat).astype(np.int64)
+    col = np.floor((lon - lon0) / step_lon).astype(np.int64)
+
+    cells, groups = np.unique(row * (col.max() + 1) + col, return_inverse=True)
+    groups = groups.ravel()
+    n_cells = len(cells)
+    cell_row, cell_col = cells // (col.max() + 1), cells % (col.max() + 1)
+
+    def metric(name):
+        if name not in selected.columns:
+            return np.full(n_cells, np.nan)
+        values = pd.to_numeric(selected[name], errors="coerce").to_numpy(dtype=float)[valid]
+        return _group_medians(groups, values, n_cells)
+
+    return pd.DataFrame({
+        "south": lat0 + cell_row * step_lat,
+        "west": lon0 + cell_col * step_lon,
+        "north": lat0 + (cell_row + 1) * step_lat,
+        "east": lon0 + (cell_col + 1) * step_lon,
+        "count": np.bincount(groups, minlength=n_cells),
+        "median_price_gbp": metric("price_gbp"),
+        "median_pricing_index": metric("pricing_index"),
+    }, columns=columns)
+
+
+def render_density_html(grid: pd.DataFrame, api_key: Optional[str], focus: Optional[dict] = None,
+                        total: Optional[int] = None) -> str:
+    """
+    Render an aggregated grid as a choropleth layer on Google Maps.
+
+    Cells are coloured by median price (green = cheaper, red = pricier) with opacity growing with the
+    number of listings; clicking a cell shows its count, median price and median pricing index.
+
+    Args:
+        grid (pd.DataFrame): Output of `aggregate_grid`.
+        api_key (str): The Google Maps API key.
+        focus (dict, optional): {"lat", "lng", "label", "radius_km"} to centre on and draw.
+        total (int, optional): Number of listings aggregated, shown in the legend.
+
+    Returns:
+        str: An HTML string containing the Google Maps visualization.
+    """
+    rounded = grid.round({"south": 6, "west": 6, "north": 6, "east": 6, "median_price_gbp": 0,
+                          "median_pricing_index": 2})
+    cells = [[None if pd.isna(v) else (int(v) if k == "count" else float(v)) for k, v in zip(grid.columns, values)]
+             for values in rounded.itertuples(index=False, name=None)]
+    payload = json.dumps(cells, separators=(",", ":"))
+    focus_json = json.dumps(focus or None).replace("</", "<\\/")
+    total = int(grid["count"].sum()) if total is None else total
+
+    return f"""
+    <html><head><meta charset="utf-8"><title>Properties Density Map</title>
+    <style>body,html{{height:100%;margin:0}}#map{{height:100%;width:100%}}
+    #legend{{position:absolute;bottom:24px;left:10px;background:#fff;padding:8px 10px;font:13px sans-serif;
+    border-radius:4px;box-shadow:0 1px 4px rgba(0,0,0,.3)}}
+    #legend .bar{{height:10px;width:160px;background:linear-gradient(to right,hsl(120,70%,45%),hsl(60,70%,45%),hsl(0,70%,45%))}}</style>
+    </head><body><div id="map"></div>
+    <div id="legend"><div>{total:,} listings in <span id="cells"></span> cells</div>
+    <div class="bar"></div><div style="display:flex;justify-content:space-between">
+    <span id="low"></span><span>median rent</span><span id="high"></span></div></div>
+    <script>
+      // [south, west, north, east, count, median_price_gbp, median_pricing_index]
+      const CELLS = {payload};
+      const FOCUS = {focus_json};
+
+      function gbp(v) {{ return v == null ? 'n/a' : '£' + Math.round(v).toLocaleString('en-GB'); }}
+
+      function initMap() {{
+        const map = new google.maps.Map(document.getElementById('map'), {{ zoom: 11, center: {{ lat: 51.5074, lng: -0.1278 }} }});
+        const info = new google.maps.InfoWindow();
+        const bounds = new google.maps.LatLngBounds();
+        const prices = CELLS.map(c => c[5]).filter(v => v != null).sort((a, b) => a - b);
+        const low = prices.length ? prices[Math.floor(prices.length * 0.05)] : 0;
+        const high = prices.length ? prices[Math.floor(prices.length * 0.95)] : 1;
+        const maxCount = Math.max(1, ...CELLS.map(c => c[4]));
+        document.getElementById('cells').textContent = CELLS.length.toLocaleString('en-GB');
+        document.getElementById('low').textContent = gbp(low);
+        document.getElementById('high').textContent = gbp(high);
+
+        for (const c of CELLS) {{
+          const t = c[5] == null ? 0.5 : Math.min(1, Math.max(0, (c[5] - low) / Math.max(1, high - low)));
+          const cellBounds = {{ south: c[0], west: c[1], north: c[2], east: c[3] }};
+          const rect = new google.maps.Rectangle({{
+            bounds: cellBounds, map: map, strokeWeight: 0,
+            fillColor: 'hsl(' + Math.round(120 * (1 - t)) + ',70%,45%)',
+            fillOpacity: 0.25 + 0.5 * Math.sqrt(c[4] / maxCount)
+          }});
+          rect.addListener('click', (e) => {{
+            info.setContent('<div style="font-size:14px;"><b>' + c[4].toLocaleString('en-GB') + ' listings</b><br>' +
+              'Median rent: ' + gbp(c[5]) + '<br>Median pricing index: ' + (c[6] == null ? 'n/a' : c[6].toFixed(2)) + '</div>');
+            info.setPosition(e.latLng);
+            info.open(map);
+          }});
+          bounds.extend({{ lat: c[0], lng: c[1] }});
+          bounds.extend({{ lat: c[2], lng: c[3] }});
+        }}
+
+        if (FOCUS) {{
+          map.setCenter({{ lat: FOCUS.lat, lng: FOCUS.lng }});
+          if (FOCUS.radius_km) {{
+            new google.maps.Circle({{
+              center: {{ lat: FOCUS.lat, lng: FOCUS.lng }}, radius: FOCUS.radius_km * 1000, map: map,
+              strokeColor: '#1a73e8', strokeOpacity: 0.8, strokeWeight: 2, fillOpacity: 0
+            }});
+          }}
+        }} else if (CELLS.length) {{
+          map.fitBounds(bounds);
+        }}
+      }}
+    </script>
+    <script src="https://maps.googleapis.com/maps/api/js?key={api_key}&callback=initMap&language=en" async defer></script>
+    </body></html>
+    """
@@ -0,0 +1,153 @@
+import hashlib
+import re
+from typing import Callable, List, Optional
+
+import pandas as pd
+
+from src.response_cache import normalize_query
+
+# Every plot ends like the LLM-written code once adapted for Streamlit
+SHOW = "\nst.plotly_chart(fig, use_container_width=True)"
+
+TIME_WORDS = r"over time|trend|timeline|time series|per (?:day|week|month|year)|by (?:day|week|month|year)|" \
+             r"monthly|weekly|daily"
+DISTRIBUTION_WORDS = r"distribution|histogram|spread|range of"
+# Chart types no template draws: such requests always go to the LLM
+OTHER_CHART_WORDS = r"\bpie\b|donut|doughnut|\bbox\b|violin|heat ?map|treemap|sunburst|funnel|\bmap\b|\b3d\b|" \
+                    r"bubble|\barea\b"
+RELATION_WORDS = r"\bvs\.?\b|versus|against|relationship|correlat|compared to size|scatter"
+PRICE_COLUMNS = ["price_gbp", "predicted_price", "price_per_sqft"]
+SIZE_COLUMNS = ["size_sqft_max", "size_sqft_min", "size_sqft"]
+DATE_COLUMNS = ["added_on", "listing_update_date"]
+# Above this many bars the chart is unreadable and the LLM is asked instead
+MAX_BARS = 60
+
+
+def column_kind(series: pd.Series) -> str:
+    """"number", "datetime", "bool" or "text"; the part of a column's dtype plot code depends on."""
+    if pd.api.types.is_bool_dtype(series):
+        return "bool"
+    if pd.api.types.is_numeric_dtype(series):
+        return "number"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "datetime"
+    return "text"
+
+
+def plot_cache_key(query: str, data: pd.DataFrame) -> str:
+    """Key of the plot code for a request: the normalized query and the result's column names and kinds."""
+    schema = ",".join(f"{name}:{column_kind(data[name])}" for name in data.columns)
+    return hashlib.sha1(f"{normalize_query(query)}\x1f{schema}".encode()).hexdigest()
+
+
+def _title(query: str) -> str:
+    return repr(query.strip().rstrip("?.!")[:120] or "Result")
+
+
+def _first(columns: List[str], candidates: List[str]) -> Optional[str]:
+    return next((c for c in candidates if c in columns), None)
+
+
+def _numeric_columns(data: pd.DataFrame) -> List[str]:
+    return [c for c in data.columns if column_kind(data[c]) == "number"
+            and c not in ("id", "latitude", "longitude")]
+
+
+def time_series(query: str, data: pd.DataFrame) -> Optional[str]:
+    """Listings (or the mean of a price column) per month of `added_on`, for "over time" questions."""
+    date = _first(list(data.columns), DATE_COLUMNS)
+    if date is None or not re.search(TIME_WORDS, query, re.IGNORECASE):
+        return None
+    value = _first(list(data.columns), PRICE_COLUMNS) if re.search(r"price|rent|cost", query, re.I) else None
+    if value is None:
+        aggregate = ".size().reset_index(name='listings')"
+        y = "listings"
+    else:
+        aggregate = f"[{value!r}].mean().reset_index()"
+        y = value
+    return (
+        "import pandas as pd\n"
+        "import plotly.express as px\n"
+        f"dates = pd.to_datetime(df[{date!r}], errors='coerce')\n"
+        f"series = df.assign(month=dates.dt.to_period('M').dt.to_timestamp()).dropna(subset=['month'])"
+        f".groupby('month'){aggregate}\n"
+        f"fig = px.line(series, x='month', y={y!r}, markers=True, title={_title(query)})"
+        + SHOW)
+
+
+def scatter_price_size(query: str, data: pd.DataFrame) -> Optional[str]:
+    """Price against size, one point per listing, for "price vs size" questions."""
+    columns = list(data.columns)
+    price, size = _first(columns, PRICE_COLUMNS), _first(columns, SIZE_COLUMNS)
+    if price is None or size is None or not re.search(RELATION_WORDS, query, re.IGNORECASE):
+        return None
+    hover = [c for c in ("title", "display_address", "bedrooms") if c in columns]
+    return (
+        "import plotly.express as px\n"
+        f"points = df[df[{size!r}] > 0]\n"
+        f"fig = px.scatter(points, x={size!r}, y={price!r}, hover_data={hover!r}, opacity=0.6, "
+        f"title={_title(query)})"
+        + SHOW)
+
+
+def price_histogram(query: str, data: pd.DataFrame) -> Optional[str]:
+    """Histogram of the price column (or the only numeric column) of a list of listings."""
+    columns = list(data.columns)
+    numeric = _numeric_columns(data)
+    value = _first(columns, PRICE_COLUMNS) or (numeric[0] if len(numeric) == 1 else None)
+    if value is None or len(data) < 10 or not re.search(DISTRIBUTION_WORDS, query, re.IGNORECASE):
+        return None
+    return (
+        "import plotly.express as px\n"
+        f"fig = px.histogram(df, x={value!r}, nbins=40, title={_title(query)})"
+        + SHOW)
+
+
+def aggregate_bar(query: str, data: pd.DataFrame) -> Optional[str]:
+    """Bar chart of an aggregate by category: one text column and one or more numeric columns."""
+    labels = [c for c in data.columns if column_kind(data[c]) in ("text", "bool")]
+    numeric = _numeric_columns(data)
+    if len(labels) > 1 or not numeric or not 0 < len(data) <= MAX_BARS \
+            or re.search(r"\bline\b|scatter", query, re.IGNORECASE):
+        return None
+    if not labels:
+        # Group-bys on a numeric dimension (e.g. bedrooms) come back as two numeric columns
+        if len(numeric) != 2 or data[numeric[0]].duplicated().any():
+            return None
+        x, values = numeric[0], numeric[1:]
+        frame = f"df.assign(**{{{x!r}: df[{x!r}].astype(str)}})"
+    else:
+        x, values = labels[0], numeric
+        frame = "df"
+    y = values[0] if len(values) == 1 else values
+    return (
+        "import plotly.express as px\n"
+        f"fig = px.bar({frame}, x={x!r}, y={y!r}, barmode='group', "
+        f"title={_title(query)})"
+        + SHOW)
+
+
+# Tried in order; the first one matching the request and the result's shape is used
+TEMPLATES: List[Callable[[str, pd.DataFrame], Optional[str]]] = [
+    time_series, scatter_price_size, price_histogram, aggregate_bar,
+]
+
+
+def template_plot_code(query: str, data: pd.DataFrame) -> Optional[str]:
+    """
+    Plotly code for a request from the built-in templates, without an LLM.
+
+    Args:
+        query (str): The user's plot request.
+        data (pd.DataFrame): The result to plot, available to the code as `df`.
+
+    Returns:
+        Optional[str]: Code using `df` and `st` like the LLM-written code, or None when no template fits.
+    """
+    if data.empty or re.search(OTHER_CHART_WORDS, query, re.IGNORECASE):
+        return None
+    for template in TEMPLATES:
+        code = template(query, data)
+        if code is not None:
+            return code
+    return None
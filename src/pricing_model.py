@@ -0,0 +1,338 @@
+import json
+import os
+import shutil
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Bump when the feature definitions change, so cached feature matrices are rebuilt
+FEATURE_VERSION = 1
+
+CENTRE = (51.5074, -0.1278)  # Charing Cross
+KM_PER_DEGREE_LAT = 111.32
+
+NUMERIC_FEATURES = ["bedrooms", "bathrooms", "north_km", "east_km", "log_distance_to_center",
+                    "log_station_distance", "log_size_sqft", "size_missing"]
+CATEGORICAL_FEATURES = ["property_type", "furnish_type", "let_type", "borough", "travel_zone",
+                        "noise_level_class", "postcode_outcode", "nearest_station1_type"]
+# Columns of the dataset the features and the target are computed from
+INPUT_COLUMNS = ["id", "bedrooms", "bathrooms", "latitude", "longitude", "distance_to_center_km",
+                 "nearest_station1_distance_km", "size_sqft_min", "size_sqft_max", "price_gbp"] + CATEGORICAL_FEATURES
+
+# Listings outside this monthly rent range are scored but not trained on
+MIN_TRAINING_PRICE, MAX_TRAINING_PRICE = 300.0, 50_000.0
+# One listing in HOLDOUT_MODULUS is held out (by key) to report out-of-sample error
+HOLDOUT_MODULUS = 10
+GRAM_CHUNK_ROWS = 8192
+
+
+def _column(df: pd.DataFrame, name: str) -> pd.Series:
+    return df[name] if name in df.columns else pd.Series(np.nan, index=df.index)
+
+
+def _number(df: pd.DataFrame, name: str) -> np.ndarray:
+    return pd.to_numeric(_column(df, name), errors="coerce").to_numpy(dtype=float)
+
+
+def row_keys(df: pd.DataFrame) -> np.ndarray:
+    """64-bit hash of each listing's id and model inputs: a listing keeps its key until one of them changes."""
+    columns = [c for c in INPUT_COLUMNS if c in df.columns]
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy(dtype=np.uint64)
+
+
+def numeric_features(df: pd.DataFrame) -> np.ndarray:
+    """The (n, len(NUMERIC_FEATURES)) float32 block of the feature matrix."""
+    lat, lon = _number(df, "latitude"), _number(df, "longitude")
+    north = np.nan_to_num((lat - CENTRE[0]) * KM_PER_DEGREE_LAT)
+    east = np.nan_to_num((lon - CENTRE[1]) * KM_PER_DEGREE_LAT * np.cos(np.radians(CENTRE[0])))
+    size = np.fmax(_number(df, "size_sqft_min"), _number(df, "size_sqft_max"))
+    size_missing = ~(size > 0)
+    bedrooms = np.clip(np.nan_to_num(_number(df, "bedrooms"), nan=1.0), 0, 8)
+    bathrooms = np.clip(np.nan_to_num(_number(df, "bathrooms"), nan=1.0), 0, 6)
+    columns = [
+        bedrooms,
+        bathrooms,
+        north,
+        east,
+        np.log1p(np.nan_to_num(_number(df, "distance_to_center_km"), nan=10.0)),
+        np.log1p(np.nan_to_num(_number(df, "nearest_station1_distance_km"), nan=1.0)),
+        np.where(size_missing, 0.0, np.log(np.where(size_missing, 1.0, size))),
+        size_missing.astype(float),
+    ]
+    return np.column_stack(columns).astype(np.float32) if len(df) else np.zeros((0, len(columns)), np.float32)
+
+
+def categorical_codes(df: pd.DataFrame, vocab: Dict[str, List[str]]) -> np.ndarray:
+    """
+    The (n, len(CATEGORICAL_FEATURES)) int32 block of category codes.
+
+    Levels missing from `vocab` are appended to it, so codes of earlier rows stay valid.
+    """
+    codes = np.zeros((len(df), len(CATEGORICAL_FEATURES)), dtype=np.int32)
+    for j, name in enumerate(CATEGORICAL_FEATURES):
+        values = _column(df, name).astype(object).fillna("").astype(str).str.strip().str.lower()
+        levels = vocab.setdefault(name, [])
+        known = pd.Index(levels)
+        new = pd.Index(values.unique()).difference(known)
+        levels.extend(new.tolist())
+        codes[:, j] = pd.Index(levels).get_indexer(values)
+    return codes
+
+
+def layout(vocab: Dict[str, List[str]]) -> Tuple[int, np.ndarray]:
+    """Design matrix width and the offset of each categorical block: [intercept, numeric..., one-hot...]."""
+    sizes = [len(vocab.get(name, [])) for name in CATEGORICAL_FEATURES]
+    offsets = 1 + len(NUMERIC_FEATURES) + np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(int)
+    return 1 + len(NUMERIC_FEATURES) + sum(sizes), offsets
+
+
+def design(numeric: np.ndarray, codes: np.ndarray, width: int, offsets: np.ndarray) -> np.ndarray:
+    """Dense design rows (intercept, numeric values, one-hot categories) for a chunk of listings."""
+    rows = np.zeros((len(numeric), width))
+    rows[:, 0] = 1.0
+    rows[:, 1:1 + numeric.shape[1]] = numeric
+    rows[np.arange(len(codes))[:, None], offsets + codes] = 1.0
+    return rows
+
+
+def target(df: pd.DataFrame) -> np.ndarray:
+    """Log monthly rent, NaN for listings excluded from training."""
+    price = _number(df, "price_gbp")
+    trainable = (price >= MIN_TRAINING_PRICE) & (price <= MAX_TRAINING_PRICE)
+    return np.where(trainable, np.log(np.where(trainable, price, 1.0)), np.nan)
+
+
+class FeatureStore:
+    """
+    Cached, columnar feature matrix of the pricing model, with the model's sufficient statistics.
+
+    Each distinct listing (keyed by a hash of its id and inputs) has one row: a float32 block of numeric
+    features and an int32 block of category codes, stored as .npy files and memory-mapped on load. The
+    normal-equation statistics (X'X and X'y, split into train and holdout folds) are kept alongside and
+    updated incrementally: a new snapshot only featurizes listings that are new or changed, adds their
+    contribution and subtracts that of listings that disappeared, so retraining never rescans the rows
+    that stayed the same.
+    """
+
+    FILES = ("keys", "numeric", "codes", "target", "gram", "moment")
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        self.vocab: Dict[str, List[str]] = {}
+        self.keys = np.zeros(0, dtype=np.uint64)
+        self.numeric = np.zeros((0, len(NUMERIC_FEATURES)), dtype=np.float32)
+        self.codes = np.zeros((0, len(CATEGORICAL_FEATURES)), dtype=np.int32)
+        self.target = np.zeros(0)
+        width, _ = layout(self.vocab)
+        self.gram = np.zeros((2, width, width))
+        self.moment = np.zeros((2, width))
+
+    @classmethod
+    def load(cls, directory: str) -> "FeatureStore":
+        """The store saved in `directory`, or an empty one if there is none or it has an older feature version."""
+        store = cls(directory)
+        try:
+            with open(os.path.join(directory, "meta.json")) as f:
+                meta = json.load(f)
+            if meta.get("feature_version") != FEATURE_VERSION:
+                return store
+            for name in cls.FILES:
+                setattr(store, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r"))
+            store.vocab = meta["vocab"]
+        except (OSError, ValueError, KeyError):
+            return cls(directory)
+        return store
+
+    def save(self, directory: Optional[str] = None):
+        """Write the store to `directory` (its own by default), replacing the previous copy in one rename."""
+        directory = directory or self.directory
+        staging = directory.rstrip("/") + ".tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        for name in self.FILES:
+            np.save(os.path.join(staging, f"{name}.npy"), np.asarray(getattr(self, name)))
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump({"feature_version": FEATURE_VERSION, "vocab": self.vocab, "rows": len(self.keys)}, f)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(staging, directory)
+        self.directory = directory
+
+    def _accumulate(self, numeric: np.ndarray, codes: np.ndarray, y: np.ndarray, keys: np.ndarray, sign: float):
+        """Add (sign=1) or remove (sign=-1) the normal-equation contribution of trainable rows."""
+        width, offsets = layout(self.vocab)
+        trainable = np.flatnonzero(~np.isnan(y))
+        folds = (keys[trainable] % HOLDOUT_MODULUS == 0).astype(int)
+        for fold in (0, 1):
+            rows = trainable[folds == fold]
+            for start in range(0, len(rows), GRAM_CHUNK_ROWS):
+                chunk = rows[start:start + GRAM_CHUNK_ROWS]
+                x = design(np.asarray(numeric[chunk]), np.asarray(codes[chunk]), width, offsets)
+                self.gram[fold] += sign * (x.T @ x)
+                self.moment[fold] += sign * (x.T @ y[chunk])
+
+    def _resize(self, old_vocab: Dict[str, List[str]]):
+        """Re-lay out the statistics after new category levels were appended to the vocabulary."""
+        width, offsets = layout(self.vocab)
+        _, old_offsets = layout(old_vocab)
+        mapping = list(range(1 + len(NUMERIC_FEATURES)))
+        for name, old_offset, offset in zip(CATEGORICAL_FEATURES, old_offsets, offsets):
+            mapping += range(offset, offset + len(old_vocab.get(name, [])))
+        mapping = np.asarray(mapping, dtype=int)
+        gram, moment = np.zeros((2, width, width)), np.zeros((2, width))
+        gram[:, mapping[:, None], mapping[None, :]] = self.gram
+        moment[:, mapping] = self.moment
+        self.gram, self.moment = gram, moment
+
+    def update(self, df: pd.DataFrame, keys: Optional[np.ndarray] = None) -> dict:
+        """
+        Bring the store in line with a dataset snapshot.
+
+        Args:
+            df (pd.DataFrame): The full snapshot, with the INPUT_COLUMNS that it has.
+            keys (np.ndarray, optional): `row_keys(df)`, if already computed.
+
+        Returns:
+            dict: Row counts: "reused" (unchanged listings), "added" (new or changed), "removed" and "rows".
+        """
+        keys = row_keys(df) if keys is None else keys
+        unique_keys, first = np.unique(keys, return_index=True)
+        reused = np.isin(unique_keys, self.keys)
+        old_positions = pd.Index(self.keys).get_indexer(unique_keys[reused])
+        removed = np.setdiff1d(np.arange(len(self.keys)), old_positions)
+
+        old_vocab = json.loads(json.dumps(self.vocab))
+        fresh_positions = np.sort(first[~reused])
+        fresh, fresh_keys = df.iloc[fresh_positions], keys[fresh_positions]
+        fresh_numeric = numeric_features(fresh)
+        fresh_codes = categorical_codes(fresh, self.vocab)
+        fresh_target = target(fresh)
+        if self.vocab != old_vocab:
+            self._resize(old_vocab)
+
+        self.gram, self.moment = np.array(self.gram), np.array(self.moment)
+        self._accumulate(self.numeric[removed], self.codes[removed], np.asarray(self.target[removed]),
+                         self.keys[removed], -1.0)
+        self._accumulate(fresh_numeric, fresh_codes, fresh_target, fresh_keys, 1.0)
+
+        self.keys = np.concatenate((self.keys[old_positions], fresh_keys))
+        self.numeric = np.concatenate((self.numeric[old_positions], fresh_numeric))
+        self.codes = np.concatenate((self.codes[old_positions], fresh_codes))
+        self.target = np.concatenate((self.target[old_positions], fresh_target))
+        return {"rows": len(self.keys), "reused": len(old_positions), "added": len(fresh), "removed": len(removed)}
+
+    def rows_for(self, keys: np.ndarray) -> np.ndarray:
+        """Store row of each listing key (-1 for listings not in the store)."""
+        return pd.Index(self.keys).get_indexer(keys)
+
+
+class PricingModel:
+    """
+    Ridge regression of log monthly rent on the FeatureStore features, solved from its normal equations.
+
+    `predicted_price` is exp(prediction) times Duan's smearing factor, which corrects the downward bias
+    of exponentiating a log-scale estimate.
+    """
+
+    def __init__(self, weights: np.ndarray, vocab: Dict[str, List[str]], smearing: float = 1.0):
+        self.weights = weights
+        self.vocab = vocab
+        self.smearing = smearing
+
+    @classmethod
+    def fit(cls, gram: np.ndarray, moment: np.ndarray, vocab: Dict[str, List[str]], l2: float = 1.0) -> "PricingModel":
+        penalty = np.full(len(moment), l2)
+        penalty[0] = 0.0  # intercept
+        weights = np.linalg.solve(gram + np.diag(penalty) + 1e-9 * np.eye(len(moment)), moment)
+        return cls(weights, vocab)
+
+    def predict_log(self, numeric: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Log rent of feature rows, without materializing one-hot columns."""
+        _, offsets = layout(self.vocab)
+        result = self.weights[0] + np.asarray(numeric, dtype=float) @ self.weights[1:1 + len(NUMERIC_FEATURES)]
+        return result + self.weights[offsets + np.asarray(codes)].sum(axis=1)
+
+    def predict(self, numeric: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        return np.exp(self.predict_log(numeric, codes)) * self.smearing
+
+    def save(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez_compressed(path, weights=self.weights, smearing=self.smearing, vocab=json.dumps(self.vocab))
+
+    @classmethod
+    def load(cls, path: str) -> "PricingModel":
+        stored = np.load(path)
+        return cls(stored["weights"], json.loads(str(stored["vocab"])), float(stored["smearing"]))
+
+
+def _errors(model: PricingModel, store: FeatureStore, rows: np.ndarray) -> dict:
+    log_true = np.asarray(store.target[rows])
+    predicted = model.predict(store.numeric[rows], store.codes[rows])
+    actual = np.exp(log_true)
+    return {
+        "rows": int(len(rows)),
+        "median_ape": float(np.median(np.abs(predicted - actual) / actual)) if len(rows) else None,
+        "mae_gbp": float(np.mean(np.abs(predicted - actual))) if len(rows) else None,
+    }
+
+
+def retrain(df: pd.DataFrame, cache_dir: str, full: bool = False, l2: float = 1.0) -> Tuple[pd.DataFrame, dict]:
+    """
+    Refresh `predicted_price` and `pricing_index` for a dataset snapshot.
+
+    Args:
+        df (pd.DataFrame): The snapshot.
+        cache_dir (str): Feature store directory; updated in place for the next snapshot.
+        full (bool): Ignore the cached store and featurize every listing.
+        l2 (float): Ridge penalty on all weights but the intercept.
+
+    Returns:
+        tuple: (a copy of `df` with the two columns replaced, a report with row counts, holdout
+               errors and the seconds spent in each stage).
+    """
+    timings = {}
+    clock = time.perf_counter()
+
+    def lap(stage):
+        nonlocal clock
+        now = time.perf_counter()
+        timings[stage] = round(now - clock, 4)
+        clock = now
+
+    store = FeatureStore(cache_dir) if full else FeatureStore.load(cache_dir)
+    lap("load_features")
+    keys = row_keys(df)
+    lap("hash_rows")
+    counts = store.update(df, keys)
+    lap("featurize")
+
+    trained = np.flatnonzero(~np.isnan(np.asarray(store.target)))
+    holdout = trained[store.keys[trained] % HOLDOUT_MODULUS == 0]
+    evaluation = PricingModel.fit(store.gram[0], store.moment[0], store.vocab, l2)
+    model = PricingModel.fit(store.gram.sum(axis=0), store.moment.sum(axis=0), store.vocab, l2)
+    residuals = np.asarray(store.target[trained]) - model.predict_log(store.numeric[trained], store.codes[trained])
+    model.smearing = evaluation.smearing = float(np.mean(np.exp(residuals))) if len(trained) else 1.0
+    lap("fit")
+
+    rows = store.rows_for(keys)
+    predicted = model.predict(store.numeric[rows], store.codes[rows])
+    scored = df.copy()
+    scored["predicted_price"] = np.round(predicted, 2)
+    scored["pricing_index"] = np.round(_number(df, "price_gbp") / predicted, 4)
+    lap("score")
+
+    store.save(cache_dir)
+    model.save(os.path.join(cache_dir, "model.npz"))
+    lap("save_features")
+
+    report = {
+        **counts,
+        "trained_on": int(len(trained)),
+        "features": int(len(model.weights)),
+        "holdout": _errors(evaluation, store, holdout),
+        "seconds": {**timings, "total": round(sum(timings.values()), 4)},
+    }
+    return scored, report
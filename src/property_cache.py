@@ -0,0 +1,182 @@
+import asyncio
+import os
+import re
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from src.response_cache import ResponseCache
+from src.scrap_data import iter_scrape_properties
+
+PROPERTY_ID_RE = re.compile(r"/properties/(\d+)")
+
+# Streaming scraper: URLs -> one {"url", "ok", "property", "error", ...} result per URL as it completes
+Scraper = Callable[[List[str]], AsyncIterator[Dict[str, Any]]]
+
+
+def property_id(url: str) -> Optional[str]:
+    """Rightmove property id of a property URL, e.g. ".../properties/150912345" -> "150912345"."""
+    match = PROPERTY_ID_RE.search(url)
+    return match.group(1) if match else None
+
+
+class PropertyCache:
+    """
+    Cache of scraped `parse_property` results keyed by Rightmove property id.
+
+    Entries younger than `ttl_seconds` are served as they are. Older entries, up to `max_age_seconds`,
+    are still served immediately (stale-while-revalidate) while one background scrape refreshes them.
+    Only ids that are missing altogether are scraped inline, once per id per batch, and their results
+    are streamed back as each page completes. Entries are stored
+    in a `ResponseCache`, so they survive restarts and are shared between worker processes, and so
+    are the counters reported by `stats`.
+    """
+
+    NAMESPACE = "property"
+
+    def __init__(self, store: ResponseCache, scrape: Scraper, ttl_seconds: float = 6 * 3600,
+                 max_age_seconds: float = 7 * 24 * 3600):
+        self.store = store
+        self.scrape = scrape
+        self.ttl_seconds = ttl_seconds
+        self.max_age_seconds = max_age_seconds
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    def _lookup(self, pid: str, now: float):
+        """The cached property and whether it is stale, or (None, False) on a miss."""
+        entry = self.store.get(self.NAMESPACE, pid)
+        if entry is None or now - entry["fetched_at"] > self.max_age_seconds:
+            return None, False
+        return entry["property"], now - entry["fetched_at"] > self.ttl_seconds
+
+    async def _scrape_and_store(self, urls: List[str]) -> AsyncIterator[Dict[str, Any]]:
+        """Scrape URLs, storing each property as soon as its page is parsed."""
+        async for result in self.scrape(urls):
+            self.store.increment("fetched")
+            if result["ok"]:
+                prop = result["property"]
+                self.store.set(self.NAMESPACE, str(prop.get("id")),
+                               {"fetched_at": time.time(), "property": prop})
+            yield result
+
+    async def _refresh(self, urls: List[str]):
+        try:
+            async for result in self._scrape_and_store(urls):
+                if result["ok"]:
+                    self.store.increment("refreshes")
+        except Exception as e:
+            print(f"Background property refresh failed: {e}")
+
+    def _schedule_refresh(self, stale: Dict[str, str]):
+        """Refresh stale ids in the background, skipping ids whose refresh is already running."""
+        stale = {pid: url for pid, url in stale.items() if pid not in self._refreshing}
+        if not stale:
+            return
+        task = asyncio.create_task(self._refresh(list(stale.values())))
+        for pid in stale:
+            self._refreshing[pid] = task
+        task.add_done_callback(lambda t: [self._refreshing.pop(pid, None) for pid in stale])
+
+    async def iter_properties(self, urls: List[str]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Scraped properties for Rightmove URLs, from the cache where possible, as soon as each is available.
+
+        Args:
+            urls (list of str): Property URLs; several URLs for the same property are scraped once.
+
+        Yields:
+            dict: {"url", "ok", "property", "error", "cached", "stale", "cost"} per distinct property: cached
+                  ones first, then scraped ones in completion order. Failed scrapes have "ok" False and an
+                  "error". "stale" cached ones are being refreshed in the background. "cost" is the Scrapfly
+                  credits spent on the property inline (0 when cached).
+        """
+        now = time.time()
+        order, first_url = [], {}
+        for url in urls:
+            pid = property_id(url)
+            if pid is not None and pid not in first_url:
+                first_url[pid] = url
+                order.append(pid)
+
+        found, stale, missing = {}, {}, {}
+        for pid in order:
+            prop, is_stale = self._lookup(pid, now)
+            if prop is None:
+                missing[pid] = first_url[pid]
+            else:
+                found[pid] = prop
+                if is_stale:
+                    stale[pid] = first_url[pid]
+
+        self.store.increment("requested", len(urls))
+        self.store.increment("fresh_hits", len(found) - len(stale))
+        self.store.increment("stale_hits", len(stale))
+        # Every URL served without a scrape: fresh hits and in-batch duplicates. Stale hits are not saved,
+        # their background refresh scrapes the page all the same
+        self.store.increment("saved_fetches", len(urls) - len(missing) - len(stale))
+
+        if stale:
+            self._schedule_refresh(stale)
+        for pid, prop in found.items():
+            yield {"url": first_url[pid], "ok": True, "property": prop, "error": None, "cached": True,
+                   "stale": pid in stale, "cost": 0}
+        if missing:
+            async for result in self._scrape_and_store(list(missing.values())):
+                yield {"url": result["url"], "ok": result["ok"], "property": result["property"],
+                       "error": result["error"], "cached": False, "stale": False, "cost": result.get("cost", 0)}
+
+    async def get_properties(self, urls: List[str]) -> List[Dict[str, Any]]:
+        """
+        Scraped properties for Rightmove URLs, from the cache where possible.
+
+        Returns:
+            list of dict: `parse_property` results in the order of the URLs, without duplicates.
+                          Properties that could not be scraped are left out.
+        """
+        by_id = {}
+        async for result in self.iter_properties(urls):
+            if result["ok"]:
+                by_id[property_id(result["url"])] = result["property"]
+        order = dict.fromkeys(property_id(url) for url in urls)
+        return [by_id[pid] for pid in order if pid in by_id]
+
+    async def join(self):
+        """Wait for the background refreshes started so far."""
+        tasks = set(self._refreshing.values())
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        """Counters across all processes: requests, fresh/stale hits, scrapes done and saved, hit rate."""
+        counters = self.store.counters()
+        requested = counters.get("requested", 0)
+        hits = counters.get("fresh_hits", 0) + counters.get("stale_hits", 0)
+        return {
+            "requested": requested,
+            "fresh_hits": counters.get("fresh_hits", 0),
+            "stale_hits": counters.get("stale_hits", 0),
+            "fetched": counters.get("fetched", 0),
+            "refreshes": counters.get("refreshes", 0),
+            "saved_fetches": counters.get("saved_fetches", 0),
+            "hit_rate": hits / requested if requested else 0.0,
+        }
+
+
+_property_cache = None
+
+
+def get_property_cache() -> PropertyCache:
+    """
+    Process-wide property cache scraping through Scrapfly, configured with PROPERTY_CACHE_PATH,
+    PROPERTY_CACHE_TTL_SECONDS (fresh for 6 hours) and PROPERTY_CACHE_MAX_AGE_SECONDS (served stale up to 7 days).
+    """
+    global _property_cache
+    if _property_cache is None:
+        max_age = float(os.getenv("PROPERTY_CACHE_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+        _property_cache = PropertyCache(
+            store=ResponseCache(os.getenv("PROPERTY_CACHE_PATH", ".cache/properties.sqlite"),
+                                max_entries=100_000, ttl_seconds=max_age),
+            scrape=iter_scrape_properties,
+            ttl_seconds=float(os.getenv("PROPERTY_CACHE_TTL_SECONDS", str(6 * 3600))),
+            max_age_seconds=max_age,
+        )
+    return _property_cache
@@ -0,0 +1,558 @@
+import os
+import re
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.analytics import ListingAnalyzer, aggregate_name
+from src.spatial_index import KM_PER_MILE, SpatialIndex, build_places, haversine_km
+
+# Columns returned for listing-style answers (kept if present in the dataset)
+LISTING_COLUMNS = [
+    "id", "title", "display_address", "borough", "district", "property_type",
+    "bedrooms", "bathrooms", "price_gbp", "furnish_type", "travel_zone",
+    "size_sqft_max", "latitude", "longitude", "pricing_index",
+]
+
+# Most rows a listing-style answer without an explicit limit ("flats in Camden") may have, as the DuckDB
+# backend's DUCKDB_MAX_ROWS; larger matches fall back instead of being cut short. Maps aggregate large
+# results into a density grid server-side, so they get more
+MAX_ROWS = int(os.getenv("FAST_QUERY_MAX_ROWS", "5000"))
+ACTION_MAX_ROWS = {"geospatial_plot": int(os.getenv("FAST_QUERY_MAP_MAX_ROWS", "50000"))}
+
+# Phrases that map onto a group-by dimension
+GROUP_DIMENSIONS = {
+    "borough": "borough",
+    "boroughs": "borough",
+    "district": "district",
+    "districts": "district",
+    "area": "district",
+    "areas": "district",
+    "neighbourhood": "district",
+    "neighborhood": "district",
+    "number of bedrooms": "bedrooms",
+    "bedroom count": "bedrooms",
+    "bedrooms": "bedrooms",
+    "bedroom": "bedrooms",
+    "rooms": "bedrooms",
+    "property type": "property_type",
+    "type": "property_type",
+    "furnish type": "furnish_type",
+    "furnishing": "furnish_type",
+    "travel zone": "travel_zone",
+    "zone": "travel_zone",
+    "zones": "travel_zone",
+}
+
+# Counts first so "total number of" is not read as a sum
+AGGREGATIONS = {
+    "how many": "count",
+    r"(?:total\s+)?number of": "count",
+    "count": "count",
+    "average": "mean",
+    "avg": "mean",
+    "mean": "mean",
+    "median": "median",
+    "maximum": "max",
+    "max": "max",
+    "minimum": "min",
+    "min": "min",
+    "total": "sum",
+}
+
+# Metric columns for aggregations, first match wins
+METRICS = {
+    "price per sqft": "price_per_sqft",
+    "price per square foot": "price_per_sqft",
+    "size": "size_sqft_max",
+    "sqft": "size_sqft_max",
+    "pricing index": "pricing_index",
+    "rent": "price_gbp",
+    "rents": "price_gbp",
+    "price": "price_gbp",
+    "prices": "price_gbp",
+}
+
+# Columns named by an aggregate that cannot be aggregated by the fast path ("average number of bedrooms")
+NOT_METRICS = r"\b(?:bed|beds|bedroom|bedrooms|br|bdr|room|rooms|bathroom|bathrooms)\b"
+
+# Columns of "sorted by <column>" / "ordered by <column>", first match wins
+SORT_COLUMNS = {
+    "pricing index": "pricing_index",
+    "size": "size_sqft_max",
+    "sqft": "size_sqft_max",
+    "rent": "price_gbp",
+    "price": "price_gbp",
+    "prices": "price_gbp",
+    "bedrooms": "bedrooms",
+    "date added": "added_on",
+    "date": "added_on",
+}
+
+SORTS = {
+    "cheapest": ("price_gbp", True),
+    "least expensive": ("price_gbp", True),
+    "lowest priced": ("price_gbp", True),
+    "most expensive": ("price_gbp", False),
+    "priciest": ("price_gbp", False),
+    "highest priced": ("price_gbp", False),
+    "largest": ("size_sqft_max", False),
+    "biggest": ("size_sqft_max", False),
+    "smallest": ("size_sqft_max", True),
+    "newest": ("added_on", False),
+    "latest": ("added_on", False),
+    "most recent": ("added_on", False),
+    "best value": ("pricing_index", True),
+    "best deals": ("pricing_index", True),
+}
+
+PROPERTY_TYPES = {
+    "flat": ["flat", "apartment"],
+    "flats": ["flat", "apartment"],
+    "apartment": ["flat", "apartment"],
+    "apartments": ["flat", "apartment"],
+    "house": ["house"],
+    "houses": ["house"],
+    "maisonette": ["maisonette"],
+    "maisonettes": ["maisonette"],
+    "penthouse": ["penthouse"],
+    "penthouses": ["penthouse"],
+}
+
+# Words that carry no filtering meaning for the fast path. Anything left over after
+# parsing that is not in this set means the query needs the LLM.
+IGNORABLE_WORDS = set("""
+a an the all any some me us i we you my our show list find give get display return what which where
+is are was be there of in on at to for from with and or by per each across within
+property properties listing listings home homes place places rental rentals rent rents renting let lets
+to-let available london uk please can could would like want see tell look looking
+price prices priced cost costs gbp pound pounds pcm month monthly pm
+plot chart graph bar pie histogram line scatter boxplot box visualise visualize visually draw make create
+map maps locate located location locations them it their its they those these
+data table result results value values do does distribution breakdown
+""".split())
+
+MONEY_RE = r"£?\s*(\d[\d,]*(?:\.\d+)?)\s*(k|m)?\b"
+# Radius used for "near X" when the query gives no distance
+NEAR_RADIUS_KM = 1.0
+DISTANCE_UNITS = {
+    "mile": KM_PER_MILE, "miles": KM_PER_MILE, "mi": KM_PER_MILE,
+    "km": 1.0, "kilometre": 1.0, "kilometres": 1.0, "kilometer": 1.0, "kilometers": 1.0,
+    "m": 0.001, "metre": 0.001, "metres": 0.001, "meter": 0.001, "meters": 0.001,
+}
+DISTANCE_RE = r"(\d+(?:\.\d+)?)\s*(" + "|".join(sorted(DISTANCE_UNITS, key=len, reverse=True)) + r")\b"
+
+# Stops counts of rooms or distances from being read as prices
+NOT_A_PRICE = r"(?!\s*(?:bed|beds|bedroom|bedrooms|br|bdr|room|rooms|mile|miles|km|minutes|mins)\b)"
+
+
+def filter_mask(series: pd.Series, column: str, op: str, value) -> pd.Series:
+    """Boolean mask of the values of `series` passing one parsed filter."""
+    if op == "==" and column == "travel_zone":
+        return series.astype(str).str.extract(r"(\d+)", expand=False) == value
+    if op == "==":
+        return series == value
+    if op == ">=":
+        return series >= value
+    if op == "<=":
+        return series <= value
+    if op == "contains":
+        pattern = r"\b(?:" + "|".join(value) + r")\b"
+        return series.astype(str).str.lower().str.contains(pattern, na=False)
+    raise ValueError(f"Unknown filter operator {op}")
+
+
+def _parse_money(number: str, suffix: Optional[str]) -> float:
+    value = float(number.replace(",", ""))
+    if suffix == "k":
+        value *= 1_000
+    elif suffix == "m":
+        value *= 1_000_000
+    return value
+
+
+class FastQueryEngine:
+    """
+    Deterministic query layer over the listings dataframe.
+
+    Parses common question shapes (filters on borough/district/bedrooms/price/furnish_type/travel_zone,
+    spatial constraints around known places, sorting, top-N and group-by aggregates) into a structured spec
+    and executes it with vectorized pandas and a spatial index. Aggregates over the analyzer's dimensions
+    are answered from its precomputed cube without touching the rows.
+    Queries the parser cannot fully explain return None so the caller can fall back to PandasAI.
+    """
+
+    def __init__(self, df: pd.DataFrame, analyzer: Optional[ListingAnalyzer] = None, max_rows: int = MAX_ROWS):
+        self.df = pd.DataFrame(df, copy=False)
+        self.max_rows = max_rows
+        self.analyzer = analyzer if analyzer is not None else ListingAnalyzer(self.df)
+        self._spatial_index = None
+        self.places = build_places(self.df)
+        place_names = sorted(self.places, key=len, reverse=True)
+        self.place_re = r"(?:the\s+)?(" + "|".join(map(re.escape, place_names)) + r")\b"
+        self.furnish_types = self._vocabulary("furnish_type")
+        # Districts first so boroughs win when both share a name
+        self.locations = {}
+        for column in ("district", "borough"):
+            self.locations.update({name: (column, value) for name, value in self._vocabulary(column).items()})
+        names = sorted(self.locations, key=len, reverse=True)
+        self.location_re = re.compile(r"\b(" + "|".join(map(re.escape, names)) + r")\b") if names else None
+
+    def _vocabulary(self, column: str) -> dict:
+        """Map lower-cased values of a categorical column to their original spelling."""
+        if column not in self.df.columns:
+            return {}
+        values = self.df[column].dropna().astype(str).unique()
+        return {v.strip().lower().replace("'", ""): v for v in values if v.strip()}
+
+    @property
+    def spatial_index(self) -> SpatialIndex:
+        """KD-tree over the listing coordinates, built on first use and kept for the dataset's lifetime."""
+        if self._spatial_index is None:
+            self._spatial_index = SpatialIndex(self.df)
+        return self._spatial_index
+
+    @staticmethod
+    def _normalize(query: str) -> str:
+        text = " " + query.lower().replace("’", "").replace("'", "").replace("-", " ") + " "
+        text = re.sub(r"(?<=\d),(?=\d)", "", text)
+        return re.sub(r"[?!,;:\"()]|\.(?!\d)", " ", text)
+
+    def _parse_spatial(self, text: str):
+        """
+        Extract spatial constraints around known places from normalized query text.
+
+        Returns:
+            tuple: (list of constraint dicts, text with the matched phrases removed, requested count or None)
+        """
+        constraints = []
+        count = None
+        if not self.places:
+            return constraints, text, count
+
+        def consume(pattern: str):
+            nonlocal text
+            match = re.search(pattern, text)
+            if match:
+                text = text[:match.start()] + " " + text[match.end():]
+            return match
+
+        def point(kind: str, name: str, **extra) -> dict:
+            lat, lon = self.places[name]
+            return {"kind": kind, "place": name, "lat": lat, "lon": lon, **extra}
+
+        # North/south of the river or of a place, east/west of a place
+        m = consume(r"\b(north|south)\s+of\s+(?:the\s+)?(?:river\s+)?thames\b|\b(north|south)\s+of\s+the\s+river\b")
+        if m:
+            constraints.append({"kind": m.group(1) or m.group(2), "place": "thames", "lat": None, "lon": None})
+        m = consume(r"\b(north|south|east|west)\s+of\s+" + self.place_re)
+        if m:
+            constraints.append(point(m.group(1), m.group(2)))
+
+        # Explicit distances: "within 1.5 miles of", "no further than 500m from", "2 km from"
+        m = consume(r"\b(?:(?:within|no further than|no more than|less than|under|up to)\s+)?" + DISTANCE_RE
+                    + r"\s+(?:of|from|to|around)\s+" + self.place_re)
+        if m:
+            radius = float(m.group(1)) * DISTANCE_UNITS[m.group(2)]
+            constraints.append(point("radius", m.group(3), radius_km=radius))
+        else:
+            m = consume(r"\b(?:near|nearby|close to|next to|around|walking distance (?:of|from|to))\s+" + self.place_re)
+            if m:
+                constraints.append(point("radius", m.group(1), radius_km=NEAR_RADIUS_KM))
+
+        # Nearest listings: "5 closest flats to Hyde Park"
+        m = consume(r"\b(?:(\d+)\s+)?(?:closest|nearest)\b")
+        if m:
+            target = consume(r"\b(?:to|from)\s+" + self.place_re)
+            if target:
+                count = int(m.group(1)) if m.group(1) else 10
+                constraints.append(point("nearest", target.group(1)))
+            else:
+                text = text + " nearest"  # not understood, leave it for the leftover check
+        return constraints, text, count
+
+    def spatial_focus(self, query: str) -> Optional[dict]:
+        """
+        The place a query is centred on, for maps.
+
+        Args:
+            query (str): The user query string.
+
+        Returns:
+            Optional[dict]: {"lat", "lng", "label", "radius_km"} for the first point-based constraint
+                            (radius_km is None for nearest/directional queries), or None.
+        """
+        constraints, _, _ = self._parse_spatial(self._normalize(query))
+        for c in constraints:
+            if c["lat"] is not None:
+                return {"lat": c["lat"], "lng": c["lon"], "label": c["place"].title(),
+                        "radius_km": c.get("radius_km")}
+        return None
+
+    # ---------------------
+    # Parsing
+    # ---------------------
+    def parse(self, query: str) -> Optional[dict]:
+        """
+        Parse a natural-language query into a structured spec.
+
+        Args:
+            query (str): The user query string.
+
+        Returns:
+            Optional[dict]: {"filters": [(column, op, value)], "spatial": [constraint], "sort": (column, ascending)
+                             | None, "limit": int | None, "group_by": column | None, "agg": (func, column) | None},
+                            or None if the query contains anything the fast path cannot express.
+        """
+        text = self._normalize(query)
+        spec = {"filters": [], "sort": None, "limit": None, "group_by": None, "agg": None}
+
+        # Spatial phrases come first so distances like "500m" are not read as prices
+        spec["spatial"], text, spec["limit"] = self._parse_spatial(text)
+
+        def consume(pattern: str):
+            nonlocal text
+            match = re.search(pattern, text)
+            if match:
+                text = text[:match.start()] + " " + text[match.end():]
+            return match
+
+        # Price ranges come first so their numbers are not mistaken for bedrooms or limits
+        m = consume(r"\bbetween\s+" + MONEY_RE + r"\s+and\s+" + MONEY_RE + NOT_A_PRICE)
+        if m:
+            spec["filters"].append(("price_gbp", ">=", _parse_money(m.group(1), m.group(2))))
+            spec["filters"].append(("price_gbp", "<=", _parse_money(m.group(3), m.group(4))))
+        m = consume(r"\b(?:under|below|less than|cheaper than|up to|max(?:imum)?(?: of)?|no more than)\s+"
+                    + MONEY_RE + NOT_A_PRICE)
+        if m:
+            spec["filters"].append(("price_gbp", "<=", _parse_money(m.group(1), m.group(2))))
+        m = consume(r"\b(?:over|above|more than|at least|min(?:imum)?(?: of)?)\s+" + MONEY_RE
+                    + NOT_A_PRICE)
+        if m:
+            spec["filters"].append(("price_gbp", ">=", _parse_money(m.group(1), m.group(2))))
+
+        # Bedrooms
+        if consume(r"\bstudios?\b"):
+            spec["filters"].append(("bedrooms", "==", 0))
+        m = consume(r"\b(?:at least\s+)?(\d+)\s*(\+|or more)?\s*(?:bed|beds|bedroom|bedrooms|br|bdr)\b")
+        if m:
+            op = ">=" if (m.group(2) or "at least" in m.group(0)) else "=="
+            spec["filters"].append(("bedrooms", op, int(m.group(1))))
+
+        # Travel zone
+        m = consume(r"\b(?:travel\s+)?zones?\s+(\d)\b")
+        if m:
+            spec["filters"].append(("travel_zone", "==", m.group(1)))
+
+        # Furnishing (longest phrase first so "unfurnished" is not read as "furnished")
+        for phrase in sorted(self.furnish_types, key=len, reverse=True):
+            if consume(r"\b" + re.escape(phrase) + r"\b"):
+                spec["filters"].append(("furnish_type", "==", self.furnish_types[phrase]))
+                break
+
+        # Explicit ordering, before the group-by so "sorted by bedrooms" is not read as one
+        m = consume(r"\b(?:sort|sorted|order|ordered)\s+by\s+(?:the\s+)?("
+                    + "|".join(map(re.escape, SORT_COLUMNS)) + r")\b(?:\s+(ascending|asc|descending|desc)\b)?")
+        if m:
+            spec["sort"] = (SORT_COLUMNS[m.group(1)], not (m.group(2) or "").startswith("desc"))
+
+        # Group-by, before the aggregation so "by number of bedrooms" is not read as a count
+        m = consume(r"\b(?:by|per|for each|for every|across|in each|grouped by)\s+(?:the\s+)?("
+                    + "|".join(sorted(map(re.escape, GROUP_DIMENSIONS), key=len, reverse=True)) + r")\b")
+        if m:
+            spec["group_by"] = GROUP_DIMENSIONS[m.group(1)]
+
+        # Aggregation over a metric; any other column ("average bedrooms") needs the LLM
+        for phrase, func in AGGREGATIONS.items():
+            if consume(r"\b" + phrase + r"\b"):
+                metric = None
+                for metric_phrase, column in METRICS.items():
+                    if consume(r"\b" + metric_phrase + r"\b"):
+                        metric = column
+                        break
+                if metric is None and re.search(NOT_METRICS, text):
+                    return None
+                if func != "count" and metric is None:
+                    metric = "price_gbp"
+                spec["agg"] = (func, metric or "id")
+                break
+        if spec["group_by"] and spec["agg"] is None:
+            spec["agg"] = ("count", "id")
+
+        # Locations (longest names first so "camden town" beats "camden"), at most one per column
+        matched_columns = set()
+        for match in list(self.location_re.finditer(text)) if self.location_re else []:
+            column, value = self.locations[match.group(1)]
+            if column not in matched_columns:
+                matched_columns.add(column)
+                spec["filters"].append((column, "==", value))
+                text = text[:match.start()] + " " * len(match.group(0)) + text[match.end():]
+
+        # Property type
+        m = consume(r"\b(" + "|".join(PROPERTY_TYPES) + r")\b")
+        if m:
+            spec["filters"].append(("property_type", "contains", PROPERTY_TYPES[m.group(1)]))
+
+        # Sorting and top-N
+        for phrase, order in SORTS.items():
+            m = consume(r"\b(?:(\d+)\s+)?" + phrase + r"\b(?:\s+(\d+))?")
+            if m:
+                spec["sort"] = order
+                spec["limit"] = int(m.group(1) or m.group(2) or 10)
+                break
+        m = consume(r"\b(?:top|first)\s+(\d+)\b")
+        if m:
+            spec["limit"] = int(m.group(1))
+        if spec["sort"] and consume(r"\b(?:desc|descending)\b"):
+            spec["sort"] = (spec["sort"][0], False)
+        elif spec["sort"] and consume(r"\b(?:asc|ascending)\b"):
+            spec["sort"] = (spec["sort"][0], True)
+
+        # Anything left that we do not understand means the LLM has to handle it
+        leftovers = [w for w in re.findall(r"[a-z']+|\d+", text) if w not in IGNORABLE_WORDS]
+        if leftovers:
+            return None
+        if not (spec["filters"] or spec["spatial"] or spec["sort"] or spec["agg"] or spec["limit"]):
+            return None
+        return spec
+
+    # ---------------------
+    # Execution
+    # ---------------------
+    def execute(self, spec: dict, max_rows: Optional[int] = None) -> Optional[pd.DataFrame]:
+        """
+        Execute a parsed spec against the dataframe.
+
+        Args:
+            spec (dict): A spec produced by `parse`.
+            max_rows (int, optional): Most rows of a listing-style answer when the query sets no limit.
+                                      Defaults to the engine's `max_rows`.
+
+        Returns:
+            Optional[pd.DataFrame]: The result table, or None if the dataset lacks a required column or the
+                                    answer has more than `max_rows` rows.
+        """
+        df = self.df
+        needed = {f[0] for f in spec["filters"]}
+        if spec["sort"]:
+            needed.add(spec["sort"][0])
+        if spec["group_by"]:
+            needed.add(spec["group_by"])
+        if spec["agg"] and spec["agg"][1] == "price_per_sqft":
+            needed.update({"price_gbp", "size_sqft_max"})
+        elif spec["agg"]:
+            needed.add(spec["agg"][1])
+        if spec.get("spatial"):
+            needed.update({"latitude", "longitude"})
+        if not needed.issubset(df.columns):
+            return None
+
+        if spec["agg"]:
+            cached = self._aggregate_from_cube(spec)
+            if cached is not None:
+                return cached
+
+        mask = pd.Series(True, index=df.index)
+        for column, op, value in spec["filters"]:
+            mask &= filter_mask(df[column], column, op, value)
+        reference = None
+        for constraint in spec.get("spatial", []):
+            mask &= self._spatial_mask(constraint)
+            if constraint["kind"] in ("radius", "nearest") and reference is None:
+                reference = constraint
+        selected = df[mask]
+
+        if spec["agg"]:
+            return self._aggregate(selected, spec)
+
+        if reference is not None:
+            distances = haversine_km(reference["lat"], reference["lon"], selected["latitude"], selected["longitude"])
+            selected = selected.assign(distance_km=np.round(distances, 3))
+            if reference["kind"] == "nearest" or not spec["sort"]:
+                selected = selected.sort_values("distance_km", kind="stable")
+
+        if spec["sort"] and (reference is None or reference["kind"] != "nearest"):
+            column, ascending = spec["sort"]
+            selected = selected.dropna(subset=[column]).sort_values(column, ascending=ascending, kind="stable")
+        if spec["limit"]:
+            selected = selected.head(spec["limit"])
+        elif len(selected) > (max_rows or self.max_rows):
+            return None
+        columns = [c for c in LISTING_COLUMNS + ["distance_km"] if c in selected.columns]
+        return selected[columns].reset_index(drop=True)
+
+    def _spatial_mask(self, constraint: dict) -> np.ndarray:
+        """Boolean row mask for one spatial constraint, answered from the spatial index."""
+        index = self.spatial_index
+        kind = constraint["kind"]
+        if kind == "radius":
+            positions = index.within_radius(constraint["lat"], constraint["lon"], constraint["radius_km"])
+        elif kind in ("north", "south"):
+            positions = (index.north_of if kind == "north" else index.south_of)(constraint["lat"])
+        elif kind == "east":
+            positions = index.bounding_box(-90, constraint["lon"], 90, 180)
+        elif kind == "west":
+            positions = index.bounding_box(-90, -180, 90, constraint["lon"])
+        else:
+            # Nearest is a ranking, not a filter: rows are ordered by distance and cut by the limit
+            positions = index.positions
+        mask = np.zeros(len(self.df), dtype=bool)
+        mask[positions] = True
+        return mask
+
+    def _aggregate_from_cube(self, spec: dict) -> Optional[pd.DataFrame]:
+        """An aggregate answered from the analyzer's cube, or None if it needs the rows."""
+        func, column = spec["agg"]
+        if spec.get("spatial") or (func == "count" and column != "id"):
+            return None
+        where = {}
+        for column_name, op, value in spec["filters"]:
+            if column_name not in self.analyzer.dimensions:
+                return None
+            levels = self.analyzer.levels(column_name)
+            accepted = set(levels[filter_mask(levels, column_name, op, value).to_numpy(dtype=bool)])
+            where[column_name] = where.get(column_name, accepted) & accepted
+        result = self.analyzer.rollup(func, None if func == "count" else column, by=spec["group_by"], where=where)
+        if result is None:
+            return None
+        return self._sort_and_limit(result, spec, aggregate_name(func, column))
+
+    @staticmethod
+    def _sort_and_limit(result: pd.DataFrame, spec: dict, name: str) -> pd.DataFrame:
+        if spec["group_by"] is None:
+            return result
+        if spec["sort"]:
+            result = result.sort_values(name, ascending=spec["sort"][1])
+        if spec["limit"]:
+            result = result.head(spec["limit"])
+        return result.reset_index(drop=True)
+
+    @classmethod
+    def _aggregate(cls, selected: pd.DataFrame, spec: dict) -> pd.DataFrame:
+        func, column = spec["agg"]
+        if column == "price_per_sqft":
+            sized = selected[selected["size_sqft_max"] > 0]
+            values = (sized["price_gbp"] / sized["size_sqft_max"]).rename("price_per_sqft")
+            selected = sized.assign(price_per_sqft=values)
+        name = aggregate_name(func, column)
+
+        if spec["group_by"] is None:
+            value = len(selected) if func == "count" else selected[column].agg(func)
+            return pd.DataFrame({name: [value]})
+
+        grouped = selected.groupby(spec["group_by"], observed=True)
+        result = grouped.size() if func == "count" else grouped[column].agg(func)
+        return cls._sort_and_limit(result.rename(name).reset_index(), spec, name)
+
+    def run(self, query: str, action: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """
+        Parse and execute a query, returning None when the fast path does not apply.
+
+        `action` (the classified intent) sets the most rows an answer without an explicit limit may have,
+        see ACTION_MAX_ROWS.
+        """
+        spec = self.parse(query)
+        if spec is None:
+            return None
+        return self.execute(spec, ACTION_MAX_ROWS.get(action, self.max_rows))
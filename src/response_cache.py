@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+
+def normalize_query(query: str) -> str:
+    """Lower-case a query, collapse whitespace and drop trailing punctuation so trivial variants share a key."""
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip(" ?!.")
+
+
+def dataset_version(dataset_path: Optional[str]) -> str:
+    """
+    Identify the current snapshot of a PandasAI dataset.
+
+    Args:
+        dataset_path (str): The dataset path as passed to `pai.load`, e.g. "new-bot/rental-data-london4".
+
+    Returns:
+        str: A short digest of the dataset path and its parquet file's mtime and size. It changes whenever
+             the snapshot is replaced, which invalidates every cache entry keyed on it.
+    """
+    parquet_path = os.path.join("datasets", dataset_path or "", "data.parquet")
+    try:
+        stat = os.stat(parquet_path)
+        fingerprint = f"{dataset_path}:{stat.st_mtime_ns}:{stat.st_size}"
+    except OSError:
+        fingerprint = f"{dataset_path}:missing"
+    return hashlib.sha1(fingerprint.encode()).hexdigest()[:16]
+
+
+class ResponseCache:
+    """
+    On-disk key/value cache backed by SQLite, safe to share between worker processes.
+
+    Entries live in namespaces (e.g. "classification", "response"), expire after `ttl_seconds`
+    and are evicted least-recently-used once more than `max_entries` are stored. Entries may be
+    tagged with a dataset version; entries of any other version are purged when a new one is seen.
+    Hit and miss counters are kept in the database so they aggregate across processes.
+    """
+
+    def __init__(self, path: str, max_entries: int = 2000, ttl_seconds: float = 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._current_version = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    version TEXT,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection, name: str):
+        conn.execute("INSERT INTO counters (name, value) VALUES (?, 1) "
+                     "ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,))
+
+    def _check_version(self, conn: sqlite3.Connection, version: Optional[str]):
+        """Drop versioned entries that belong to another dataset snapshot."""
+        if version is None or version == self._current_version:
+            return
+        conn.execute("DELETE FROM entries WHERE version IS NOT NULL AND version != ?", (version,))
+        self._current_version = version
+
+    def get(self, namespace: str, key: str, version: Optional[str] = None) -> Optional[Any]:
+        """
+        Look up a cached value.
+
+        Args:
+            namespace (str): Logical cache section.
+            key (str): Entry key within the namespace.
+            version (str, optional): Dataset version the entry must belong to.
+
+        Returns:
+            The cached value, or None on a miss or expired entry.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            self._check_version(conn, version)
+            row = conn.execute(
+                "SELECT value, created_at, version FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key)).fetchone()
+            if row is None or row[2] != version:
+                self._bump(conn, "misses")
+                return None
+            if self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                self._bump(conn, "misses")
+                return None
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                         (now, namespace, key))
+            self._bump(conn, "hits")
+        return json.loads(row[0])
+
+    def set(self, namespace: str, key: str, value: Any, version: Optional[str] = None):
+        """Store a JSON-serializable value, evicting least-recently-used entries above `max_entries`."""
+        now = time.time()
+        payload = json.dumps(value)
+        with self._connect() as conn:
+            self._check_version(conn, version)
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, version, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (namespace, key, version, payload, now, now))
+            conn.execute(
+                "DELETE FROM entries WHERE rowid IN ("
+                "SELECT rowid FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def increment(self, name: str, amount: int = 1):
+        """Add `amount` to a named counter shared by every process using this cache file."""
+        with self._connect() as conn:
+            conn.execute("INSERT INTO counters (name, value) VALUES (?, ?) "
+                         "ON CONFLICT(name) DO UPDATE SET value = value + ?", (name, amount, amount))
+
+    def counters(self) -> dict:
+        """All named counters, including "hits" and "misses"."""
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT name, value FROM counters").fetchall())
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the number of stored entries."""
+        counters = self.counters()
+        with self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "entries": entries,
+        }
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM counters")
@@ -0,0 +1,227 @@
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Rows per page returned with a cursor and shown by the UI
+PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", "200"))
+HANDLE_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class ResultStore:
+    """
+    Server-side store of query results, addressed by opaque handles.
+
+    Chat messages keep a handle and a row count instead of the rows, and the UI reads the page it shows
+    with `page`. Results stay in memory, least-recently-used first out, up to `max_memory_mb`; beyond that
+    the oldest are spilled to parquet files in `directory` (row groups of `PAGE_SIZE` rows, so reading a
+    page only decodes the row groups it covers) and read back from there. Files older than `ttl_seconds`,
+    and the oldest ones beyond `max_disk_mb`, are deleted; an expired handle reads as None. Frames parquet
+    cannot hold (mixed-type object columns) are spilled as pickles. The store is thread-safe and shared by
+    every session of the process; spilled results are also readable by other processes using the directory.
+    """
+
+    def __init__(self, directory: str = ".cache/results", max_memory_mb: float = 256, max_disk_mb: float = 2048,
+                 ttl_seconds: float = 6 * 3600, page_size: int = PAGE_SIZE):
+        self.directory = directory
+        self.max_memory = max_memory_mb * 1024 ** 2
+        self.max_disk = max_disk_mb * 1024 ** 2
+        self.ttl_seconds = ttl_seconds
+        self.page_size = page_size
+        self._lock = threading.Lock()
+        self._frames: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._created: Dict[str, float] = {}
+        # Results popped from memory whose spill file is still being written, readable until it exists
+        self._spilling: Dict[str, pd.DataFrame] = {}
+        self.memory_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, handle: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{handle}.{suffix}")
+
+    def put(self, frame: pd.DataFrame) -> str:
+        """Store a result and return its handle, spilling older results to disk if memory runs over."""
+        handle = uuid.uuid4().hex
+        size = int(frame.memory_usage(index=True, deep=True).sum())
+        with self._lock:
+            self._frames[handle] = frame
+            self._sizes[handle] = size
+            self._created[handle] = time.time()
+            self.memory_bytes += size
+            spill = self._over_budget()
+        for old_handle, old_frame in spill:
+            self._spill(old_handle, old_frame)
+        self._expire_files()
+        return handle
+
+    def _over_budget(self) -> list:
+        """Pop least-recently-used results (and expired ones) until memory fits; caller holds the lock."""
+        popped = []
+        now = time.time()
+        for handle in list(self._frames):
+            expired = now - self._created[handle] > self.ttl_seconds
+            if not expired and self.memory_bytes <= self.max_memory:
+                break
+            frame = self._frames.pop(handle)
+            self.memory_bytes -= self._sizes.pop(handle)
+            self._created.pop(handle)
+            if not expired:
+                self._spilling[handle] = frame
+                popped.append((handle, frame))
+        return popped
+
+    def _spill(self, handle: str, frame: pd.DataFrame):
+        staging = self._path(handle, f"{os.getpid()}.tmp")
+        try:
+            try:
+                frame.to_parquet(staging, index=False, row_group_size=self.page_size)
+                os.replace(staging, self._path(handle, "parquet"))
+            except (pa.ArrowException, ValueError, TypeError):
+                frame.to_pickle(staging)
+                os.replace(staging, self._path(handle, "pkl"))
+        finally:
+            with self._lock:
+                self._spilling.pop(handle, None)
+
+    def _expire_files(self):
+        """
+        Delete spilled results past their TTL, then the oldest ones while the directory is over budget.
+
+        Other processes sharing the directory expire the same files, so one already gone is skipped.
+        """
+        now = time.time()
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith((".parquet", ".pkl")):
+                continue
+            try:
+                stat = entry.stat()
+                if now - stat.st_mtime > self.ttl_seconds:
+                    os.remove(entry.path)
+                else:
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+            except FileNotFoundError:
+                continue
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _memory_frame(self, handle: str) -> Optional[pd.DataFrame]:
+        with self._lock:
+            frame = self._frames.get(handle)
+            if frame is not None:
+                self._frames.move_to_end(handle)
+                return frame
+            return self._spilling.get(handle)
+
+    def count(self, handle: str) -> Optional[int]:
+        """Number of rows of a result, or None if the handle is unknown or expired."""
+        frame = self._memory_frame(handle) if HANDLE_RE.match(handle or "") else None
+        if frame is not None:
+            return len(frame)
+        try:
+            if os.path.exists(self._path(handle, "parquet")):
+                return pq.ParquetFile(self._path(handle, "parquet")).metadata.num_rows
+        except (OSError, pa.ArrowException):
+            return None
+        full = self.frame(handle)
+        return None if full is None else len(full)
+
+    def page(self, handle: str, offset: int = 0, limit: Optional[int] = None) -> Optional[pd.DataFrame]:
+        """
+        Rows [offset, offset + limit) of a result.
+
+        Returns:
+            Optional[pd.DataFrame]: The page (empty past the end), or None if the handle is unknown or expired.
+        """
+        limit = self.page_size if limit is None else limit
+        if not HANDLE_RE.match(handle or ""):
+            return None
+        frame = self._memory_frame(handle)
+        if frame is not None:
+            return frame.iloc[offset:offset + limit]
+        path = self._path(handle, "parquet")
+        try:
+            if os.path.exists(path):
+                parquet = pq.ParquetFile(path)
+                groups, start, first = [], 0, None
+                for i in range(parquet.num_row_groups):
+                    rows = parquet.metadata.row_group(i).num_rows
+                    if start + rows > offset and start < offset + limit:
+                        groups.append(i)
+                        first = start if first is None else first
+                    start += rows
+                if not groups:
+                    return parquet.schema_arrow.empty_table().to_pandas()
+                table = parquet.read_row_groups(groups)
+                return table.slice(offset - first, limit).to_pandas()
+        except (OSError, pa.ArrowException):
+            return None
+        full = self.frame(handle)
+        return None if full is None else full.iloc[offset:offset + limit]
+
+    def frame(self, handle: str) -> Optional[pd.DataFrame]:
+        """A whole result (e.g. to plot it), or None if the handle is unknown or expired."""
+        if not HANDLE_RE.match(handle or ""):
+            return None
+        frame = self._memory_frame(handle)
+        if frame is not None:
+            return frame
+        try:
+            if os.path.exists(self._path(handle, "parquet")):
+                return pd.read_parquet(self._path(handle, "parquet"))
+            if os.path.exists(self._path(handle, "pkl")):
+                return pd.read_pickle(self._path(handle, "pkl"))
+        except (OSError, pa.ArrowException):
+            return None
+        return None
+
+    def cursor(self, frame: pd.DataFrame, limit: Optional[int] = None) -> dict:
+        """
+        Store a result and describe its first page.
+
+        Returns:
+            dict: {"handle", "total", "offset", "limit", "data"} with the first `limit` rows as "data".
+        """
+        limit = self.page_size if limit is None else limit
+        return {"handle": self.put(frame), "total": len(frame), "offset": 0, "limit": limit,
+                "data": frame.iloc[:limit]}
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_memory, memory = len(self._frames), self.memory_bytes
+        spilled = [e for e in os.scandir(self.directory) if e.name.endswith((".parquet", ".pkl"))]
+        return {"in_memory": in_memory, "memory_mb": round(memory / 1024 ** 2, 1), "on_disk": len(spilled),
+                "disk_mb": round(sum(e.stat().st_size for e in spilled) / 1024 ** 2, 1)}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_result_store() -> ResultStore:
+    """Process-wide result store shared by every session (RESULT_STORE_* environment variables)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResultStore(
+                directory=os.getenv("RESULT_STORE_DIR", ".cache/results"),
+                max_memory_mb=float(os.getenv("RESULT_STORE_MAX_MEMORY_MB", "256")),
+                max_disk_mb=float(os.getenv("RESULT_STORE_MAX_DISK_MB", "2048")),
+                ttl_seconds=float(os.getenv("RESULT_STORE_TTL_SECONDS", str(6 * 3600))),
+            )
+        return _store
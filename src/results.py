@@ -0,0 +1,135 @@
+import base64
+import json
+from io import BytesIO
+from typing import Any, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+# Key marking a DataFrame encoded by `encode_response` for storage
+FRAME_KEY = "__frame__"
+
+
+def to_frame(value: Any) -> Optional[pd.DataFrame]:
+    """
+    A tool result value as a DataFrame.
+
+    Returns:
+        Optional[pd.DataFrame]: The frame itself, a Series with its index as a column, one row per dict of a
+                                list of dicts, one row for a dict, one "value" cell for a scalar, None for None.
+    """
+    if value is None:
+        return None
+    if isinstance(value, pd.DataFrame):
+        return value
+    if isinstance(value, pd.Series):
+        return value.reset_index()
+    if isinstance(value, dict):
+        return pd.DataFrame([value])
+    if isinstance(value, (list, tuple)):
+        return pd.DataFrame([row if isinstance(row, dict) else {"value": row} for row in value])
+    return pd.DataFrame({"value": [value]})
+
+
+def frame_records(frame: pd.DataFrame) -> list:
+    """JSON-compatible records of a frame (ISO dates, NaN as None), for process and network boundaries."""
+    return json.loads(frame.to_json(date_format="iso", orient="records"))
+
+
+class QueryResult:
+    """
+    Outcome of a dataframe query, passed as-is between the dataframe tool, the agent, the plot code
+    generator and the UI.
+
+    The data stays a DataFrame for the whole request; it is only turned into JSON at real boundaries:
+    the LangChain tool interface (`to_json` / `from_json`, the old `standard_response` format) and the
+    on-disk response cache (`encode_response`).
+    """
+
+    def __init__(self, success: bool, frame: Optional[pd.DataFrame] = None, error: Optional[str] = None,
+                 solution: Optional[str] = None):
+        self.success = success
+        self.frame = frame
+        self.error = error
+        self.solution = solution
+
+    @classmethod
+    def ok(cls, value: Any) -> "QueryResult":
+        return cls(True, to_frame(value))
+
+    @classmethod
+    def failure(cls, error: str, solution: Optional[str] = None) -> "QueryResult":
+        return cls(False, error=error, solution=solution)
+
+    @property
+    def empty(self) -> bool:
+        return self.frame is None or self.frame.empty
+
+    def __len__(self) -> int:
+        return 0 if self.frame is None else len(self.frame)
+
+    def __repr__(self) -> str:
+        if not self.success:
+            return f"QueryResult(error={self.error!r})"
+        return f"QueryResult(rows={len(self)}, columns={list(self.frame.columns) if self.frame is not None else []})"
+
+    def to_json(self, store=None) -> str:
+        """
+        The `standard_response` JSON of this result: {"success", "result", "error", "solution"}.
+
+        With a `ResultStore`, the frame is kept in the store and "result" only holds its first page, with the
+        cursor fields "handle", "total", "offset" and "limit" to read the rest (`ResultStore.page`).
+        """
+        cursor = {}
+        frame = self.frame if self.success else None
+        if store is not None and frame is not None:
+            cursor = store.cursor(frame)
+            frame = cursor.pop("data")
+        return json.dumps({
+            "success": self.success,
+            "result": frame_records(frame) if frame is not None else None,
+            "error": None if self.success else self.error,
+            "solution": None if self.success else self.solution,
+            **cursor,
+        })
+
+    @classmethod
+    def from_json(cls, text: str, store=None) -> "QueryResult":
+        """Inverse of `to_json`; a cursor is resolved to the whole frame when `store` still holds it."""
+        parsed = json.loads(text)
+        if not parsed.get("success"):
+            return cls.failure(parsed.get("error"), parsed.get("solution"))
+        if store is not None and parsed.get("handle"):
+            frame = store.frame(parsed["handle"])
+            if frame is not None:
+                return cls(True, frame)
+        return cls.ok(parsed.get("result"))
+
+
+def encode_response(response: dict) -> dict:
+    """
+    A copy of an agent response that `json.dumps` accepts, for the on-disk response cache.
+
+    A "data" frame is stored as base64 parquet in a single string: faster and smaller than JSON records,
+    and it comes back with the same dtypes. Frames parquet cannot hold (mixed-type object columns) are
+    stored as records.
+    """
+    data = response.get("data")
+    if not isinstance(data, pd.DataFrame):
+        return response
+    buffer = BytesIO()
+    try:
+        data.to_parquet(buffer, index=False)
+    except (pa.ArrowException, ValueError, TypeError):
+        return {**response, "data": frame_records(data)}
+    return {**response, "data": {FRAME_KEY: base64.b64encode(buffer.getvalue()).decode("ascii")}}
+
+
+def decode_response(response: dict) -> dict:
+    """Inverse of `encode_response`."""
+    data = response.get("data")
+    if isinstance(data, dict) and FRAME_KEY in data:
+        return {**response, "data": pd.read_parquet(BytesIO(base64.b64decode(data[FRAME_KEY])))}
+    if isinstance(data, list) and response.get("type") in ("data", "plot"):
+        return {**response, "data": pd.DataFrame(data)}
+    return response
@@ -1,11 +1,15 @@
 import asyncio
 import json
 import os
-from typing import List, Dict, Any
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import AsyncIterator, List, Dict, Any, Optional
 import re
 import random
+import threading
 
+import pandas as pd
 from scrapfly import ScrapflyClient, ScrapeApiResponse, ScrapeConfig
+from scrapfly.errors import ScrapflyError
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -32,35 +36,72 @@ def detect_rightmove_links(query: str):
 # ---------------------
 # JSON extraction utils
 # ---------------------
-def find_json_objects(text: str, decoder=json.JSONDecoder()):
-    """Find and yield JSON objects embedded in a text blob."""
+PAGE_MODEL = "PAGE_MODEL"
+_ASSIGNMENT_RE = re.compile(r"\s*=\s*")
+_DECODER = json.JSONDecoder()
+
+
+def find_json_objects(text: str, decoder=_DECODER):
+    """Find and yield JSON objects embedded in a text blob (decoded in place, without slicing copies)."""
     pos = 0
     while True:
         start = text.find("{", pos)
         if start == -1:
             break
         try:
-            result, index = decoder.raw_decode(text[start:])
+            result, pos = decoder.raw_decode(text, start)
             yield result
-            pos = start + index
         except ValueError:
             pos = start + 1
 
 
+def extract_assigned_json(html: str, name: str, decoder=_DECODER) -> Optional[Dict[str, Any]]:
+    """
+    Decode the object literal assigned to a script variable, e.g. `window.jsonModel = {...}`.
+
+    The variable name is located with a plain substring search and the object is decoded in place from
+    the brace assigned to it, so the cost is linear in the page size and no DOM is built.
+
+    Returns:
+        dict or None: The object, or None when the page has none or it cannot be decoded.
+    """
+    pos = html.find(name)
+    while pos != -1:
+        assignment = _ASSIGNMENT_RE.match(html, pos + len(name))
+        if assignment and html.startswith("{", assignment.end()):
+            try:
+                data, _ = decoder.raw_decode(html, assignment.end())
+                if isinstance(data, dict):
+                    return data
+            except ValueError:
+                pass
+        # Name inside another identifier, string or broken script: keep looking
+        pos = html.find(name, pos + 1)
+    return None
+
+
+def extract_page_model(html: str, decoder=_DECODER) -> Optional[Dict[str, Any]]:
+    """Decode Rightmove's `PAGE_MODEL = {...}` object of a property page straight from the page HTML."""
+    return extract_assigned_json(html, PAGE_MODEL, decoder)
+
+
+def parse_page(html: str, url: str = "") -> Optional[Dict[str, Any]]:
+    """Extract and normalize one property page. CPU-bound, safe to run in a worker pool."""
+    page_model = extract_page_model(html)
+    if page_model is None:
+        print(f"⚪ Not a property page: {url}")
+        return None
+    data = page_model.get("propertyData")
+    return parse_property(data) if data else None
+
+
 def extract_property_json(result: ScrapeApiResponse) -> Dict[str, Any]:
     """Extract Rightmove's PAGE_MODEL JSON block from HTML."""
-    script = result.selector.xpath("//script[contains(.,'PAGE_MODEL = ')]/text()").get()
-    if not script:
+    page_model = extract_page_model(result.content or "")
+    if page_model is None:
         print(f"⚪ Not a property page: {result.context['url']}")
         return None
-
-    json_candidates = list(find_json_objects(script))
-    if not json_candidates:
-        print(f"⚪ Could not parse JSON from: {result.context['url']}")
-        return None
-
-    data = json_candidates[0]
-    return data.get("propertyData")
+    return page_model.get("propertyData")
 
 
 def parse_property(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -90,6 +131,10 @@ def parse_property(data: Dict[str, Any]) -> Dict[str, Any]:
             "countryCode": data.get("address", {}).get("countryCode"),
             "ukCountry": data.get("address", {}).get("ukCountry"),
         },
+        "location": {
+            "latitude": data.get("location", {}).get("latitude"),
+            "longitude": data.get("location", {}).get("longitude"),
+        },
         "bedrooms": data.get("bedrooms"),
         "bathrooms": data.get("bathrooms"),
         "propertySubType": data.get("propertySubType"),
@@ -106,19 +151,198 @@ def parse_property(data: Dict[str, Any]) -> Dict[str, Any]:
 # Async scraper
 # ---------------------
 
-async def scrape_properties(urls: List[str]) -> List[Dict[str, Any]]:
-    """Scrape multiple RightMove property pages asynchronously."""
-    to_scrape = [
-        ScrapeConfig(url=url, asp=True, country="GB", render_js=False)
-        for url in urls
+_parse_pool = None
+
+
+def get_parse_pool() -> Executor:
+    """
+    Worker pool for page parsing, so decoding large pages never blocks the event loop.
+
+    SCRAPE_PARSE_POOL selects "thread" (default) or "process"; a process pool parses pages in parallel
+    at the cost of sending each page to a worker. SCRAPE_PARSE_WORKERS sets the pool size.
+    """
+    global _parse_pool
+    if _parse_pool is None:
+        workers = int(os.getenv("SCRAPE_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+        if os.getenv("SCRAPE_PARSE_POOL", "thread") == "process":
+            _parse_pool = ProcessPoolExecutor(max_workers=workers)
+        else:
+            _parse_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scrape-parse")
+    return _parse_pool
+
+
+# Streaming scraper settings: pages fetched at once, seconds per attempt, retries after the first attempt,
+# and the base delay of the exponential backoff between attempts
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "5"))
+SCRAPE_TIMEOUT_SECONDS = float(os.getenv("SCRAPE_TIMEOUT_SECONDS", "60"))
+SCRAPE_RETRIES = int(os.getenv("SCRAPE_RETRIES", "2"))
+SCRAPE_BACKOFF_SECONDS = float(os.getenv("SCRAPE_BACKOFF_SECONDS", "1"))
+
+_fetch_pool = None
+
+
+def get_fetch_pool() -> Executor:
+    """Threads for the blocking Scrapfly SDK calls; larger than the concurrency limit, pages being parsed hold none."""
+    global _fetch_pool
+    if _fetch_pool is None:
+        _fetch_pool = ThreadPoolExecutor(max_workers=max(32, 2 * SCRAPE_CONCURRENCY), thread_name_prefix="scrape-fetch")
+    return _fetch_pool
+
+
+# Credits of attempts that timed out: the SDK call cannot be cancelled, so it completes (and is billed)
+# after its page has been reported as failed
+_abandoned = {"attempts": 0, "credits": 0}
+_abandoned_lock = threading.Lock()
+
+
+def abandoned_credits() -> int:
+    """Scrapfly credits billed, since the process started, for attempts that completed after timing out."""
+    with _abandoned_lock:
+        return _abandoned["credits"]
+
+
+def _bill_abandoned(future):
+    """Add the cost of a timed-out attempt once its SDK call has finished."""
+    cost = 0 if future.cancelled() or future.exception() is not None else (future.result().cost or 0)
+    with _abandoned_lock:
+        _abandoned["attempts"] += 1
+        _abandoned["credits"] += cost
+
+
+def _is_retryable(error: BaseException) -> bool:
+    """
+    Connection failures, throttling and server-side errors are worth another attempt. Timeouts are not:
+    the timed-out request is still running and billed, a retry would pay for the page twice.
+    """
+    if isinstance(error, ScrapflyError):
+        return error.is_retryable or error.http_status_code in (429, 408) \
+            or (error.http_status_code or 0) >= 500
+    return isinstance(error, OSError) and not isinstance(error, asyncio.TimeoutError)
+
+
+def _scrape_result(url: str, attempts: int, prop: Optional[Dict[str, Any]] = None,
+                   error: Optional[str] = None, cost: int = 0) -> Dict[str, Any]:
+    return {"url": url, "ok": prop is not None, "property": prop, "error": error, "attempts": attempts, "cost": cost}
+
+
+async def fetch_page(url: str, client: Optional[ScrapflyClient] = None, semaphore: Optional[asyncio.Semaphore] = None,
+                     timeout: Optional[float] = None, retries: Optional[int] = None,
+                     backoff: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Fetch one RightMove page through Scrapfly with a per-attempt timeout and jittered exponential backoff.
+
+    A timed-out attempt is not retried. The blocking SDK call cannot be cancelled, so it keeps its
+    concurrency slot until it returns, and its credits go to `abandoned_credits` then.
+
+    Args:
+        url (str): Page to fetch.
+        client (ScrapflyClient, optional): Defaults to the module's client.
+        semaphore (asyncio.Semaphore, optional): Concurrency slot held during each attempt, until its SDK call
+                                                 returns (not during backoff).
+        timeout, retries, backoff (optional): See `iter_scrape_properties`.
+
+    Returns:
+        dict: {"url", "ok", "content", "error", "attempts", "cost"}; "cost" is the Scrapfly API credits spent.
+    """
+    config = ScrapeConfig(url=url, asp=True, country="GB", render_js=False)
+    timeout = SCRAPE_TIMEOUT_SECONDS if timeout is None else timeout
+    retries = SCRAPE_RETRIES if retries is None else retries
+    backoff = SCRAPE_BACKOFF_SECONDS if backoff is None else backoff
+    semaphore = semaphore or asyncio.Semaphore(1)
+    loop = asyncio.get_running_loop()
+
+    def free_slot(_):
+        try:
+            loop.call_soon_threadsafe(semaphore.release)
+        except RuntimeError:
+            pass  # the event loop is gone
+
+    attempts = 0
+    while True:
+        attempts += 1
+        await semaphore.acquire()
+        call = get_fetch_pool().submit((client or scrapfly).scrape, config)
+        # The slot is freed when the call returns, not when this coroutine stops waiting for it
+        call.add_done_callback(free_slot)
+        try:
+            response = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(call)), timeout)
+            return {"url": url, "ok": True, "content": response.content or "", "error": None,
+                    "attempts": attempts, "cost": response.cost or 0}
+        except asyncio.CancelledError:
+            call.add_done_callback(_bill_abandoned)
+            raise
+        except asyncio.TimeoutError:
+            call.add_done_callback(_bill_abandoned)
+            return {"url": url, "ok": False, "content": None, "error": f"Timed out after {timeout:g}s",
+                    "attempts": attempts, "cost": 0}
+        except Exception as e:
+            if attempts > retries or not _is_retryable(e):
+                return {"url": url, "ok": False, "content": None, "error": str(e) or type(e).__name__,
+                        "attempts": attempts, "cost": 0}
+            await asyncio.sleep(backoff * 2 ** (attempts - 1) * random.uniform(0.5, 1.5))
+
+
+async def _scrape_one(client: ScrapflyClient, url: str, semaphore: asyncio.Semaphore, timeout: float,
+                      retries: int, backoff: float) -> Dict[str, Any]:
+    """Fetch and parse one property page."""
+    page = await fetch_page(url, client, semaphore, timeout, retries, backoff)
+    if not page["ok"]:
+        return _scrape_result(url, page["attempts"], error=page["error"])
+    parsed = await asyncio.get_running_loop().run_in_executor(get_parse_pool(), parse_page, page["content"], url)
+    if parsed is None:
+        return _scrape_result(url, page["attempts"], error="Not a property page", cost=page["cost"])
+    return _scrape_result(url, page["attempts"], prop=parsed, cost=page["cost"])
+
+
+async def iter_scrape_properties(urls: List[str], client: Optional[ScrapflyClient] = None,
+                                 concurrency: Optional[int] = None, timeout: Optional[float] = None,
+                                 retries: Optional[int] = None,
+                                 backoff: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Scrape RightMove property pages and yield one result per URL as soon as it is ready.
+
+    A slow or failing page never holds up the others: each attempt is bounded by `timeout`, retryable
+    failures are retried with exponential backoff, and the final outcome is reported per URL.
+
+    Args:
+        urls (list of str): Property URLs; duplicates are scraped once.
+        client (ScrapflyClient, optional): Defaults to the module's client.
+        concurrency (int, optional): Maximum pages fetched at once. Defaults to SCRAPE_CONCURRENCY.
+        timeout (float, optional): Seconds per attempt. Defaults to SCRAPE_TIMEOUT_SECONDS.
+        retries (int, optional): Extra attempts after a retryable failure. Defaults to SCRAPE_RETRIES.
+        backoff (float, optional): Base backoff delay in seconds. Defaults to SCRAPE_BACKOFF_SECONDS.
+
+    Yields:
+        dict: {"url", "ok", "property", "error", "attempts", "cost"} in completion order; "property" is the
+              `parse_property` result when "ok", otherwise "error" says what went wrong. "cost" is the
+              Scrapfly API credits spent on the page.
+    """
+    semaphore = asyncio.Semaphore(concurrency or SCRAPE_CONCURRENCY)
+    tasks = [
+        asyncio.create_task(_scrape_one(
+            client or scrapfly, url, semaphore,
+            SCRAPE_TIMEOUT_SECONDS if timeout is None else timeout,
+            SCRAPE_RETRIES if retries is None else retries,
+            SCRAPE_BACKOFF_SECONDS if backoff is None else backoff,
+        ))
+        for url in dict.fromkeys(urls)
     ]
-    results = []
-    async for result in scrapfly.concurrent_scrape(to_scrape):
-        raw_data = extract_property_json(result)
-        if raw_data:
-            parsed = parse_property(raw_data)
-            results.append(parsed)
-    return results
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The consumer stopped early: do not leave scrapes running
+        for task in tasks:
+            task.cancel()
+
+
+async def scrape_properties(urls: List[str]) -> List[Dict[str, Any]]:
+    """Scrape multiple RightMove property pages asynchronously. Pages that fail are left out."""
+    scraped = {}
+    async for result in iter_scrape_properties(urls):
+        if result["ok"]:
+            scraped[result["url"]] = result["property"]
+    return [scraped[url] for url in dict.fromkeys(urls) if url in scraped]
 
 # ---------------------
 # Test run
@@ -195,28 +419,52 @@ def parse_price_pcm(price_str):
 
 
 
-def to_property_dicts(scraped_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def valuation_subjects(scraped_data: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Scraped properties as the subjects frame expected by `ComparablesValuer.estimate`."""
+    return pd.DataFrame({
+        # Rightmove ids, as in the dataset: a listing already in the snapshot is not its own comparable
+        "id": [str(item.get("id")) for item in scraped_data],
+        "latitude": [(item.get("location") or {}).get("latitude") for item in scraped_data],
+        "longitude": [(item.get("location") or {}).get("longitude") for item in scraped_data],
+        "bedrooms": [item.get("bedrooms") for item in scraped_data],
+        "bathrooms": [item.get("bathrooms") for item in scraped_data],
+        "property_type": [item.get("propertySubType") for item in scraped_data],
+        "postcode_outcode": [(item.get("address") or {}).get("outcode") for item in scraped_data],
+    }, dtype=object)
+
+
+def to_property_dicts(scraped_data: List[Dict[str, Any]], valuer=None) -> List[Dict[str, Any]]:
     """
     Convert scraped Rightmove property JSON into a list of property dictionaries.
 
+    `valuer` (a `ComparablesValuer`) scores all properties in one batch; without one the expected
+    rent is left empty.
+
     Returns a list of dicts ready for JSON serialization or DataFrame creation.
     """
+    valuations = valuer.estimate(valuation_subjects(scraped_data)) if valuer is not None and scraped_data else None
     properties = []
 
-    for item in scraped_data:
+    for i, item in enumerate(scraped_data):
         address = item.get("address", {}).get("displayAddress")
         bedrooms = item.get("bedrooms")
         price_str = item.get("prices", {}).get("primaryPrice")
         url = item.get("url")
 
         price = parse_price_pcm(price_str)
-        expected_rent = round(price * random.uniform(0.85, 1.15), 1) if price else None
+        expected_rent, confidence, comparables = None, None, None
+        if valuations is not None and pd.notna(valuations["estimate"].iloc[i]):
+            expected_rent = round(float(valuations["estimate"].iloc[i]), 1)
+            confidence = round(float(valuations["confidence"].iloc[i]), 2)
+            comparables = int(valuations["comparables"].iloc[i])
 
         properties.append({
                 "bedrooms": bedrooms,
                 "displayAddress": address,
                 "Rent (£/pcm)": price,
                 "expectedRent (£/pcm)": expected_rent,
+                "confidence": confidence,
+                "comparables": comparables,
                 "url": url
             })
     return properties
\ No newline at end of file
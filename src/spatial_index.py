@@ -0,0 +1,114 @@
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from src.gazetteer import LANDMARKS, normalize_place, thames_latitude
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_MILE = 1.609344
+
+
+def _unit_vectors(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Project latitude/longitude in degrees onto the unit sphere."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distance in km from one point to arrays of points."""
+    lat, lon, lats, lons = map(np.radians, (lat, lon, np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class SpatialIndex:
+    """
+    KD-tree over listing coordinates for radius, nearest-neighbour, bounding box and north/south queries.
+
+    Points are stored as unit vectors, so the Euclidean chord distance in the tree maps exactly onto
+    great-circle (haversine) distance. All queries return row positions into the indexed dataframe
+    (use `df.iloc[positions]`); rows without coordinates are never returned.
+    """
+
+    def __init__(self, df: pd.DataFrame, lat_col: str = "latitude", lon_col: str = "longitude"):
+        lat = pd.to_numeric(df[lat_col], errors="coerce").to_numpy(dtype=float)
+        lon = pd.to_numeric(df[lon_col], errors="coerce").to_numpy(dtype=float)
+        valid = ~(np.isnan(lat) | np.isnan(lon))
+        self.positions = np.flatnonzero(valid)
+        self.lat = lat[valid]
+        self.lon = lon[valid]
+        self.tree = cKDTree(_unit_vectors(self.lat, self.lon))
+
+    @staticmethod
+    def _chord(radius_km: float) -> float:
+        return 2 * np.sin(min(radius_km / EARTH_RADIUS_KM, np.pi) / 2)
+
+    def within_radius(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Positions of rows within `radius_km` of a point, sorted by position."""
+        hits = self.tree.query_ball_point(_unit_vectors([lat], [lon])[0], self._chord(radius_km))
+        return self.positions[np.sort(np.asarray(hits, dtype=int))]
+
+    def k_nearest(self, lat: float, lon: float, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions of the `k` nearest rows to a point and their distances in km, nearest first."""
+        k = min(k, len(self.positions))
+        if k == 0:
+            return np.array([], dtype=int), np.array([])
+        chord, idx = self.tree.query(_unit_vectors([lat], [lon])[0], k=k)
+        chord, idx = np.atleast_1d(chord), np.atleast_1d(idx)
+        return self.positions[idx], 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+
+    def k_nearest_many(self, lats: np.ndarray, lons: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The `k` nearest rows to each of several points in one vectorized query.
+
+        Returns:
+            tuple: (positions, distances_km), both of shape (len(lats), k), nearest first. Rows past the
+                   number of indexed points have position -1 and an infinite distance.
+        """
+        lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+        if len(lats) == 0 or len(self.positions) == 0 or k == 0:
+            return np.full((len(lats), k), -1, dtype=int), np.full((len(lats), k), np.inf)
+        chord, idx = self.tree.query(_unit_vectors(lats, lons), k=k)
+        chord, idx = chord.reshape(len(lats), k), idx.reshape(len(lats), k)
+        found = idx < len(self.positions)
+        positions = np.where(found, self.positions[np.minimum(idx, len(self.positions) - 1)], -1)
+        distances = np.where(found, 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1)), np.inf)
+        return positions, distances
+
+    def bounding_box(self, south: float, west: float, north: float, east: float) -> np.ndarray:
+        """Positions of rows inside a latitude/longitude box."""
+        mask = (self.lat >= south) & (self.lat <= north) & (self.lon >= west) & (self.lon <= east)
+        return self.positions[mask]
+
+    def north_of(self, lat: Optional[float] = None) -> np.ndarray:
+        """Positions of rows north of a latitude, or north of the Thames when no latitude is given."""
+        boundary = thames_latitude(self.lon) if lat is None else lat
+        return self.positions[self.lat > boundary]
+
+    def south_of(self, lat: Optional[float] = None) -> np.ndarray:
+        """Positions of rows south of a latitude, or south of the Thames when no latitude is given."""
+        boundary = thames_latitude(self.lon) if lat is None else lat
+        return self.positions[self.lat < boundary]
+
+
+def build_places(df: pd.DataFrame) -> Dict[str, Tuple[float, float]]:
+    """
+    Local gazetteer for a dataset: static landmarks and stations plus borough and district centroids.
+
+    Args:
+        df (pd.DataFrame): Listings with latitude/longitude and borough/district columns.
+
+    Returns:
+        dict: Normalized place name -> (latitude, longitude).
+    """
+    places = {}
+    for column in ("district", "borough"):
+        if {column, "latitude", "longitude"}.issubset(df.columns):
+            centroids = df.groupby(column, observed=True)[["latitude", "longitude"]].mean().dropna()
+            places.update({normalize_place(str(name)): (float(row.latitude), float(row.longitude))
+                           for name, row in centroids.iterrows()})
+    # Landmarks win over area centroids of the same name
+    places.update(LANDMARKS)
+    return places
@@ -0,0 +1,153 @@
+import os
+import re
+import threading
+from typing import List, Optional
+
+import duckdb
+import pandas as pd
+import yaml
+from openai.types.chat import ChatCompletionSystemMessageParam, ChatCompletionUserMessageParam
+
+from prompts.tool_prompts import get_sql_query_prompt
+from src.dataset import DATASETS_DIR
+from src.llm_client import get_openai_client
+
+SQL_BLOCK_RE = re.compile(r"```(?:sql)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+
+
+class SQLValidationError(ValueError):
+    """Generated SQL that is not a single read-only query."""
+
+
+def extract_sql(text: str) -> str:
+    """The SQL inside a ```sql block (or any code block), else the whole text."""
+    match = SQL_BLOCK_RE.search(text)
+    return (match.group(1) if match else text).strip()
+
+
+def validate_sql(sql: str) -> str:
+    """
+    Check that generated SQL is exactly one SELECT statement.
+
+    Returns:
+        str: The statement without its trailing semicolon.
+
+    Raises:
+        SQLValidationError: For several statements, anything but a SELECT, or SQL that does not parse.
+    """
+    try:
+        statements = duckdb.extract_statements(sql)
+    except duckdb.Error as e:
+        raise SQLValidationError(f"Invalid SQL: {e}") from e
+    if len(statements) != 1:
+        raise SQLValidationError(f"Expected one SQL statement, got {len(statements)}")
+    if statements[0].type != duckdb.StatementType.SELECT:
+        raise SQLValidationError(f"Only SELECT queries are allowed, got {statements[0].type.name}")
+    return sql.strip().rstrip(";").strip()
+
+
+class DuckDBBackend:
+    """
+    Answers data questions with LLM-written SQL executed by embedded DuckDB directly over a snapshot's parquet file.
+
+    The snapshot is exposed as the view `listings`, so queries scan only the columns and row groups they
+    need (with predicate pushdown and parallel scans) instead of loading the dataset. Once the view exists
+    the database is locked down: file access is limited to the parquet file and the configuration can no
+    longer be changed, so generated SQL can neither read nor write other files. Results are capped at
+    `max_rows`. Each call runs on its own cursor, so the backend can be shared between threads.
+    """
+
+    TABLE = "listings"
+
+    def __init__(self, parquet_path: str, schema_path: Optional[str] = None, threads: Optional[int] = None,
+                 max_rows: int = 5000, model: str = "gpt-4.1-mini"):
+        self.parquet_path = os.path.abspath(parquet_path)
+        self.max_rows = max_rows
+        self.model = model
+        self._connection = duckdb.connect(config={"threads": threads} if threads else {})
+        quoted = self.parquet_path.replace("'", "''")
+        self._connection.execute(f"CREATE VIEW {self.TABLE} AS SELECT * FROM read_parquet('{quoted}')")
+        self._connection.execute(f"SET allowed_paths = ['{quoted}']")
+        self._connection.execute("SET enable_external_access = false")
+        self._connection.execute("SET lock_configuration = true")
+        self.columns = self._describe(schema_path)
+
+    def _describe(self, schema_path: Optional[str]) -> List[dict]:
+        """Columns of the view with their DuckDB types and the dataset schema's descriptions."""
+        descriptions = {}
+        if schema_path and os.path.exists(schema_path):
+            with open(schema_path) as f:
+                descriptions = {c["name"]: c.get("description") for c in yaml.safe_load(f).get("columns", [])}
+        rows = self._connection.cursor().execute(f"DESCRIBE {self.TABLE}").fetchall()
+        return [{"name": name, "type": kind, "description": descriptions.get(name)} for name, kind, *_ in rows]
+
+    def execute(self, sql: str) -> pd.DataFrame:
+        """Run one validated SELECT statement and return its first `max_rows` rows."""
+        sql = validate_sql(sql)
+        limited = f"SELECT * FROM ({sql}) AS result LIMIT {int(self.max_rows)}"
+        return self._connection.cursor().execute(limited).df()
+
+    def generate_sql(self, query: str, action: str, failed_sql: Optional[str] = None,
+                     error: Optional[str] = None) -> str:
+        """Ask the LLM for SQL answering the query, feeding back the previous attempt's error if any."""
+        prompt = get_sql_query_prompt(query, action, self.TABLE, self.columns)
+        if failed_sql is not None:
+            prompt += f"\nYour previous query\n```sql\n{failed_sql}\n```\nfailed with: {error}\nFix it.\n"
+        response = get_openai_client().chat.completions.create(
+            model=self.model,
+            messages=[
+                ChatCompletionSystemMessageParam(role="system", content="You write DuckDB SQL for data questions"),
+                ChatCompletionUserMessageParam(role="user", content=prompt),
+            ],
+            temperature=0,
+            max_tokens=500,
+        )
+        return extract_sql(response.choices[0].message.content)
+
+    def ask(self, query: str, action: str = "", retries: int = 1) -> dict:
+        """
+        Answer a natural-language query.
+
+        Returns:
+            dict: {"value", "error", "sql"} like a PandasAI response's `to_dict()`: "value" is the result
+                  DataFrame when "error" is None. A failing query is regenerated up to `retries` times.
+        """
+        sql, error = None, None
+        for _ in range(retries + 1):
+            sql = self.generate_sql(query, action, sql, error)
+            try:
+                return {"value": self.execute(sql), "error": None, "sql": sql}
+            except (duckdb.Error, SQLValidationError) as e:
+                error = str(e)
+        return {"value": None, "error": error, "sql": sql}
+
+
+_backend = None
+_backend_failed = False
+_backend_lock = threading.Lock()
+
+
+def get_sql_backend() -> Optional[DuckDBBackend]:
+    """
+    The process-wide DuckDB backend when DATAFRAME_BACKEND=duckdb, else None (PandasAI is used).
+
+    The snapshot is the DATAFRAME dataset; DUCKDB_THREADS and DUCKDB_MAX_ROWS tune it. If the parquet
+    file cannot be opened the backend is disabled for the life of the process and None is returned.
+    """
+    global _backend, _backend_failed
+    if os.getenv("DATAFRAME_BACKEND", "pandasai").lower() != "duckdb":
+        return None
+    with _backend_lock:
+        if _backend is None and not _backend_failed:
+            dataset_dir = os.path.join(DATASETS_DIR, os.getenv("DATAFRAME", ""))
+            try:
+                _backend = DuckDBBackend(
+                    os.path.join(dataset_dir, "data.parquet"),
+                    schema_path=os.path.join(dataset_dir, "schema.yaml"),
+                    threads=int(os.getenv("DUCKDB_THREADS", "0")) or None,
+                    max_rows=int(os.getenv("DUCKDB_MAX_ROWS", "5000")),
+                )
+            except duckdb.Error as e:
+                print(f"DuckDB backend unavailable, using PandasAI: {e}")
+                _backend_failed = True
+        return _backend
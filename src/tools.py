@@ -1,12 +1,13 @@
 # Standard libraries
 import os
 import json
+import asyncio
+import threading
 from collections import deque
 from typing import Optional, Union
 from dotenv import load_dotenv
 
 # Third-party libraries
-import openai
 import pandasai as pai
 import pandas as pd
 from langchain.tools import tool
@@ -14,7 +15,17 @@ from pandasai_openai import OpenAI
 from openai.types.chat import ChatCompletionSystemMessageParam, ChatCompletionUserMessageParam
 
 # Local modules
-from src.utils.env_tools import cache_resource
+from src.dataset import get_dataset
+from src.query_engine import FastQueryEngine
+from src.sql_backend import get_sql_backend
+from src.code_cache import CodeCache, table_name
+from src.code_pool import PoolSandbox, get_code_pool
+from src.response_cache import ResponseCache
+from src.results import QueryResult
+from src.result_store import get_result_store
+from src.plot_templates import plot_cache_key, template_plot_code
+from src.classifiers import classify_query, aclassify_query
+from src.llm_client import get_openai_client, get_async_openai_client
 from prompts.tool_prompts import get_user_data_intent, format_query_with_table_output, get_plotly_code_prompt
 from prompts.tool_description import DESCRIPTION_GET_USER_DATA_REQUIREMENTS, \
     DESCRIPTION_GET_DATA, \
@@ -24,15 +35,61 @@ load_dotenv()
 # Load environment variables from streamlit secrets
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-@cache_resource
 def get_openai_llm():
-    return openai.OpenAI(api_key=OPENAI_API_KEY)
+    return get_openai_client()
 
 
-@cache_resource
 def load_pandas_ai_dataframe():
-    """Load the real estate dataset from created Pandas AI directory."""
-    return pai.load(os.getenv("DATAFRAME"))
+    """Load the real estate dataset from created Pandas AI directory (shared, loaded once per process)."""
+    return get_dataset().frame
+
+
+_fast_query_engine = None
+_fast_query_engine_lock = threading.Lock()
+
+
+def get_fast_query_engine() -> FastQueryEngine:
+    """Build the deterministic query engine over the dataset's columns, without the long text columns."""
+    global _fast_query_engine
+    with _fast_query_engine_lock:
+        if _fast_query_engine is None:
+            _fast_query_engine = FastQueryEngine(get_dataset().lean_frame())
+        return _fast_query_engine
+
+
+_code_cache = None
+_code_cache_lock = threading.Lock()
+
+
+def get_code_cache() -> CodeCache:
+    """Shared on-disk cache of validated PandasAI programs, re-executed locally for repeated questions."""
+    global _code_cache
+    with _code_cache_lock:
+        if _code_cache is None:
+            pool = get_code_pool()
+            _code_cache = CodeCache(
+                path=os.getenv("CODE_CACHE_PATH", ".cache/generated_code.sqlite"),
+                max_entries=int(os.getenv("CODE_CACHE_MAX_ENTRIES", "500")),
+                executor=pool.run_pandas if pool is not None else None,
+            )
+        return _code_cache
+
+
+_plot_code_cache = None
+_plot_code_cache_lock = threading.Lock()
+
+
+def get_plot_code_cache() -> ResponseCache:
+    """Shared on-disk cache of LLM-written Plotly code, keyed on the request and the result's columns."""
+    global _plot_code_cache
+    with _plot_code_cache_lock:
+        if _plot_code_cache is None:
+            _plot_code_cache = ResponseCache(
+                path=os.getenv("PLOT_CODE_CACHE_PATH", ".cache/plot_code.sqlite"),
+                max_entries=int(os.getenv("PLOT_CODE_CACHE_MAX_ENTRIES", "1000")),
+                ttl_seconds=float(os.getenv("PLOT_CODE_CACHE_TTL_SECONDS", str(30 * 24 * 3600))),
+            )
+        return _plot_code_cache
 
 
 def set_pandas_llm():
@@ -73,38 +130,64 @@ def extract_data_intent(user_query: str) -> str:
     return response.choices[0].message.content.strip()
 
 
-@tool(description=DESCRIPTION_GET_DATA)
-def safe_dataframe_tool(input_json: str) -> str:
+def query_dataframe(query: str, action: str) -> QueryResult:
     """
     Executes a natural language query on the London real estate dataset.
-    Returns a standardized JSON-formatted string.
+
+    Args:
+        query (str): The user query.
+        action (str): The classified intent, it selects the output format requested from PandasAI.
+
+    Returns:
+        QueryResult: The result as a DataFrame, or the error. Nothing is serialized, so the agent and the
+                     UI work on the same frame in-process.
     """
+    solution = "Check your query syntax or the dataset structure."
     try:
-        input_dict = json.loads(input_json)
-        query = input_dict.get("query", "")
-        action = input_dict.get("action", "")
-
-        data = load_pandas_ai_dataframe()
-        result = data.chat(format_query_with_table_output(query,action)).to_dict()
+        # Fast path: common query shapes are answered with plain pandas, no LLM involved
+        fast_result = get_fast_query_engine().run(query, action)
+        if fast_result is not None:
+            return QueryResult.ok(fast_result)
+
+        sql_backend = get_sql_backend()
+        if sql_backend is not None:
+            result = sql_backend.ask(query, action)
+        else:
+            data = load_pandas_ai_dataframe()
+            # Repeated questions re-run the program PandasAI wrote for them, without an LLM call
+            code_cache = get_code_cache()
+            result = code_cache.run(query, action, data)
+            if result is not None:
+                result["error"] = None
+            else:
+                # The generated code runs in the code pool's workers when there is one
+                pool = get_code_pool()
+                sandbox = PoolSandbox(pool, [table_name(data)]) if pool is not None else None
+                result = data.chat(format_query_with_table_output(query,action), sandbox=sandbox).to_dict()
+                code_cache.remember(query, action, data, result)
 
         if result["error"] is None and "value" in result:
-            return standard_response(
-                success=True,
-                result=result["value"]
-            )
-        else:
-            return standard_response(
-                success=False,
-                error=result["error"],
-                solution="Check your query syntax or the dataset structure."
-            )
+            return QueryResult.ok(result["value"])
+        return QueryResult.failure(result["error"], solution)
+
+    except Exception as e:
+        return QueryResult.failure(str(e), solution)
 
+
+@tool(description=DESCRIPTION_GET_DATA)
+def safe_dataframe_tool(input_json: str) -> str:
+    """
+    Executes a natural language query on the London real estate dataset.
+    Returns a standardized JSON-formatted string (see `QueryResult.to_json`) holding the first page of the
+    result and a cursor into the shared result store; in-process callers use `query_dataframe` and skip
+    the serialization.
+    """
+    try:
+        input_dict = json.loads(input_json)
     except Exception as e:
-        return standard_response(
-            success=False,
-            error=str(e),
-            solution="Check your query syntax or the dataset structure."
-        )
+        return QueryResult.failure(str(e), "Check your query syntax or the dataset structure.").to_json()
+    result = query_dataframe(input_dict.get("query", ""), input_dict.get("action", ""))
+    return result.to_json(store=get_result_store())
 
 
 def extract_python_code(text: str) -> Optional[str]:
@@ -129,24 +212,27 @@ def extract_python_code(text: str) -> Optional[str]:
     return None
 
 
-@tool(description=DESCRIPTON_GENERATE_PLOT_CODE)
-def create_plotly_code(input_json: str):
-    """Generate and execute Plotly code using your exact prompt format"""
-
+def _plot_input(input_json: str):
+    """The plot request and the data to plot, as a DataFrame (the whole result when given a store handle)."""
     parsed = json.loads(input_json)
-    result = parsed["data"]
+    result = parsed.get("data")
     user_input = parsed["query"]
+    if parsed.get("handle"):
+        frame = get_result_store().frame(parsed["handle"])
+        if frame is not None:
+            return user_input, frame
     # Prepare data
     if isinstance(result, dict):
         # Wrap in list to make it a single-row DataFrame
         result = [result]
+    return user_input, pd.DataFrame(result)
+
 
-    data = pd.DataFrame(result)
+def _plotly_code_request(user_input: str, data: pd.DataFrame) -> dict:
+    """Build the chat completion arguments for generating Plotly code."""
     # Create prompt (using your exact format)
     code_prompt = get_plotly_code_prompt(user_input, data)
-    # Get AI response
-    official_ai = get_openai_llm()
-    response = official_ai.chat.completions.create(
+    return dict(
         model="gpt-4.1-mini",
         messages=
         [
@@ -157,17 +243,53 @@ def create_plotly_code(input_json: str):
         temperature=0,
         max_tokens=400
     )
+
+
+def _plotly_code(raw_response: str) -> str:
     # Extract code
-    raw_response = response.choices[0].message.content
     code = extract_python_code(raw_response)
     # Modify code for Streamlit
     code = code.replace("fig.show()", "")
     code += "\nst.plotly_chart(fig, use_container_width=True)"
+    return code
+
+
+def _local_plotly_code(user_input: str, data: pd.DataFrame) -> Optional[str]:
+    """Plot code without an LLM call: a built-in template, else code generated earlier for the same request shape."""
+    code = template_plot_code(user_input, data)
+    if code is None:
+        code = get_plot_code_cache().get("plot_code", plot_cache_key(user_input, data))
+    return code
+
+
+@tool(description=DESCRIPTON_GENERATE_PLOT_CODE)
+def create_plotly_code(input_json: str):
+    """Generate and execute Plotly code using your exact prompt format"""
+    user_input, data = _plot_input(input_json)
+    code = _local_plotly_code(user_input, data)
+    if code is None:
+        # Get AI response
+        official_ai = get_openai_llm()
+        response = official_ai.chat.completions.create(**_plotly_code_request(user_input, data))
+        code = _plotly_code(response.choices[0].message.content)
+        get_plot_code_cache().set("plot_code", plot_cache_key(user_input, data), code)
+    return standard_response(success=True, result=code)
 
-    return standard_response(
-        success=True,
-        result=code
-    )
+
+async def aplotly_code(user_input: str, data: pd.DataFrame) -> str:
+    """Plotly code for a request over an in-memory result (async, shared pooled client for the LLM call)."""
+    code = await asyncio.to_thread(_local_plotly_code, user_input, data)
+    if code is None:
+        client = get_async_openai_client()
+        response = await client.chat.completions.create(**_plotly_code_request(user_input, data))
+        code = _plotly_code(response.choices[0].message.content)
+        await asyncio.to_thread(get_plot_code_cache().set, "plot_code", plot_cache_key(user_input, data), code)
+    return code
+
+
+async def acreate_plotly_code(input_json: str) -> str:
+    """Async variant of `create_plotly_code` using the shared pooled client."""
+    return standard_response(success=True, result=await aplotly_code(*_plot_input(input_json)))
 
 
 def contextualize_query(query: str, history: Union[deque, list]) -> str:
@@ -181,41 +303,12 @@ def contextualize_query(query: str, history: Union[deque, list]) -> str:
     if len(history) < 2:
         return query
 
-    # Build conversation text from full history
-    history_text = ""
-    for msg in history:
-        role = "User" if msg["role"] == "user" else "Assistant"
-        history_text += f"{role}: {msg['content']}\n"
-
-    # Prompt for the LLM
-    code_prompt = f"""
-    You are a query rewriter for a London real estate chatbot focused on rental properties.
-    Rewrite the latest user request into a complete, standalone query
-    that makes sense without relying on the conversation history.
-    Always phrase the query in terms of renting property in London.
-
-    Conversation so far:
-    {history_text}
+    # The rewrite comes out of the combined classification call
+    return classify_query(query, history)["standalone_query"]
 
-    Latest user query:
-    {query}
 
-    Rewritten standalone rental query:
-    """
-    official_ai = get_openai_llm()
-    # Call LLM
-    response = official_ai.chat.completions.create(
-        model="gpt-4.1-mini",
-        messages=[
-            ChatCompletionSystemMessageParam(
-                role="system",
-                content="You rewrite follow-up queries into standalone natural-language queries for PandasAI."
-            ),
-            ChatCompletionUserMessageParam(role="user", content=code_prompt)
-        ],
-        temperature=0,
-        max_tokens=500
-    )
-
-    rewritten = response.choices[0].message.content.strip()
-    return rewritten or query  # fallback if model returns empty
+async def acontextualize_query(query: str, history: Union[deque, list]) -> str:
+    """Async variant of `contextualize_query`."""
+    if len(history) < 2:
+        return query
+    return (await aclassify_query(query, history))["standalone_query"]
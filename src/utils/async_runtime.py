@@ -0,0 +1,67 @@
+import asyncio
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import AsyncIterator, Awaitable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+_loop = None
+_lock = threading.Lock()
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the process-wide event loop running in a daemon thread, starting it on first use.
+
+    Sync callers (Streamlit script threads, tests) submit coroutines to this one loop, so async
+    clients and their connection pools are shared by every request in the process.
+    """
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="async-runtime", daemon=True).start()
+    return _loop
+
+
+def run_sync(coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """
+    Run a coroutine on the background loop and block until it finishes.
+
+    Args:
+        coro: The coroutine to run.
+        timeout (float, optional): Seconds to wait before the coroutine is cancelled.
+
+    Returns:
+        The coroutine's result.
+
+    Raises:
+        TimeoutError: If the coroutine does not finish within `timeout`; it is cancelled first.
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, get_background_loop())
+    try:
+        return future.result(timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise TimeoutError(f"Operation did not finish within {timeout} seconds")
+
+
+def iterate_sync(agen: AsyncIterator[T], timeout: Optional[float] = None) -> Iterator[T]:
+    """
+    Consume an async generator from sync code, one item at a time, on the background loop.
+
+    Items are handed over as soon as the generator produces them, so a Streamlit script can render
+    partial results while the rest are still in flight. Stopping early closes the generator.
+
+    Args:
+        agen: The async generator to consume.
+        timeout (float, optional): Seconds to wait for each item; raises TimeoutError when exceeded.
+    """
+    try:
+        while True:
+            try:
+                yield run_sync(agen.__anext__(), timeout=timeout)
+            except StopAsyncIteration:
+                return
+    finally:
+        run_sync(agen.aclose())
@@ -0,0 +1,30 @@
+import resource
+import sys
+
+
+def memory_usage_mb() -> dict:
+    """
+    Memory of the current process in MB.
+
+    Returns:
+        dict: {"rss", "private", "shared"}. On Linux "private" is what this process alone holds and
+              "shared" the pages it shares with others (e.g. a memory-mapped file read by several
+              workers); elsewhere only the peak RSS is known and the other two are None.
+    """
+    try:
+        fields = {}
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if value.strip().endswith("kB"):
+                    fields[name] = int(value.split()[0]) / 1024
+        return {
+            "rss": round(fields["Rss"], 1),
+            "private": round(fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0), 1),
+            "shared": round(fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0), 1),
+        }
+    except (OSError, KeyError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in KB elsewhere
+        return {"rss": round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1),
+                "private": None, "shared": None}
@@ -0,0 +1,44 @@
+import asyncio
+import threading
+import time
+from typing import Callable
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter: `rate` requests per second on average with bursts of up to `capacity`.
+
+    Each caller reserves a token and waits until it is due, with `acquire` in threads or `aacquire`
+    in coroutines. Reservations are thread-safe, so several workers can share one quota.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token, possibly one that is not available yet, and return the seconds until it is."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self):
+        """Block the calling thread until a token is available."""
+        wait = self._reserve()
+        if wait > 0:
+            self._sleep(wait)
+
+    async def aacquire(self):
+        """Wait, without blocking the event loop, until a token is available."""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
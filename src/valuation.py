@@ -0,0 +1,183 @@
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.dataset import get_dataset
+from src.spatial_index import SpatialIndex
+
+VALUATION_COLUMNS = ["id", "latitude", "longitude", "bedrooms", "bathrooms", "property_type", "postcode_outcode",
+                     "price_gbp"]
+
+# Candidates examined per subject and the distance at which a comparable's weight halves
+COMPARABLES_K = int(os.getenv("VALUATION_COMPARABLES_K", "64"))
+DISTANCE_SCALE_KM = float(os.getenv("VALUATION_DISTANCE_SCALE_KM", "0.75"))
+# Below this total weight (about three same-type, same-bedroom listings next door) the estimate falls back
+MIN_TOTAL_WEIGHT = 1.5
+
+# Confidence reaches 0.5 at this total weight; fallback estimates get fixed, low confidences
+CONFIDENCE_HALF_WEIGHT = 4.0
+FALLBACK_CONFIDENCE = {"outcode": 0.2, "bedrooms": 0.05}
+
+# Weights of a comparable with one bedroom more or less, with a different number of bathrooms,
+# and of a different kind of property
+ADJACENT_BEDROOM_WEIGHT = 0.15
+OTHER_BATHROOMS_WEIGHT = 0.6
+OTHER_TYPE_WEIGHT = 0.3
+
+FLAT_WORDS = r"flat|apartment|maisonette|studio|penthouse|duplex|triplex|loft"
+HOUSE_WORDS = r"house|terrace|detached|cottage|bungalow|mews|villa|town"
+
+
+def property_groups(types: pd.Series) -> np.ndarray:
+    """Coarse property kind per row: 0 flat-like, 1 house-like, -1 unknown."""
+    text = types.astype(object).fillna("").astype(str).str.lower()
+    groups = np.full(len(text), -1, dtype=np.int8)
+    groups[text.str.contains(HOUSE_WORDS).to_numpy()] = 1
+    groups[text.str.contains(FLAT_WORDS).to_numpy()] = 0
+    return groups
+
+
+def _numeric(frame: pd.DataFrame, column: str) -> np.ndarray:
+    if column not in frame.columns:
+        return np.full(len(frame), np.nan)
+    return pd.to_numeric(frame[column], errors="coerce").to_numpy(dtype=float)
+
+
+def _weighted_median(values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Row-wise weighted median of two (n, k) matrices (rows with no weight give NaN)."""
+    order = np.argsort(values, axis=1)
+    values = np.take_along_axis(values, order, axis=1)
+    cumulative = np.cumsum(np.take_along_axis(weights, order, axis=1), axis=1)
+    total = cumulative[:, -1:]
+    index = np.argmax(cumulative >= total / 2, axis=1)
+    medians = values[np.arange(len(values)), index]
+    return np.where(total[:, 0] > 0, medians, np.nan)
+
+
+class ComparablesValuer:
+    """
+    Rent estimates from comparable listings in the dataset.
+
+    Each subject's `k` nearest listings are weighted by distance (halving at `scale_km`), by bedroom match
+    (exact, or a small weight for one more or less), by bathrooms and by property kind (flat vs house),
+    and the estimate is the weighted median of their rents, with a confidence growing with the total weight.
+    The whole batch is one KD-tree query plus (n, k) matrix operations. A subject whose listing is itself in
+    the dataset (same `id`) is not its own comparable. Subjects with too few comparables, or without
+    coordinates, fall back to the median rent of listings with the same outcode and bedrooms, then the same
+    bedrooms.
+    """
+
+    def __init__(self, df: pd.DataFrame, k: int = COMPARABLES_K, scale_km: float = DISTANCE_SCALE_KM):
+        price = _numeric(df, "price_gbp")
+        frame = df[price > 0].reset_index(drop=True)
+        self.scale_km = scale_km
+        self.index = SpatialIndex(frame)
+        self.k = min(k, len(self.index.positions))
+        self.ids = frame["id"].astype(str).to_numpy() if "id" in frame.columns else None
+        self.price = _numeric(frame, "price_gbp")
+        self.bedrooms = _numeric(frame, "bedrooms")
+        self.bathrooms = _numeric(frame, "bathrooms")
+        self.groups = property_groups(frame["property_type"]) if "property_type" in frame.columns \
+            else np.full(len(frame), -1, dtype=np.int8)
+
+        self.global_median = float(np.median(self.price)) if len(self.price) else np.nan
+        fallback = pd.DataFrame({"bedrooms": self.bedrooms, "price": self.price})
+        self.by_bedrooms = fallback.groupby("bedrooms")["price"].median().to_dict()
+        self.by_outcode = {}
+        if "postcode_outcode" in frame.columns:
+            fallback["outcode"] = frame["postcode_outcode"].astype(str).str.upper().str.strip()
+            self.by_outcode = fallback.groupby(["outcode", "bedrooms"])["price"].median().to_dict()
+
+    def _fallback(self, outcode, bedrooms) -> float:
+        key = (str(outcode).upper().strip(), bedrooms)
+        if key in self.by_outcode:
+            return self.by_outcode[key]
+        return self.by_bedrooms.get(bedrooms, self.global_median)
+
+    def estimate(self, subjects: pd.DataFrame) -> pd.DataFrame:
+        """
+        Estimate the monthly rent of each subject.
+
+        Args:
+            subjects (pd.DataFrame): latitude, longitude, bedrooms and optionally id, bathrooms, property_type
+                                     and postcode_outcode columns; missing values only widen the match.
+
+        Returns:
+            pd.DataFrame: Aligned with `subjects`: estimate (GBP/month), confidence (0-1), comparables
+                          (listings with a meaningful weight) and method ("comparables", "outcode" or "bedrooms").
+        """
+        n = len(subjects)
+        lat, lon = _numeric(subjects, "latitude"), _numeric(subjects, "longitude")
+        beds = _numeric(subjects, "bedrooms")
+        baths = _numeric(subjects, "bathrooms")
+        groups = property_groups(subjects["property_type"]) if "property_type" in subjects.columns \
+            else np.full(n, -1, dtype=np.int8)
+        located = ~(np.isnan(lat) | np.isnan(lon))
+
+        estimates = np.full(n, np.nan)
+        confidence = np.zeros(n)
+        comparables = np.zeros(n, dtype=int)
+        if located.any() and self.k:
+            subject_ids = subjects["id"].astype(str).to_numpy()[located] \
+                if self.ids is not None and "id" in subjects.columns else None
+            # One neighbour more when the subject's own listing may be among them
+            k = self.k if subject_ids is None else min(self.k + 1, len(self.index.positions))
+            positions, distances = self.index.k_nearest_many(lat[located], lon[located], k)
+            found = positions >= 0
+            positions = np.where(found, positions, 0)
+            if subject_ids is not None:
+                own = found & (self.ids[positions] == subject_ids[:, None])
+                found &= ~own
+                if k > self.k:
+                    # Subjects not in the dataset keep their `k` nearest, like before
+                    found[:, -1] &= own.any(axis=1)
+
+            bed_gap = np.abs(self.bedrooms[positions] - beds[located][:, None])
+            bed_weight = np.where(bed_gap == 0, 1.0, np.where(bed_gap == 1, ADJACENT_BEDROOM_WEIGHT, 0.0))
+            bed_weight = np.where(np.isnan(beds[located])[:, None], 1.0, bed_weight)
+            bath_weight = np.where(self.bathrooms[positions] == baths[located][:, None], 1.0, OTHER_BATHROOMS_WEIGHT)
+            bath_weight = np.where(np.isnan(baths[located])[:, None], 1.0, bath_weight)
+            subject_groups = groups[located][:, None]
+            type_weight = np.where((subject_groups < 0) | (self.groups[positions] == subject_groups), 1.0,
+                                   OTHER_TYPE_WEIGHT)
+            distance_weight = 1.0 / (1.0 + (distances / self.scale_km) ** 2)
+            weights = np.where(found, bed_weight * bath_weight * type_weight * distance_weight, 0.0)
+
+            medians = _weighted_median(self.price[positions], weights)
+            total = weights.sum(axis=1)
+            enough = total >= MIN_TOTAL_WEIGHT
+            estimates[located] = np.where(enough, medians, np.nan)
+            confidence[located] = total / (total + CONFIDENCE_HALF_WEIGHT)
+            comparables[located] = (weights >= 0.1).sum(axis=1)
+
+        method = np.where(np.isnan(estimates), "", "comparables").astype(object)
+        outcodes = subjects["postcode_outcode"] if "postcode_outcode" in subjects.columns else pd.Series([""] * n)
+        for i in np.flatnonzero(np.isnan(estimates)):
+            key = (str(outcodes.iloc[i]).upper().strip(), beds[i])
+            estimates[i] = self._fallback(*key)
+            method[i] = "outcode" if key in self.by_outcode else "bedrooms"
+            confidence[i] = FALLBACK_CONFIDENCE[method[i]]
+
+        return pd.DataFrame({"estimate": estimates, "confidence": confidence, "comparables": comparables,
+                             "method": method},
+                            index=subjects.index)
+
+
+_valuer = None
+_valuer_lock = threading.Lock()
+
+
+def get_valuer() -> Optional[ComparablesValuer]:
+    """Process-wide valuer over the shared dataset, or None when the dataset cannot be loaded."""
+    global _valuer
+    with _valuer_lock:
+        if _valuer is None:
+            try:
+                _valuer = ComparablesValuer(get_dataset().projection(VALUATION_COLUMNS))
+            except Exception as e:
+                print(f"Valuation model unavailable: {e}")
+                return None
+        return _valuer
@@ -0,0 +1,94 @@
+"""A local stand-in for the Scrapfly scrape API, serving saved pages to a real `ScrapflyClient`."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from scrapfly import ScrapflyClient
+
+
+class FakeScrapfly:
+    """
+    Serve `pages` (target URL -> HTML) through the Scrapfly API format on localhost.
+
+    `delays` (URL -> seconds) makes a page slow and `failures` (URL -> n) answers the first n requests
+    for a URL with a 503 API error. Unknown URLs get a 404 upstream page. Requests are counted per URL,
+    `max_in_flight` is the most requests served at once, and successful ones report `cost` API credits.
+    """
+
+    def __init__(self, pages, delays=None, failures=None, cost=1):
+        self.pages = pages
+        self.cost = cost
+        self.delays = delays or {}
+        self.failures = dict(failures or {})
+        self.requests = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = parse_qs(urlparse(self.path).query)["url"][0]
+                with fake._lock:
+                    fake.requests[url] = fake.requests.get(url, 0) + 1
+                    fail = fake.failures.get(url, 0) > 0
+                    if fail:
+                        fake.failures[url] -= 1
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                try:
+                    self._serve(url, fail)
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+
+            def _serve(self, url, fail):
+                time.sleep(fake.delays.get(url, 0))
+                if fail:
+                    self._send(503, {}, {"http_code": 503, "code": "ERR::SCRAPE::NETWORK_ERROR",
+                                     "message": "upstream unreachable", "retryable": True, "error_id": "fake",
+                                     "links": {}})
+                    return
+                html = fake.pages.get(url)
+                self._send(200, {"X-Scrapfly-Api-Cost": str(fake.cost)}, {
+                    "uuid": "fake",
+                    "config": {"url": url, "method": "GET", "headers": {}, "asp": True, "env": "LIVE"},
+                    "context": {"url": url, "asp": True},
+                    "result": {"status": "DONE", "success": html is not None,
+                               "status_code": 200 if html is not None else 404,
+                               "reason": "OK" if html is not None else "Not Found", "format": "text",
+                               "content": html or "", "duration": 0.0, "log_url": "", "url": url,
+                               "response_headers": {}, "request_headers": {}, "error": None},
+                })
+
+            def _send(self, status, headers, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def client(self):
+        return ScrapflyClient(key="test", host=f"http://127.0.0.1:{self.server.server_address[1]}")
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
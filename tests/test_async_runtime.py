@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from src.utils.async_runtime import get_background_loop, iterate_sync, run_sync
+
+
+async def _loop_of_caller():
+    await asyncio.sleep(0)
+    return asyncio.get_running_loop()
+
+
+def test_run_sync_uses_one_shared_loop():
+    assert run_sync(_loop_of_caller()) is get_background_loop()
+    assert run_sync(_loop_of_caller()) is get_background_loop()
+
+
+def test_run_sync_cancels_on_timeout():
+    cancelled = asyncio.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(TimeoutError):
+        run_sync(slow(), timeout=0.05)
+    run_sync(asyncio.wait_for(cancelled.wait(), timeout=1))
+
+
+def test_iterate_sync_streams_and_closes():
+    closed = []
+
+    async def numbers():
+        try:
+            for n in range(10):
+                await asyncio.sleep(0)
+                yield n
+        finally:
+            closed.append(True)
+
+    assert list(iterate_sync(numbers())) == list(range(10))
+    stream = iterate_sync(numbers())
+    assert [next(stream), next(stream)] == [0, 1]
+    stream.close()
+    assert closed == [True, True]
@@ -0,0 +1,38 @@
+from src.local_classifier import LABELS, LocalIntentClassifier, featurize
+
+TRAINING = [
+    ("what is the weather today", "irrelevant"),
+    ("tell me a joke", "irrelevant"),
+    ("who won the football match", "irrelevant"),
+    ("list flats in Camden", "output"),
+    ("average rent in Hackney", "output"),
+    ("how many listings in zone 2", "output"),
+    ("plot a histogram of rents in Camden", "plot_stats"),
+    ("bar chart of average price by borough", "plot_stats"),
+    ("plot rent distribution in Islington", "plot_stats"),
+    ("show flats near Hyde Park on a map", "geospatial_plot"),
+    ("map properties in Hackney", "geospatial_plot"),
+    ("show on map houses north of the Thames", "geospatial_plot"),
+]
+
+
+def test_featurize_is_stable_and_normalized():
+    features = featurize(["flats in Camden", "flats in Camden"])
+    assert features.shape[1] > 0
+    assert (features[0] == features[1]).all()
+    assert abs(float((features[0] ** 2).sum()) - 1.0) < 1e-5
+
+
+def test_local_classifier_learns_and_round_trips(tmp_path):
+    texts, labels = zip(*TRAINING)
+    model = LocalIntentClassifier(n_features=2 ** 12).fit(list(texts), list(labels))
+    model.calibrate(list(texts), list(labels))
+    assert model.predict("plot a bar chart of rents in Camden")[0] == "plot_stats"
+    assert model.predict("map flats in Islington")[0] == "geospatial_plot"
+
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+    loaded = LocalIntentClassifier.load(path)
+    label, confidence = loaded.predict("tell me a joke")
+    assert label == "irrelevant" and label in LABELS
+    assert 0.0 < confidence <= 1.0
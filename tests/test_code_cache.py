@@ -0,0 +1,77 @@
+import pandas as pd
+import pandasai as pai
+import pytest
+
+from src.code_cache import CodeCache, CodeValidationError, execute_generated_code, schema_hash, validate_code
+
+CODE = """
+import pandas as pd
+df = execute_sql_query("SELECT borough, MEDIAN(price_gbp) AS median_rent FROM rental_data_london4 "
+                       "WHERE bedrooms = 2 GROUP BY borough ORDER BY borough")
+result = {"type": "dataframe", "value": df}
+"""
+
+
+@pytest.fixture
+def frame():
+    return pai.DataFrame(pd.DataFrame({
+        "borough": ["Camden", "Camden", "Hackney", "Hackney"],
+        "bedrooms": [2, 2, 2, 1],
+        "price_gbp": [2000.0, 3000.0, 1800.0, 1200.0],
+    }), _table_name="rental_data_london4")
+
+
+def pandasai_response(frame):
+    value = execute_generated_code(CODE, frame, ["rental_data_london4"])["value"]
+    return {"value": value, "type": "dataframe", "last_code_executed": CODE, "error": None}
+
+
+def test_validated_program_is_rerun_on_new_rows(tmp_path, frame):
+    cache = CodeCache(str(tmp_path / "code.sqlite"))
+    assert cache.run("Median rent per borough for 2-bed flats?", "output", frame) is None
+    assert cache.remember("median rent per borough for 2-bed flats", "output", frame, pandasai_response(frame))
+
+    # Same schema, new snapshot under another table name: the stored program runs locally
+    updated = pai.DataFrame(pd.concat([frame, frame.assign(price_gbp=frame["price_gbp"] * 2)], ignore_index=True),
+                            _table_name="rental_data_london5")
+    result = cache.run("Median rent per borough for 2-bed flats?", "output", updated)
+    assert result["value"]["median_rent"].tolist() == [3500.0, 2700.0]
+    # Another schema misses
+    assert cache.run("median rent per borough for 2-bed flats", "output", frame.assign(extra=1)) is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_unsafe_or_mismatching_code_is_not_cached(tmp_path, frame):
+    cache = CodeCache(str(tmp_path / "code.sqlite"))
+    with pytest.raises(CodeValidationError):
+        validate_code("import os\nresult = {'type': 'string', 'value': os.listdir('.')}")
+    with pytest.raises(CodeValidationError):
+        validate_code("result = {'type': 'string', 'value': open('/etc/passwd').read()}")
+    # Attribute chains through submodules and pandas / numpy file I/O
+    for unsafe in ("pd.io.common.os.system('ls')", "pd.read_csv('/etc/passwd')", "df.to_csv('/tmp/out.csv')",
+                   "writer = df.to_csv", "from pandas import io", "np.save('/tmp/x', df)"):
+        with pytest.raises(CodeValidationError):
+            validate_code(f"{unsafe}\nresult = {{'type': 'string', 'value': 'x'}}")
+    # Formatters returning text and pandas / numpy functions stay allowed
+    validate_code(CODE + "text = df.to_string(index=False)\nstart = pd.Timestamp.now() - pd.DateOffset(months=3)\n"
+                         "flags = np.where(df['median_rent'] > 2000, 1, 0)\n")
+    response = {**pandasai_response(frame), "value": pd.DataFrame({"borough": ["Camden"], "median_rent": [1.0]})}
+    assert not cache.remember("q", "output", frame, response)
+    assert cache.stats()["entries"] == 0
+
+
+def test_eviction_keeps_pinned_programs(tmp_path, frame):
+    cache = CodeCache(str(tmp_path / "code.sqlite"), max_entries=2)
+    schema = schema_hash(frame)
+    cache.put("a", "output", schema, CODE)
+    assert cache.pin("a", "output") == 1
+    for query in ("b", "c", "d"):
+        cache.put(query, "output", schema, CODE)
+    assert [p["query"] for p in cache.programs()] == ["d", "a"]
+
+    # A failing program is discarded unless pinned
+    broken = frame.rename(columns={"price_gbp": "price"})
+    cache.put("d", "output", schema_hash(broken), CODE)
+    cache.put("a", "output", schema_hash(broken), CODE, pinned=True)
+    assert cache.run("d", "output", broken) is None and cache.run("a", "output", broken) is None
+    assert {p["query"] for p in cache.programs() if p["schema"] == schema_hash(broken)} == {"a"}
@@ -0,0 +1,56 @@
+import pandas as pd
+import plotly.io as pio
+import pytest
+
+from src.code_pool import CodePool, GeneratedCodeError, GeneratedCodeTimeout
+
+PLOT = "import plotly.express as px\nfig = px.bar(df, x='borough', y='rent')\nst.plotly_chart(fig)"
+
+
+def listings():
+    return pd.DataFrame({"borough": ["Camden", "Hackney", "Camden"], "price_gbp": [2000.0, 1800.0, 3000.0]})
+
+
+@pytest.fixture
+def pool():
+    # Workers do not share this process's memory: they load the dataset with this module-level function
+    pool = CodePool(workers=2, timeout=1, cpu_seconds=1, memory_mb=512, load_dataset=listings)
+    yield pool
+    pool.close()
+
+
+def test_plot_and_pandas_jobs_return_serialized_results(pool):
+    figures = pool.run_plot(PLOT, [{"borough": "Camden", "rent": 2500}, {"borough": "Hackney", "rent": 1800}])
+    assert list(pio.from_json(figures[0]).data[0].x) == ["Camden", "Hackney"]
+
+    code = ('df = execute_sql_query("SELECT borough, AVG(price_gbp) AS rent FROM rental_data_london4 '
+            'GROUP BY borough ORDER BY borough")\nresult = {"type": "dataframe", "value": df}')
+    result = pool.run_pandas(code, ["rental_data_london4"])
+    assert result["value"]["rent"].tolist() == [2500.0, 1800.0]
+
+
+@pytest.mark.parametrize("code, error", [
+    ("import time\ntime.sleep(5)", GeneratedCodeTimeout),
+    ("while True:\n    pass", GeneratedCodeError),
+    ("buffer = bytearray(1024 ** 3)", GeneratedCodeError),
+    ("1 / 0", GeneratedCodeError),
+])
+def test_limits_and_failures_leave_the_pool_usable(pool, code, error):
+    with pytest.raises(error):
+        pool.run_plot(code, [])
+    assert len(pool.run_plot(PLOT, [{"borough": "Camden", "rent": 1}])) == 1
+
+
+def ballast():
+    # A worker dataset larger than the memory limit itself
+    return bytearray(300 * 1024 ** 2)
+
+
+def test_memory_limit_is_headroom_above_the_loaded_dataset():
+    pool = CodePool(workers=1, timeout=5, cpu_seconds=5, memory_mb=256, load_dataset=ballast)
+    try:
+        assert pool.run_plot("buffer = bytearray(100 * 1024 ** 2)", []) == []
+        with pytest.raises(GeneratedCodeError):
+            pool.run_plot("buffer = bytearray(400 * 1024 ** 2)", [])
+    finally:
+        pool.close()
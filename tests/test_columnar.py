@@ -0,0 +1,49 @@
+import pandas as pd
+
+from src.columnar import ColumnarSnapshot
+from src.dataset import DatasetHandle
+
+
+def write_snapshot(directory):
+    directory.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame({
+        "id": [11, 12, 13, 12],
+        "borough": ["Camden", "Hackney", "Camden", "Hackney"],
+        "price_gbp": [2000.0, 1500.0, 2500.0, 9.0],
+        "title": ["a", "b", "c", "d"],
+        "description": ["long text one", "long text two", None, "dup"],
+    }).to_parquet(directory / "data.parquet")
+    return str(directory / "data.parquet")
+
+
+def test_snapshot_reads_only_requested_columns_with_categoricals(tmp_path):
+    snapshot = ColumnarSnapshot(write_snapshot(tmp_path / "london"), cache_dir=str(tmp_path / "arrow"))
+    frame = snapshot.frame()
+    assert list(frame.columns) == ["id", "borough", "price_gbp", "title"]
+    assert isinstance(frame["borough"].dtype, pd.CategoricalDtype)
+    assert list(snapshot.frame(["price_gbp", "missing"]).columns) == ["price_gbp"]
+    assert snapshot.text("description", [2, 0]) == [None, "long text one"]
+    assert len(list((tmp_path / "arrow").glob("london-*.arrow"))) == 1
+
+
+def test_handle_uses_columnar_snapshot_and_falls_back_to_loader(tmp_path):
+    calls = []
+
+    def loader(path):
+        calls.append(path)
+        return pd.DataFrame({"id": [1], "price_gbp": [5.0], "description": ["from loader"]})
+
+    snapshot = ColumnarSnapshot(write_snapshot(tmp_path / "london"), cache_dir=str(tmp_path / "arrow"))
+    handle = DatasetHandle("london", loader=loader, columnar=snapshot)
+    assert list(handle.lookup([13, 12], ["price_gbp"])["price_gbp"]) == [2500.0, 1500.0]
+    assert handle.text(["12", "99", 11]) == ["long text two", None, "long text one"]
+    assert calls == []
+
+    # A snapshot that cannot be read (e.g. a Git LFS pointer) falls back to the full frame
+    pointer = tmp_path / "pointer" / "data.parquet"
+    pointer.parent.mkdir()
+    pointer.write_text("version https://git-lfs.github.com/spec/v1\n")
+    handle = DatasetHandle("pointer", loader=loader, columnar=ColumnarSnapshot(str(pointer), str(tmp_path / "arrow")))
+    assert list(handle.lean_frame().columns) == ["id", "price_gbp"]
+    assert handle.text([1]) == ["from loader"]
+    assert calls == ["pointer"]
@@ -0,0 +1,95 @@
+import asyncio
+import json
+from pathlib import Path
+
+from src.crawler import (CrawlReport, SearchCrawler, detect_rightmove_search_links, iter_listing_results,
+                         parse_search_page, search_page_url)
+from src.property_cache import PropertyCache
+from src.response_cache import ResponseCache
+from src.scrap_data import fetch_page, iter_scrape_properties
+from src.utils.rate_limit import TokenBucket
+from tests.fake_scrapfly import FakeScrapfly
+
+FIXTURES = Path(__file__).parent / "fixtures" / "rightmove"
+SEARCH = "https://www.rightmove.co.uk/property-to-rent/find.html?locationIdentifier=REGION%5E87490&radius=0.0"
+PROPERTY = "https://www.rightmove.co.uk/properties/{}"
+
+
+def search_html(ids, result_count):
+    model = {"properties": [{"id": int(pid), "propertyUrl": f"/properties/{pid}#/"} for pid in ids],
+             "resultCount": f"{result_count:,}", "pagination": {"total": -(-result_count // 24)}}
+    return f"<html><script>window.jsonModel = {json.dumps(model)}</script></html>"
+
+
+def fake_site(result_count=60):
+    ids = [str(1000 + i) for i in range(result_count)]
+    pages = {search_page_url(SEARCH, index): search_html(ids[index:index + 24] + ids[:2], result_count)
+             for index in range(0, result_count, 24)}
+    template = (FIXTURES / "property_page.html").read_text()
+    pages.update({PROPERTY.format(pid): template.replace("150912345", pid) for pid in ids})
+    return pages, ids
+
+
+def make_crawler(fake, tmp_path, **kwargs):
+    client = fake.client()
+    return SearchCrawler(fetch=lambda url: fetch_page(url, client=client, retries=0),
+                         checkpoint_dir=str(tmp_path / "crawl"), rate_limiter=TokenBucket(rate=1000), **kwargs)
+
+
+def test_detect_and_parse_search_pages():
+    text = f"value all of these {SEARCH} and https://www.rightmove.co.uk/properties/123"
+    assert detect_rightmove_search_links(text) == [SEARCH]
+    assert parse_search_page(search_html(["1", "2"], 1234)) == (["1", "2"], 1234)
+    assert parse_search_page('<a href="/properties/7#/">x</a><a href="/properties/7">') == (["7"], None)
+
+
+def test_crawl_paginates_dedupes_and_checkpoints(tmp_path):
+    pages, ids = fake_site()
+    with FakeScrapfly(pages) as fake:
+        crawler = make_crawler(fake, tmp_path)
+
+        async def first_page_only():
+            stream = crawler.iter_property_urls(SEARCH)
+            batch = await stream.__anext__()
+            await stream.aclose()
+            return batch
+
+        async def crawl_all():
+            return [url async for batch in crawler.iter_property_urls(SEARCH) for url in batch]
+
+        first = asyncio.run(first_page_only())
+        assert first == [PROPERTY.format(pid) for pid in ids[:24]]
+        # The interrupted crawl resumes from its checkpoint without refetching the first page
+        resumed = asyncio.run(crawl_all())
+    assert resumed == [PROPERTY.format(pid) for pid in ids]
+    assert all(count == 1 for url, count in fake.requests.items())
+    assert len(fake.requests) == 3
+
+
+def test_search_links_feed_valuations_with_report(tmp_path):
+    pages, ids = fake_site(result_count=30)
+    with FakeScrapfly(pages, cost=5) as fake:
+        client = fake.client()
+        cache = PropertyCache(ResponseCache(str(tmp_path / "properties.sqlite"), ttl_seconds=0),
+                              scrape=lambda urls: iter_scrape_properties(urls, client=client, retries=0))
+        report = CrawlReport()
+
+        async def collect():
+            links = [SEARCH, PROPERTY.format(ids[0])]
+            return [r async for r in iter_listing_results(links, cache=cache, report=report, batch_size=10,
+                                                          crawler=make_crawler(fake, tmp_path, max_properties=25))]
+
+        results = asyncio.run(collect())
+    assert sorted(r["property"]["id"] for r in results) == sorted(ids[:25])
+    summary = report.summary()
+    assert (summary["properties"], summary["search_pages"], summary["credits"]) == (25, 2, 5 * 27)
+    assert summary["cost_per_property"] == 5.4
+    assert summary["properties_per_minute"] > 0
+
+
+def test_report_does_not_count_stale_hits_as_saved():
+    report = CrawlReport()
+    for cached, stale in ((True, False), (True, True), (False, False)):
+        report.add_property({"ok": True, "cached": cached, "stale": stale, "cost": 0 if cached else 3})
+    summary = report.summary()
+    assert (summary["properties"], summary["cached"], summary["refreshed"], summary["credits"]) == (3, 1, 1, 3)
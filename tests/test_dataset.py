@@ -0,0 +1,28 @@
+import pandas as pd
+
+from src.dataset import DatasetHandle
+
+
+def make_handle(calls):
+    def loader(path):
+        calls.append(path)
+        return pd.DataFrame({"id": [101, 102, 103, 102], "price_gbp": [1.0, 2.0, 3.0, 9.0], "title": list("abcd")})
+    return DatasetHandle("some/dataset", loader=loader)
+
+
+def test_loads_lazily_and_once():
+    calls = []
+    handle = make_handle(calls)
+    assert calls == []
+    handle.lookup(["101"], ["id", "price_gbp"])
+    handle.lookup([102], ["id", "price_gbp"])
+    assert calls == ["some/dataset"]
+
+
+def test_lookup_projects_columns_in_request_order():
+    handle = make_handle([])
+    result = handle.lookup([103, "101", 999, 103, 102], ["id", "price_gbp"])
+    assert list(result.columns) == ["id", "price_gbp"]
+    assert list(result["id"]) == [103, 101, 102]
+    assert list(result["price_gbp"]) == [3.0, 1.0, 2.0]
+    assert handle.lookup([], ["id"]).empty
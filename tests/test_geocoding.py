@@ -0,0 +1,89 @@
+import pandas as pd
+import pytest
+from geopy.exc import GeocoderTimedOut
+
+from src.geocoding import BatchGeocoder, PostcodeCentroids
+from src.utils.rate_limit import TokenBucket
+from src.response_cache import ResponseCache
+
+
+class StubGeocoder:
+    def __init__(self, answers, fail=()):
+        self.answers = answers
+        self.fail = set(fail)
+        self.calls = []
+
+    def __call__(self, address):
+        self.calls.append(address)
+        if address in self.fail:
+            raise GeocoderTimedOut("stub timeout")
+        return self.answers.get(address)
+
+
+@pytest.fixture
+def centroids():
+    return PostcodeCentroids(pd.DataFrame({
+        "postcode_outcode": ["NW1", "NW1", "E8"],
+        "postcode_incode": ["9LQ", "7AA", None],
+        "latitude": [51.54, 51.52, 51.55],
+        "longitude": [-0.14, -0.16, -0.07],
+    }))
+
+
+def test_postcode_centroids(centroids):
+    assert centroids.lookup("Camden Road, London NW1 9LQ") == (51.54, -0.14)
+    assert centroids.lookup("Somewhere, London NW1", precise_only=True) is None
+    assert centroids.lookup("Somewhere, London NW1") == pytest.approx((51.53, -0.15))
+    assert centroids.lookup("No postcode here") is None
+
+
+def test_batch_dedupes_caches_and_resumes(tmp_path, centroids):
+    cache = ResponseCache(str(tmp_path / "geocode.sqlite"), ttl_seconds=0)
+    stub = StubGeocoder({"1 High St, London": (51.5, -0.1)}, fail={"2 Flaky Rd, London E8"})
+    geocoder = BatchGeocoder(stub, cache=cache, centroids=centroids)
+    addresses = ["1 High St, London", "1 high st,  London", "Camden Road, London NW1 9LQ",
+                 "Nowhere Lane", "2 Flaky Rd, London E8", None]
+    results = geocoder.geocode_many(addresses, progress=False)
+
+    assert results["1 high st,  London"] == (51.5, -0.1)
+    assert results["Camden Road, London NW1 9LQ"] == (51.54, -0.14)
+    assert results["Nowhere Lane"] == (None, None)
+    assert results["2 Flaky Rd, London E8"] == (51.55, -0.07)  # outcode fallback after a timeout
+    assert stub.calls == ["1 High St, London", "Nowhere Lane", "2 Flaky Rd, London E8"]
+
+    # A second run only retries the transient failure
+    rerun = StubGeocoder({}, fail={"2 Flaky Rd, London E8"})
+    again = BatchGeocoder(rerun, cache=cache, centroids=centroids).geocode_many(addresses, progress=False)
+    assert again == results
+    assert rerun.calls == ["2 Flaky Rd, London E8"]
+
+
+def test_token_bucket_spaces_requests():
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=2.0, capacity=1.0, clock=lambda: now[0], sleep=sleep)
+    for _ in range(3):
+        bucket.acquire()
+    assert now[0] == pytest.approx(1.0)
+    assert sleeps == [pytest.approx(0.5), pytest.approx(0.5)]
+
+
+def test_get_lat_long_goes_through_the_cache_and_rate_limiter(tmp_path, monkeypatch):
+    import src.geo_tools as geo_tools
+
+    stub = StubGeocoder({"1 High St, London": (51.5, -0.1)})
+    acquired = []
+    bucket = TokenBucket(rate=1.0, capacity=1.0, clock=lambda: 0.0, sleep=lambda seconds: None)
+    monkeypatch.setattr(bucket, "acquire", lambda: acquired.append(1))
+    cache = ResponseCache(str(tmp_path / "geocode.sqlite"), ttl_seconds=0)
+    monkeypatch.setattr(geo_tools, "get_batch_geocoder",
+                        lambda: BatchGeocoder(stub, cache=cache, rate_limiter=bucket))
+
+    assert geo_tools.get_lat_long("1 High St, London") == (51.5, -0.1)
+    assert geo_tools.get_lat_long("1 High St, London") == (51.5, -0.1)
+    assert stub.calls == ["1 High St, London"] and len(acquired) == 1
@@ -0,0 +1,62 @@
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+from src.map_rendering import (listings_payload, parse_features, render_map_html, aggregate_grid,
+                                render_density_html, GRID_MAX_CELLS_PER_SIDE)
+
+
+def test_parse_features_handles_lists_and_array_reprs():
+    assert parse_features('["Balcony", "Gym"]') == ("Balcony", "Gym")
+    assert parse_features("['Two double bedrooms' 'Study third room'\n 'Large reception']") == (
+        "Two double bedrooms", "Study third room", "Large reception")
+    assert parse_features("Part furnished") == ("Part furnished",)
+
+
+def test_payload_is_compact_and_script_safe():
+    listings = pd.DataFrame({
+        "latitude": [51.5, None], "longitude": [-0.1, -0.2], "title": ["</script><b>x</b>", "skipped"],
+        "price_gbp": [2500.4, 1000.0], "pricing_index": [0.914, 1.0], "property_features": ["['Gym']", "[]"],
+    })
+    payload = listings_payload(listings)
+    assert "</script>" not in payload
+    assert json.loads(payload.replace("<\\/", "</")) == [[51.5, -0.1, 2500.0, "</script><b>x</b>", 0.91, ["Gym"]]]
+
+
+def test_render_builds_markers_client_side():
+    listings = pd.DataFrame({
+        "latitude": [51.5] * 3, "longitude": [-0.1] * 3, "title": ["a", "b", "c"],
+        "price_gbp": [1.0, 2.0, 3.0], "pricing_index": [1.0] * 3, "property_features": ["[]"] * 3,
+    })
+    html = render_map_html(listings, api_key="KEY")
+    assert html.count("new google.maps.Marker(") == 2  # the loop body and the focus marker template
+    assert "MarkerClusterer" in html
+    assert re.search(r"const LISTINGS = \[\[", html)
+
+
+def test_aggregate_grid_counts_and_medians():
+    listings = pd.DataFrame({
+        "latitude": [51.500, 51.5001, 51.5002, 51.600, None],
+        "longitude": [-0.100, -0.1001, -0.1002, -0.100, -0.1],
+        "price_gbp": [1000.0, 2000.0, 4000.0, 5000.0, 9999.0],
+        "pricing_index": [1.0, None, 0.8, 1.2, 1.0],
+    })
+    grid = aggregate_grid(listings, cell_km=1.0).sort_values("south").reset_index(drop=True)
+    assert list(grid["count"]) == [3, 1]
+    assert list(grid["median_price_gbp"]) == [2000.0, 5000.0]
+    assert list(grid["median_pricing_index"]) == [0.9, 1.2]
+
+
+def test_density_page_size_is_bounded():
+    rng = np.random.default_rng(0)
+    sizes = []
+    for n in (5000, 50000):
+        listings = pd.DataFrame({"latitude": 51.5 + rng.normal(0, 0.06, n), "longitude": -0.12 + rng.normal(0, 0.1, n),
+                                 "price_gbp": rng.integers(900, 9000, n).astype(float)})
+        grid = aggregate_grid(listings)
+        assert grid["count"].sum() == n
+        assert len(grid) <= GRID_MAX_CELLS_PER_SIDE ** 2
+        sizes.append(len(render_density_html(grid, api_key="KEY", total=n)))
+    assert sizes[1] < 2 * sizes[0]
@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+from src.plot_templates import plot_cache_key, template_plot_code
+
+
+class FakeStreamlit:
+    def __init__(self):
+        self.figures = []
+
+    def plotly_chart(self, fig, use_container_width=True):
+        self.figures.append(fig)
+
+
+def render(code, data):
+    st = FakeStreamlit()
+    exec(code, {"df": data, "st": st})
+    return st.figures[0]
+
+
+LISTINGS = pd.DataFrame({
+    "title": [f"Flat {i}" for i in range(30)],
+    "price_gbp": [1500 + 50 * i for i in range(30)],
+    "size_sqft_max": [400 + 20 * i if i % 5 else 0 for i in range(30)],
+    "added_on": [f"2024-0{1 + i % 3}-1{i % 10}" for i in range(30)],
+})
+
+
+@pytest.mark.parametrize("query, data, chart", [
+    ("Plot average rent by borough", pd.DataFrame({"borough": ["Camden", "Hackney"], "mean_price_gbp": [2500., 2100.]}),
+     "bar"),
+    ("Chart median rent by number of bedrooms", pd.DataFrame({"bedrooms": [1, 2, 3], "median_price_gbp": [1.5, 2., 3.]}),
+     "bar"),
+    ("Show the distribution of rents", LISTINGS, "histogram"),
+    ("Plot price vs size", LISTINGS, "scatter"),
+    ("How many listings were added over time?", LISTINGS, "scatter"),
+])
+def test_templates_render(query, data, chart):
+    fig = render(template_plot_code(query, data), data)
+    assert fig.data[0].type == chart
+    assert len(fig.data[0].x) == (3 if "time" in query else len(data) - 6 if "size" in query else len(data))
+
+
+def test_unmatched_requests_go_to_the_llm():
+    assert template_plot_code("Pie chart of furnishing types",
+                              pd.DataFrame({"furnish_type": ["Furnished"], "count": [3]})) is None
+    assert template_plot_code("Plot these listings", LISTINGS[["title", "added_on"]]) is None
+    # The cache key follows the request and the column names and kinds, not the values
+    assert plot_cache_key("Plot rent by borough?", LISTINGS) == plot_cache_key("plot rent by borough", LISTINGS[::-1])
+    assert plot_cache_key("plot rent by borough", LISTINGS) != plot_cache_key("plot rent by borough", LISTINGS.iloc[:, :2])
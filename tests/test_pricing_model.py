@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from src.dataset import next_version_path, write_dataset_version
+from src.pricing_model import FeatureStore, retrain
+
+
+def snapshot(n, seed=0, prefix=""):
+    """Synthetic listings whose log rent is linear in bedrooms and distance, plus a borough effect."""
+    rng = np.random.default_rng(seed)
+    bedrooms = rng.integers(0, 5, n)
+    distance = rng.uniform(0, 20, n)
+    borough = rng.choice(["camden", "hackney", "sutton"], n)
+    log_price = 7.2 + 0.25 * bedrooms - 0.03 * distance + np.where(borough == "camden", 0.3, 0.0)
+    return pd.DataFrame({
+        "id": [f"{prefix}{i}" for i in range(n)], "bedrooms": bedrooms, "bathrooms": 1,
+        "latitude": 51.5 + rng.normal(0, 0.05, n), "longitude": -0.12 + rng.normal(0, 0.08, n),
+        "distance_to_center_km": distance, "property_type": rng.choice(["Flat", "House"], n),
+        "borough": borough, "price_gbp": np.exp(log_price + rng.normal(0, 0.05, n)),
+        "predicted_price": 0.0, "pricing_index": 0.0,
+    })
+
+
+def test_incremental_update_matches_full_rebuild(tmp_path):
+    first = snapshot(3000)
+    scored, report = retrain(first, str(tmp_path / "features"))
+    assert report["added"] == 3000 and report["holdout"]["median_ape"] < 0.1
+    assert np.allclose(scored["pricing_index"], scored["price_gbp"] / scored["predicted_price"], rtol=1e-3)
+
+    # Next snapshot: 100 listings gone, one repriced, 200 new ones in a new borough
+    second = pd.concat([first.iloc[100:], snapshot(200, seed=1, prefix="new").assign(borough="bexley")])
+    second.loc[second["id"] == "500", "price_gbp"] *= 2
+    incremental, report = retrain(second, str(tmp_path / "features"))
+    assert (report["reused"], report["added"], report["removed"]) == (2899, 201, 101)
+    assert set(report["seconds"]) >= {"featurize", "fit", "score", "total"}
+
+    full, _ = retrain(second, str(tmp_path / "rebuilt"), full=True)
+    assert np.allclose(incremental["predicted_price"], full["predicted_price"])
+    assert FeatureStore.load(str(tmp_path / "features")).keys.shape == (3100,)
+
+
+def test_write_dataset_version(tmp_path):
+    source = tmp_path / "new-bot" / "rental-data-london4"
+    source.mkdir(parents=True)
+    (source / "schema.yaml").write_text("name: rental_data_london4\nsource:\n  type: parquet\n  path: data.parquet\n")
+    assert next_version_path("new-bot/rental-data-london4") == "new-bot/rental-data-london5"
+
+    write_dataset_version(snapshot(10), "new-bot/rental-data-london4", "new-bot/rental-data-london5",
+                          datasets_dir=str(tmp_path))
+    target = tmp_path / "new-bot" / "rental-data-london5"
+    assert "name: rental_data_london5" in (target / "schema.yaml").read_text()
+    assert len(pd.read_parquet(target / "data.parquet")) == 10
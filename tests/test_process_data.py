@@ -1,40 +1,63 @@
+import numpy as np
 import pandas as pd
-
-
-class ListingAnalyzer:
-    def __init__(self, df: pd.DataFrame):
-        self.df = df.copy()
-
-    def avg_price_per_bedroom(self) -> pd.DataFrame:
-        return self.df.groupby('bedrooms', as_index=False)['price'].mean().rename(columns={'price': 'avg_price'})
-
-    def count_by_type(self) -> pd.DataFrame:
-        return self.df.groupby('type', as_index=False).size().rename(columns={'size': 'count'})
-
-    def listing_date_range(self) -> pd.DataFrame:
-        return pd.DataFrame({
-            'min_date': [self.df['addedOn'].min()],
-            'max_date': [self.df['addedOn'].max()]
-        })
-
-    def missing_size_count(self) -> pd.DataFrame:
-        count = self.df['sizeMin'].isnull().sum()
-        return pd.DataFrame({'missing_sizeMin_count': [count]})
-
-    def price_per_sqm(self) -> pd.DataFrame:
-        df = self.df.copy()
-        df = df[df['sizeMin'] > 0]
-        df['price_per_sqm'] = df['price'] / df['sizeMin']
-        return df[['title', 'price', 'sizeMin', 'price_per_sqm']]
-
-    def furnishing_distribution(self) -> pd.DataFrame:
-        furnishing_counts = self.df['furnishing'].value_counts(normalize=True).reset_index()
-        furnishing_counts.columns = ['furnishing', 'percentage']
-        return furnishing_counts
-
-    def top5_verified_expensive(self) -> pd.DataFrame:
-        filtered = self.df[self.df['verified'] == True].sort_values(by='price', ascending=False).head(5)
-        return filtered[['title', 'price', 'verified']]
-
-    def price_duration_counts(self) -> pd.DataFrame:
-        return self.df.groupby('priceDuration', as_index=False).size().rename(columns={'size': 'count'})
+import pytest
+
+from src.analytics import ListingAnalyzer
+from src.query_engine import FastQueryEngine
+
+
+@pytest.fixture(scope="module")
+def listings():
+    rng = np.random.default_rng(0)
+    n = 3000
+    return pd.DataFrame({
+        "id": np.arange(n).astype(str),
+        "borough": rng.choice(["Camden", "Hackney", "Westminster"], n),
+        "district": rng.choice(["Camden Town", "Dalston", "Soho", "Mayfair"], n),
+        "bedrooms": rng.integers(0, 4, n),
+        "property_type": rng.choice(["Flat", "Apartment", "Terraced House", "Studio"], n),
+        "furnish_type": rng.choice(["Furnished", "Unfurnished", None], n),
+        "travel_zone": rng.choice(["1", "2", "Zone 3"], n),
+        "price_gbp": np.where(rng.random(n) < 0.02, np.nan, rng.uniform(900, 6000, n)).round(),
+        "size_sqft_max": np.where(rng.random(n) < 0.3, 0.0, rng.uniform(300, 1500, n)).round(),
+        "pricing_index": rng.uniform(0.6, 1.4, n),
+    })
+
+
+QUERIES = [
+    "average rent by borough",
+    "median rent by number of bedrooms",
+    "how many listings by property type",
+    "average rent in Hackney",
+    "median price per sqft by borough",
+    "maximum rent for 2 bed flats by borough",
+    "average rent of flats by district",
+    "how many furnished 1 bedroom listings in zone 2",
+    "total rent by furnish type",
+    "minimum pricing index in Camden by bedrooms",
+    "average size by bedrooms in zone 3",
+]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_cube_answers_match_row_level_aggregates(listings, query):
+    cube = FastQueryEngine(listings)
+    rows = FastQueryEngine(listings, analyzer=ListingAnalyzer(listings, dimensions=[]))
+    spec = cube.parse(query)
+    assert spec is not None and spec["agg"] is not None
+    expected = rows._aggregate(rows.df[np.ones(len(listings), dtype=bool)], spec) if not spec["filters"] \
+        else rows.execute(spec)
+    result = cube.execute(spec)
+    pd.testing.assert_frame_equal(result.astype(object).reset_index(drop=True),
+                                  expected.astype(object).reset_index(drop=True), check_dtype=False)
+
+
+def test_rollup_only_answers_what_the_cube_holds(listings):
+    analyzer = ListingAnalyzer(listings)
+    assert len(analyzer.cuboids) == 1 + 6 + 15
+    # Medians cannot be combined across the flat and apartment groups
+    assert analyzer.rollup("median", "price_gbp", where={"property_type": ["Flat", "Apartment"]}) is None
+    assert analyzer.rollup("mean", "price_gbp", by="borough",
+                           where={"bedrooms": [1], "district": ["Soho"]}) is None
+    assert list(analyzer.count_by_type()["count"]) == list(listings.groupby("property_type").size())
+    assert analyzer.furnishing_distribution()["percentage"].sum() == pytest.approx(1.0)
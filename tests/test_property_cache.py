@@ -0,0 +1,74 @@
+import asyncio
+
+from src.property_cache import PropertyCache, property_id
+from src.response_cache import ResponseCache
+
+URL = "https://www.rightmove.co.uk/properties/{}"
+
+
+class FakeScraper:
+    def __init__(self):
+        self.calls = []
+        self.version = 1
+
+    async def __call__(self, urls):
+        self.calls.append(list(urls))
+        for url in urls:
+            ok = not url.endswith("404")
+            yield {"url": url, "ok": ok, "property": {"id": property_id(url), "version": self.version} if ok else None,
+                   "error": None if ok else "Not a property page", "attempts": 1}
+
+
+def make_cache(tmp_path, **kwargs):
+    scraper = FakeScraper()
+    store = ResponseCache(str(tmp_path / "properties.sqlite"), max_entries=1000, ttl_seconds=0)
+    return PropertyCache(store, scraper, **kwargs), scraper
+
+
+def test_dedupes_batch_and_serves_hits(tmp_path):
+    cache, scraper = make_cache(tmp_path)
+    urls = [URL.format(1), "https://rightmove.co.uk/properties/1", URL.format(2), URL.format(404)]
+    first = asyncio.run(cache.get_properties(urls))
+    assert [p["id"] for p in first] == ["1", "2"]
+    assert scraper.calls == [[URL.format(1), URL.format(2), URL.format(404)]]
+
+    second = asyncio.run(cache.get_properties([URL.format(2), URL.format(1)]))
+    assert [p["id"] for p in second] == ["2", "1"]
+    assert len(scraper.calls) == 1
+    stats = cache.stats()
+    assert (stats["fetched"], stats["saved_fetches"], stats["fresh_hits"]) == (3, 3, 2)
+    assert stats["hit_rate"] == 2 / 6
+
+
+def test_streams_cached_results_first(tmp_path):
+    cache, scraper = make_cache(tmp_path)
+    asyncio.run(cache.get_properties([URL.format(1)]))
+
+    async def collect():
+        return [r async for r in cache.iter_properties([URL.format(2), URL.format(1), URL.format(404)])]
+
+    results = asyncio.run(collect())
+    assert [(r["url"], r["ok"], r["cached"]) for r in results] == [
+        (URL.format(1), True, True), (URL.format(2), True, False), (URL.format(404), False, False)]
+    assert results[2]["error"] == "Not a property page"
+
+
+def test_stale_entries_are_served_then_refreshed(tmp_path):
+    cache, scraper = make_cache(tmp_path, ttl_seconds=0)
+
+    async def scenario():
+        await cache.get_properties([URL.format(7)])
+        scraper.version = 2
+        stale = await cache.get_properties([URL.format(7)])
+        again = await cache.get_properties([URL.format(7)])  # refresh already running: not scheduled twice
+        await cache.join()
+        return stale, again
+
+    stale, again = asyncio.run(scenario())
+    assert stale[0]["version"] == 1 and again[0]["version"] == 1
+    assert scraper.calls == [[URL.format(7)], [URL.format(7)]]
+    assert cache.store.get("property", "7")["property"]["version"] == 2
+    stats = cache.stats()
+    assert stats["refreshes"] == 1
+    # Stale hits are served from the cache but refreshed with a scrape: they save no fetch
+    assert (stats["stale_hits"], stats["saved_fetches"]) == (2, 0)
@@ -0,0 +1,114 @@
+import pandas as pd
+import pytest
+
+from src.columnar import ColumnarSnapshot
+import src.query_engine as query_engine
+from src.query_engine import FastQueryEngine
+
+
+@pytest.fixture(params=["pandas", "columnar"])
+def engine(request, tmp_path):
+    df = pd.DataFrame({
+        "id": ["1", "2", "3", "4", "5", "6"],
+        "title": ["a", "b", "c", "d", "e", "f"],
+        "borough": ["Camden", "Camden", "Hackney", "Hackney", "Camden", "Westminster"],
+        "district": ["Camden Town", "Kentish Town", "Dalston", "Shoreditch", "Camden Town", "Soho"],
+        "property_type": ["Flat", "Apartment", "Flat", "Terraced House", "Flat", "Penthouse"],
+        "bedrooms": [2, 2, 1, 3, 2, 4],
+        "price_gbp": [2500.0, 2100.0, 1800.0, 3200.0, 2300.0, 9000.0],
+        "furnish_type": ["Furnished", "Unfurnished", "Furnished", "Part furnished", "Furnished", "Furnished"],
+        "travel_zone": ["2", "2", "2", "1", "2", "1"],
+        "size_sqft_max": [700.0, 650.0, 0.0, 1000.0, 600.0, 2000.0],
+    })
+    if request.param == "columnar":
+        # Same data through the memory-mapped loader: categoricals and Arrow-backed strings
+        df.to_parquet(tmp_path / "data.parquet")
+        df = ColumnarSnapshot(str(tmp_path / "data.parquet"), cache_dir=str(tmp_path / "arrow")).frame()
+    return FastQueryEngine(df)
+
+
+def test_top_n_cheapest_with_filters(engine):
+    result = engine.run("10 cheapest 2-bed flats in Camden")
+    assert list(result["id"]) == ["2", "5", "1"]
+
+
+def test_group_by_aggregate(engine):
+    result = engine.run("average rent by borough")
+    assert dict(zip(result["borough"], result["mean_price_gbp"])) == {
+        "Camden": pytest.approx(2300.0), "Hackney": pytest.approx(2500.0), "Westminster": pytest.approx(9000.0),
+    }
+
+
+def test_scalar_aggregate_and_count(engine):
+    assert engine.run("average rent in Hackney")["mean_price_gbp"][0] == pytest.approx(2500.0)
+    assert engine.run("how many listings are available in zone 1?")["count"][0] == 2
+
+
+def test_price_furnishing_and_district_filters(engine):
+    assert list(engine.run("unfurnished properties under £2,200")["id"]) == ["2"]
+    assert list(engine.run("furnished flats in camden town")["id"]) == ["1", "5"]
+    assert list(engine.run("houses between 3k and 4k")["id"]) == ["4"]
+
+
+def test_listings_over_the_row_cap_fall_back(engine, monkeypatch):
+    engine.max_rows = 2
+    assert engine.run("furnished properties") is None
+    assert list(engine.run("unfurnished properties")["id"]) == ["2"]
+    assert len(engine.run("3 cheapest furnished properties")) == 3  # an explicit limit wins
+    assert len(engine.run("average rent by borough")) == 3  # aggregates are not cut
+    monkeypatch.setitem(query_engine.ACTION_MAX_ROWS, "geospatial_plot", 4)
+    assert len(engine.run("furnished properties", "geospatial_plot")) == 4
+
+
+def test_unsupported_queries_fall_back(engine):
+    assert engine.parse("flats with a balcony in Camden") is None
+    assert engine.parse("properties added in June 2023 in Hackney") is None
+    assert engine.parse("show me everything") is None
+
+
+def test_aggregates_of_other_columns_fall_back(engine):
+    for query in ("average number of bedrooms in Camden", "max bedrooms in Hackney", "how many bedrooms in Camden",
+                  "number of bedrooms by borough"):
+        assert engine.parse(query) is None, query
+    assert engine.run("total number of listings in Camden")["count"][0] == 3
+    assert list(engine.run("average rent by number of bedrooms")["bedrooms"]) == [1, 2, 3, 4]
+
+
+def test_sorted_and_ordered_by_a_column(engine):
+    assert list(engine.run("properties in Camden sorted by price")["id"]) == ["2", "5", "1"]
+    assert list(engine.run("properties in Camden ordered by price descending")["id"]) == ["1", "5", "2"]
+    assert list(engine.run("flats in Hackney sort by bedrooms desc")["id"]) == ["3"]
+    assert engine.parse("properties in Camden sorted by the landlord") is None
+
+
+@pytest.fixture
+def spatial_engine():
+    df = pd.DataFrame({
+        "id": ["park", "soho", "brixton", "greenwich", "far"],
+        "borough": ["Westminster", "Westminster", "Lambeth", "Greenwich", "Barnet"],
+        "bedrooms": [1, 2, 2, 3, 2],
+        "price_gbp": [3000.0, 2500.0, 1800.0, 2000.0, 1500.0],
+        "latitude": [51.5080, 51.5136, 51.4627, 51.4800, 51.6500],
+        "longitude": [-0.1650, -0.1365, -0.1145, -0.0100, -0.2000],
+    })
+    return FastQueryEngine(df)
+
+
+def test_radius_and_near_queries(spatial_engine):
+    result = spatial_engine.run("properties within 1 mile of Hyde Park")
+    assert list(result["id"]) == ["park"]
+    assert result["distance_km"][0] < 0.1
+    assert list(spatial_engine.run("2 bed properties near Piccadilly Circus")["id"]) == ["soho"]
+
+
+def test_thames_split_and_nearest(spatial_engine):
+    assert set(spatial_engine.run("properties south of the Thames")["id"]) == {"brixton", "greenwich"}
+    assert set(spatial_engine.run("properties north of the river")["id"]) == {"park", "soho", "far"}
+    assert list(spatial_engine.run("2 nearest properties to Big Ben")["id"]) == ["soho", "park"]
+
+
+def test_spatial_focus(spatial_engine):
+    focus = spatial_engine.spatial_focus("show on map flats within 500m of Buckingham Palace")
+    assert focus["label"] == "Buckingham Palace"
+    assert focus["radius_km"] == pytest.approx(0.5)
+    assert spatial_engine.spatial_focus("flats in Camden") is None
@@ -0,0 +1,54 @@
+import time
+
+from src.response_cache import ResponseCache, normalize_query
+
+
+def test_normalize_query():
+    assert normalize_query("  Average rent in   HACKNEY? ") == "average rent in hackney"
+
+
+def test_hit_miss_and_counters(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    assert cache.get("response", "q") is None
+    cache.set("response", "q", {"type": "data", "data": [{"value": 1}]})
+    assert cache.get("response", "q") == {"type": "data", "data": [{"value": 1}]}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    ResponseCache(path).set("response", "q", "value")
+    assert ResponseCache(path).get("response", "q") == "value"
+
+
+def test_lru_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.set("response", "a", 1)
+    time.sleep(0.01)
+    cache.set("response", "b", 2)
+    time.sleep(0.01)
+    cache.get("response", "a")
+    time.sleep(0.01)
+    cache.set("response", "c", 3)
+    assert cache.get("response", "b") is None
+    assert cache.get("response", "a") == 1
+    assert cache.get("response", "c") == 3
+
+
+def test_ttl_expiry(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), ttl_seconds=0.01)
+    cache.set("response", "a", 1)
+    time.sleep(0.05)
+    assert cache.get("response", "a") is None
+
+
+def test_dataset_version_invalidation(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    cache.set("classification", "q", {"relevant": True})
+    cache.set("response", "q", "old", version="v1")
+    assert cache.get("response", "q", version="v1") == "old"
+    assert cache.get("response", "q", version="v2") is None
+    # Switching snapshots purges stale responses but keeps version-independent entries
+    assert cache.get("response", "q", version="v1") is None
+    assert cache.get("classification", "q") == {"relevant": True}
@@ -0,0 +1,93 @@
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.result_store import ResultStore
+from src.results import QueryResult
+
+
+def _listings(rows):
+    return pd.DataFrame({"id": [f"p{i}" for i in range(rows)], "price_gbp": np.arange(rows, dtype=float),
+                         "borough": ["Camden", "Hackney"] * (rows // 2)})
+
+
+def test_pages_come_from_memory_and_from_spilled_parquet(tmp_path):
+    store = ResultStore(str(tmp_path), max_memory_mb=0.05, page_size=100)
+    first, second = _listings(1000), _listings(10)
+    first_handle = store.put(first)
+    second_handle = store.put(second)
+
+    # Over the memory budget the least recently used result is spilled to parquet
+    assert os.path.exists(tmp_path / f"{first_handle}.parquet")
+    assert store.stats()["in_memory"] == 1 and store.stats()["on_disk"] == 1
+    assert store.count(first_handle) == 1000 and store.count(second_handle) == 10
+    page = store.page(first_handle, 250, 100)
+    pd.testing.assert_frame_equal(page.reset_index(drop=True), first.iloc[250:350].reset_index(drop=True))
+    assert store.page(first_handle, 950, 100)["id"].tolist()[-1] == "p999"
+    assert store.page(first_handle, 2000).empty
+    pd.testing.assert_frame_equal(store.frame(first_handle), first)
+    pd.testing.assert_frame_equal(store.page(second_handle, 0, 5), second.iloc[:5])
+
+    # Unknown, malformed and expired handles read as None
+    assert store.page("0" * 32) is None and store.frame("../etc/passwd") is None
+    store.ttl_seconds = 0
+    time.sleep(0.01)
+    store.put(_listings(2))
+    assert store.page(first_handle) is None and store.count(second_handle) is None
+
+
+def test_unparquetable_results_spill_as_pickles(tmp_path):
+    store = ResultStore(str(tmp_path), max_memory_mb=0)
+    mixed = pd.DataFrame({"value": [1, "a", None]})
+    handle = store.put(mixed)
+    assert os.path.exists(tmp_path / f"{handle}.pkl")
+    assert store.page(handle, 1, 1)["value"].tolist() == ["a"]
+
+
+def test_tool_json_carries_a_cursor_with_the_first_page(tmp_path):
+    store = ResultStore(str(tmp_path), page_size=20)
+    frame = _listings(50)
+    parsed = json.loads(QueryResult.ok(frame).to_json(store=store))
+    assert parsed["success"] and len(parsed["result"]) == 20
+    assert (parsed["total"], parsed["offset"], parsed["limit"]) == (50, 0, 20)
+    assert store.page(parsed["handle"], 40)["id"].tolist() == [f"p{i}" for i in range(40, 50)]
+
+    # Reading the JSON back resolves the cursor to the whole result
+    assert len(QueryResult.from_json(json.dumps(parsed), store=store)) == 50
+    failure = json.loads(QueryResult.failure("boom").to_json(store=store))
+    assert "handle" not in failure and failure["error"] == "boom"
+
+
+def test_results_stay_readable_while_they_are_spilled(tmp_path):
+    seen = []
+
+    class ObservedStore(ResultStore):
+        def _spill(self, handle, frame):
+            # Another session reading the result between the memory eviction and the written file
+            seen.append(self.page(handle, 0, 3))
+            super()._spill(handle, frame)
+            seen.append(self.page(handle, 0, 3))
+
+    store = ObservedStore(str(tmp_path), max_memory_mb=0.05)
+    handle = store.put(_listings(1000))
+    store.put(_listings(10))
+    assert len(seen) == 2 and all(page is not None and page["id"].tolist() == ["p0", "p1", "p2"] for page in seen)
+    assert store.stats()["in_memory"] == 1 and not store._spilling
+
+
+def test_files_expired_by_another_process_are_skipped(tmp_path, monkeypatch):
+    store = ResultStore(str(tmp_path), max_memory_mb=0, max_disk_mb=0)
+    store.put(_listings(10))
+    remove = os.remove
+
+    def remove_twice(path):
+        # Another process sharing the directory deletes the file first
+        remove(path)
+        remove(path)
+
+    monkeypatch.setattr(os, "remove", remove_twice)
+    store.put(_listings(10))
+    assert store.stats()["on_disk"] == 0
@@ -0,0 +1,44 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.results import QueryResult, decode_response, encode_response
+
+
+@pytest.mark.parametrize("value, rows", [
+    (pd.DataFrame({"borough": ["Camden", "Hackney"], "price_gbp": [2500.0, 1800.0]}), 2),
+    (pd.Series([2500.0, 1800.0], index=pd.Index(["Camden", "Hackney"], name="borough")), 2),
+    (2150.5, 1),
+    ({"borough": "Camden", "count": 3}, 1),
+    ([], 0),
+    (None, 0),
+])
+def test_results_stay_frames_and_round_trip_as_json(value, rows):
+    result = QueryResult.ok(value)
+    assert len(result) == rows and result.empty == (rows == 0)
+    if rows:
+        assert isinstance(result.frame, pd.DataFrame)
+
+    # At the tool boundary the JSON is the former standard_response
+    parsed = json.loads(result.to_json())
+    assert parsed["success"] and parsed["error"] is None
+    assert len(QueryResult.from_json(result.to_json())) == rows
+    failure = QueryResult.from_json(QueryResult.failure("boom", "retry").to_json())
+    assert (failure.success, failure.error, failure.solution) == (False, "boom", "retry")
+
+
+def test_cached_responses_keep_their_frames():
+    frame = pd.DataFrame({"id": ["a", "b"], "bedrooms": np.array([1, 2], dtype=np.int64), "price_gbp": [1.5, np.nan],
+                          "added_on": pd.to_datetime(["2024-01-01", "2024-02-01"])})
+    response = {"type": "plot", "result": "code", "data": frame}
+    decoded = decode_response(json.loads(json.dumps(encode_response(response))))
+    pd.testing.assert_frame_equal(decoded["data"], frame)
+    assert decoded["result"] == "code"
+
+    # Frames parquet cannot store fall back to records
+    mixed = {"type": "data", "data": pd.DataFrame({"value": [1, "a"]})}
+    assert decode_response(json.loads(json.dumps(encode_response(mixed))))["data"]["value"].tolist() == [1, "a"]
+    message = {"type": "message", "message": "No properties found."}
+    assert decode_response(encode_response(message)) == message
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+import src.scrap_data as scrap_data
+from src.scrap_data import extract_page_model, find_json_objects, iter_scrape_properties, parse_page
+from tests.fake_scrapfly import FakeScrapfly
+
+FIXTURES = Path(__file__).parent / "fixtures" / "rightmove"
+URL = "https://www.rightmove.co.uk/properties/{}"
+
+
+def test_extract_page_model_from_fixture():
+    html = (FIXTURES / "property_page.html").read_text()
+    page_model = extract_page_model(html)
+    assert page_model["propertyData"]["id"] == "150912345"
+    assert page_model["propertyData"]["text"]["description"].startswith("Bright two bedroom flat {newly")
+    assert extract_page_model((FIXTURES / "search_page.html").read_text()) is None
+
+
+def test_parse_page_and_find_json_objects():
+    html = (FIXTURES / "property_page.html").read_text()
+    parsed = parse_page(html, "https://www.rightmove.co.uk/properties/150912345")
+    assert parsed["prices"]["primaryPrice"] == "£2,362 pcm"
+    assert parsed["address"]["outcode"] == "NW1"
+    assert list(find_json_objects('x = {"a": 1}; y = {bad}; z = {"b": {"c": 2}}')) == [{"a": 1}, {"b": {"c": 2}}]
+
+
+def property_html(pid):
+    return (FIXTURES / "property_page.html").read_text().replace("150912345", pid)
+
+
+def test_stream_yields_per_url_results_as_they_arrive():
+    slow, fast, flaky, missing = (URL.format(n) for n in ("1", "2", "3", "4"))
+    pages = {slow: property_html("1"), fast: property_html("2"), flaky: property_html("3")}
+    with FakeScrapfly(pages, delays={slow: 0.3}, failures={flaky: 1}) as fake:
+        async def collect():
+            return [r async for r in iter_scrape_properties([slow, fast, flaky, missing, fast], client=fake.client(),
+                                                            concurrency=4, timeout=5, retries=2, backoff=0.01)]
+        results = asyncio.run(collect())
+
+    assert results[-1]["url"] == slow  # the slow page does not hold up the others
+    by_url = {r["url"]: r for r in results}
+    assert len(results) == 4
+    assert by_url[fast]["ok"] and by_url[fast]["property"]["id"] == "2"
+    assert by_url[flaky]["ok"] and by_url[flaky]["attempts"] == 2
+    assert not by_url[missing]["ok"] and by_url[missing]["attempts"] == 1
+    assert fake.requests[fast] == 1
+
+
+def test_timeouts_are_reported_without_a_second_paid_request():
+    slow, other = URL.format("5"), URL.format("6")
+    pages = {slow: property_html("5"), other: property_html("6")}
+    with FakeScrapfly(pages, delays={slow: 0.3}, cost=7) as fake:
+        billed = scrap_data.abandoned_credits()
+
+        async def collect():
+            return [r async for r in iter_scrape_properties([slow, other], client=fake.client(), concurrency=1,
+                                                            timeout=0.05, retries=1, backoff=0.01)]
+        results = {r["url"]: r for r in asyncio.run(collect())}
+        # The abandoned request still finishes, and is billed, after its page was reported
+        time.sleep(0.4)
+
+    assert not results[slow]["ok"] and results[slow]["attempts"] == 1
+    assert "Timed out" in results[slow]["error"]
+    assert fake.requests[slow] == 1
+    # The timed-out request kept its slot: the next page waited for it instead of running alongside
+    assert results[other]["ok"] and fake.max_in_flight == 1
+    assert scrap_data.abandoned_credits() - billed == 7
+
+
+def test_scrape_properties_parses_off_the_event_loop(monkeypatch):
+    parse_threads = []
+    original_parse_page = scrap_data.parse_page
+
+    def recording_parse_page(*args):
+        parse_threads.append(threading.current_thread().name)
+        return original_parse_page(*args)
+
+    monkeypatch.setattr(scrap_data, "parse_page", recording_parse_page)
+    search = "https://www.rightmove.co.uk/property-to-rent.html"
+    pages = {URL.format("150912345"): property_html("150912345"),
+             search: (FIXTURES / "search_page.html").read_text()}
+    with FakeScrapfly(pages) as fake:
+        monkeypatch.setattr(scrap_data, "scrapfly", fake.client())
+        results = asyncio.run(scrap_data.scrape_properties(list(pages)))
+    assert [r["id"] for r in results] == ["150912345"]
+    assert len(parse_threads) == 2 and all(name.startswith("scrape-parse") for name in parse_threads)
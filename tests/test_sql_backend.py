@@ -0,0 +1,44 @@
+import duckdb
+import pandas as pd
+import pytest
+
+from src.sql_backend import DuckDBBackend, SQLValidationError, extract_sql, validate_sql
+
+
+@pytest.fixture
+def backend(tmp_path):
+    pd.DataFrame({
+        "id": ["1", "2", "3"], "borough": ["Camden", "Hackney", "Camden"], "price_gbp": [2000.0, 1500.0, 2600.0],
+    }).to_parquet(tmp_path / "data.parquet")
+    (tmp_path / "schema.yaml").write_text("columns:\n- name: price_gbp\n  description: Monthly rent\n")
+    return DuckDBBackend(str(tmp_path / "data.parquet"), schema_path=str(tmp_path / "schema.yaml"), max_rows=2)
+
+
+def test_executes_select_over_parquet_with_row_cap(backend):
+    assert {"name": "price_gbp", "type": "DOUBLE", "description": "Monthly rent"} in backend.columns
+    result = backend.execute("SELECT borough, avg(price_gbp) AS mean FROM listings GROUP BY borough ORDER BY borough;")
+    assert result.to_dict("records") == [{"borough": "Camden", "mean": 2300.0}, {"borough": "Hackney", "mean": 1500.0}]
+    assert len(backend.execute("SELECT * FROM listings")) == 2
+
+
+def test_rejects_writes_and_file_access(backend, tmp_path):
+    assert extract_sql("Here:\n```sql\nSELECT 1;\n```") == "SELECT 1;"
+    assert validate_sql("SELECT 1;") == "SELECT 1"
+    for sql in ("DROP VIEW listings", "SELECT 1; SELECT 2", "COPY listings TO 'x.csv'", "SELEC 1"):
+        with pytest.raises(SQLValidationError):
+            validate_sql(sql)
+    with pytest.raises(duckdb.Error):
+        backend.execute(f"SELECT * FROM read_csv('{tmp_path / 'schema.yaml'}')")
+
+
+def test_ask_retries_with_the_error(backend, monkeypatch):
+    attempts = []
+
+    def generate_sql(query, action, failed_sql=None, error=None):
+        attempts.append(error)
+        return "SELECT nope FROM listings" if failed_sql is None else "SELECT count(*) AS n FROM listings"
+
+    monkeypatch.setattr(backend, "generate_sql", generate_sql)
+    result = backend.ask("how many listings?")
+    assert result["error"] is None and result["value"]["n"][0] == 3
+    assert attempts[0] is None and "nope" in attempts[1]
@@ -0,0 +1,92 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.scrap_data import parse_page, to_property_dicts
+from src.valuation import FALLBACK_CONFIDENCE, ComparablesValuer
+
+FIXTURES = Path(__file__).parent / "fixtures" / "rightmove"
+
+
+def listings(n=2000, seed=0):
+    """Synthetic market: rent grows with bedrooms and falls with distance from a centre point."""
+    rng = np.random.default_rng(seed)
+    lat = 51.5 + rng.normal(0, 0.05, n)
+    lon = -0.12 + rng.normal(0, 0.08, n)
+    bedrooms = rng.integers(1, 5, n)
+    distance = np.hypot(lat - 51.5, (lon + 0.12) * 0.62)
+    price = 1000 + 600 * bedrooms - 4000 * distance + rng.normal(0, 50, n)
+    return pd.DataFrame({
+        "id": np.arange(n).astype(str), "latitude": lat, "longitude": lon, "bedrooms": bedrooms, "bathrooms": 1,
+        "property_type": rng.choice(["Flat", "Terraced"], n), "postcode_outcode": np.where(lon < -0.12, "W1", "E1"),
+        "price_gbp": price,
+    })
+
+
+def test_estimates_follow_the_local_market_and_fall_back_without_coordinates():
+    valuer = ComparablesValuer(listings())
+    subjects = pd.DataFrame({
+        "latitude": [51.5, 51.5, 51.58, None], "longitude": [-0.12, -0.12, -0.12, None],
+        "bedrooms": [1, 3, 2, 2], "property_type": ["Flat", "Flat", "Flat", "Flat"],
+        "postcode_outcode": ["E1", "E1", "E1", "E1"],
+    })
+    result = valuer.estimate(subjects)
+
+    assert list(result["method"]) == ["comparables", "comparables", "comparables", "outcode"]
+    assert abs(result["estimate"][0] - 1600) < 150
+    assert abs(result["estimate"][1] - 2800) < 150
+    assert result["estimate"][2] < 2200  # further out than the 2-bedroom average
+    assert (result["confidence"][:3] > FALLBACK_CONFIDENCE["outcode"]).all()
+    assert result["confidence"][3] == FALLBACK_CONFIDENCE["outcode"]
+    assert (result["comparables"][:3] > 3).all()
+
+
+def test_to_property_dicts_values_parsed_pages():
+    prop = parse_page((FIXTURES / "property_page.html").read_text(), "https://www.rightmove.co.uk/properties/150912345")
+    assert prop["location"] == {"latitude": 51.5432, "longitude": -0.1357}
+
+    row = to_property_dicts([prop], ComparablesValuer(listings()))[0]
+    assert row["Rent (£/pcm)"] == 2362
+    assert row["expectedRent (£/pcm)"] > 0 and row["comparables"] > 0
+    assert to_property_dicts([prop])[0]["expectedRent (£/pcm)"] is None
+
+
+def test_a_listing_in_the_dataset_is_not_its_own_comparable():
+    market = listings()
+    # A listing far above its neighbours: valued with itself, it would echo its own rent
+    market.loc[0, ["latitude", "longitude", "bedrooms", "property_type", "price_gbp"]] = \
+        [51.5, -0.12, 2, "Flat", 9000.0]
+    valuer = ComparablesValuer(market)
+    subject = pd.DataFrame({"latitude": [51.5], "longitude": [-0.12], "bedrooms": [2], "property_type": ["Flat"],
+                            "postcode_outcode": ["E1"]})
+    outside = valuer.estimate(subject)
+    inside = valuer.estimate(subject.assign(id="0"))
+    assert abs(inside["estimate"][0] - 2200) < 150
+    assert inside["comparables"][0] == outside["comparables"][0] - 1
+    assert inside["confidence"][0] < outside["confidence"][0]
+
+
+def test_streamed_properties_are_valued_in_batches(monkeypatch):
+    import src.agent as agent
+
+    prop = parse_page((FIXTURES / "property_page.html").read_text(), "https://www.rightmove.co.uk/properties/150912345")
+    batches = []
+
+    class RecordingValuer(ComparablesValuer):
+        def estimate(self, subjects):
+            batches.append(len(subjects))
+            return super().estimate(subjects)
+
+    async def results(urls, report=None):
+        for url in urls:
+            yield {"url": url, "ok": url != "bad", "property": prop, "error": None if url != "bad" else "404"}
+
+    valuer = RecordingValuer(listings())
+    monkeypatch.setattr(agent, "get_valuer", lambda: valuer)
+    monkeypatch.setattr(agent, "iter_listing_results", results)
+    streamed = list(agent.stream_valuations(["a", "bad", "b", "c"]))
+    assert [v["ok"] for v in streamed] == [True, False, True, True]
+    assert all(v["data"]["expectedRent (£/pcm)"] > 0 for v in streamed if v["ok"]) and streamed[1]["data"] is None
+    # Properties already scraped when the consumer asks for the next one share one valuation call
+    assert sum(batches) == 3 and len(batches) < 3